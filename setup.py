@@ -45,6 +45,7 @@ setup(
         where="src",
         include=["chess*"],
     ),
+    package_data={"chess": ["_environment.pxd"]},
     python_requires=">=3.9",
     install_requires=[
         "Cython==3.0.2",
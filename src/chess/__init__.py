@@ -2,8 +2,22 @@ from chess._version import __version__
 from chess._environment import Environment
 
 
-env = Environment()
+_env = None
+
+
+def get_env() -> Environment:
+    """The shared Environment, the attack tables are only loaded on first use."""
+    global _env
+    if _env is None:
+        _env = Environment()
+    return _env
+
+
+def __getattr__(name):
+    if name == "env":
+        return get_env()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 __version__ = __version__
-__all__ = ["__version__", "env"]
+__all__ = ["__version__", "env", "get_env"]
@@ -1,9 +1,17 @@
 import argparse
-from chess import _agent
-from chess._constants import BOARD, WHITE, BLACK, MAX_ROUNDS, VERBOSE, COLOR
+import sys
+from chess import _agent, _utils, bench, perft, tournament
+from chess._constants import BOARD, WHITE, BLACK, MAX_ROUNDS, VERBOSE, COLOR, PERFT_DEPTH
 
 
 def main() -> None:
+    if sys.argv[1:2] == ["perft"]:
+        return perft_main(sys.argv[2:])
+    if sys.argv[1:2] == ["bench"]:
+        return bench_main(sys.argv[2:])
+    if sys.argv[1:2] == ["tournament"]:
+        return tournament_main(sys.argv[2:])
+
     parser = argparse.ArgumentParser(
         description="Chess engine command line interface",
     )
@@ -58,14 +66,189 @@ def main() -> None:
 
     args = parser.parse_args()
 
-    _agent.simulate(
-        white_player=_agent.parse(args.white_player),
-        black_player=_agent.parse(args.black_player),
-        color=args.color,
-        board=args.board,
-        verbose=args.verbose,
-        max_rounds=args.max_rounds,
+    white_player = _agent.parse(args.white_player)
+    black_player = _agent.parse(args.black_player)
+    try:
+        _agent.simulate(
+            white_player=white_player,
+            black_player=black_player,
+            color=args.color,
+            board=args.board,
+            verbose=args.verbose,
+            max_rounds=args.max_rounds,
+        )
+    finally:
+        white_player.close()
+        black_player.close()
+
+
+def perft_main(argv) -> None:
+    parser = argparse.ArgumentParser(
+        prog="chess perft",
+        description="Count the leaf nodes of the legal move tree and report nodes per second",
+    )
+    parser.add_argument(
+        "-d",
+        "--depth",
+        help=f"The depth of the move tree. Default is {PERFT_DEPTH}",
+        default=PERFT_DEPTH,
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "-f",
+        "--fen",
+        help="The position as a FEN string. Default is the initial position",
+        default=None,
+        required=False,
+        type=str,
+    )
+    parser.add_argument(
+        "-c",
+        "--color",
+        help=(
+            "The color that is currently playing encoded as an integer "
+            f"where white={WHITE} and black={BLACK}, used with --board. Default is {COLOR}"
+        ),
+        default=COLOR,
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "-b",
+        "--board",
+        help=f"The board set as a unicode string. Default is {BOARD}",
+        default=BOARD,
+        required=False,
+        type=str,
+    )
+    parser.add_argument(
+        "--divide",
+        action="store_true",
+        help="Print the count below each legal action of the position",
+        default=False,
+        required=False,
+    )
+    parser.add_argument(
+        "--bench",
+        action="store_true",
+        help="Run the reference positions up to --depth and check the counts",
+        default=False,
+        required=False,
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        sys.exit(0 if perft.bench(max_depth=args.depth) else 1)
+
+    if args.fen is not None:
+        state = _utils.state_from_fen(args.fen)
+    else:
+        state = _utils.state_init(color=args.color, board=args.board)
+    perft.run(state, depth=args.depth, show_divide=args.divide)
+
+
+def bench_main(argv) -> None:
+    parser = argparse.ArgumentParser(
+        prog="chess bench",
+        description="Search the perft reference positions and report the speedup by threads",
     )
+    parser.add_argument(
+        "-d",
+        "--depth",
+        help=f"The search depth. Default is {bench.SEARCH_DEPTH}",
+        default=bench.SEARCH_DEPTH,
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        help="Comma separated numbers of threads. Default is 1, 2, 4, ... up to the CPU cores",
+        default=None,
+        required=False,
+        type=lambda threads: [int(n) for n in threads.split(",")],
+    )
+    parser.add_argument(
+        "-s",
+        "--selectivity",
+        help="Compare the nodes and time to depth of the selective search options",
+        action="store_true",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.selectivity:
+        bench.selectivity(depth=args.depth)
+    else:
+        bench.bench(threads=args.threads, depth=args.depth)
+
+
+def tournament_main(argv) -> None:
+    parser = argparse.ArgumentParser(
+        prog="chess tournament",
+        description="Play a round robin or gauntlet between agents with a pool of workers",
+    )
+    parser.add_argument(
+        "agents",
+        help="The agents, e.g. \"AlphaBetaAgent(depth=3)\" \"RandomAgent()\"",
+        nargs="+",
+        type=str,
+    )
+    parser.add_argument(
+        "-n",
+        "--games",
+        help="The number of games of each pairing, colors alternate. Default is 2",
+        default=2,
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "-g",
+        "--gauntlet",
+        action="store_true",
+        help="The first agent plays the others instead of a round robin between all agents",
+        default=False,
+        required=False,
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="The number of worker processes. Default is the number of CPU cores",
+        default=None,
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "-m",
+        "--max-rounds",
+        help=(
+            "Maximum number of rounds before a game is terminated as a draw. "
+            f"Default is {MAX_ROUNDS}"
+        ),
+        default=MAX_ROUNDS,
+        required=False,
+        type=int,
+    )
+    parser.add_argument(
+        "-s",
+        "--seed",
+        help="The seed of the first game, game i has seed + i. Default is 0",
+        default=0,
+        required=False,
+        type=int,
+    )
+
+    args = parser.parse_args(argv)
+
+    if len(args.agents) < 2:
+        parser.error("at least two agents are needed")
+    if args.gauntlet:
+        schedule = tournament.gauntlet(args.agents[0], args.agents[1:], args.games, args.seed)
+    else:
+        schedule = tournament.round_robin(args.agents, args.games, args.seed)
+    tournament.tournament(schedule, workers=args.workers, max_rounds=args.max_rounds)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
 import numpy as np
 import numpy.typing as npt
@@ -7,24 +8,13 @@ from chess._constants import (
     VERBOSE,
     MAX_ROUNDS,
     LOGO,
-    BLACK_ROOK,
-    BLACK_KNIGHT,
-    BLACK_BISHOP,
-    BLACK_QUEEN,
-    BLACK_KING,
-    BLACK_PAWN,
-    WHITE_ROOK,
-    WHITE_KNIGHT,
-    WHITE_BISHOP,
-    WHITE_QUEEN,
-    WHITE_KING,
-    WHITE_PAWN,
     WHITE,
     BLACK,
     STATE_DTYPE,
     ACTION_DTYPE,
+    PIECE_VALUE,
 )
-from chess import env
+from chess import evaluation, get_env
 from chess._environment import AlphaBetaSearch
 from chess import _utils
 from chess._version import __version__
@@ -43,6 +33,9 @@ class Agent(ABC):
     def __repr__(self) -> str:
         ...
 
+    def close(self) -> None:
+        """Release the resources of the agent, e.g. the threads of a search."""
+
 
 def parse(agent: str) -> Agent:
     return eval(agent)
@@ -50,7 +43,7 @@ def parse(agent: str) -> Agent:
 
 class RandomAgent(Agent):
     def __init__(self, seed: int = 42):
-        self._env = env
+        self._env = get_env()
         self.seed = seed
         np.random.seed(self.seed)
 
@@ -65,7 +58,7 @@ class RandomAgent(Agent):
 
 class HumanAgent(Agent):
     def __init__(self):
-        self._env = env
+        self._env = get_env()
 
     def policy(self, state: State) -> Action:
         actions = self._env.actions(state)
@@ -78,52 +71,80 @@ class HumanAgent(Agent):
 
 
 class AlphaBetaAgent(Agent):
-    """Agent using minimax with alpha-beta pruning."""
+    """Agent using minimax with alpha-beta pruning.
+
+    The search is iteratively deepened to depth, if movetime is given the search is stopped after
+    movetime seconds and the deepest completed iteration is used. With threads > 1 the root actions
+    are searched in parallel by threads sharing the transposition table. With quiescence the
+    captures and promotions are searched beyond depth until the position is quiet. null_move, lmr,
+    pvs and aspiration enable null-move pruning, late-move reductions, principal variation search
+    and aspiration windows, see AlphaBetaSearch. With psqt the states are valued by the piece values
+    plus the piece-square tables blended from the middlegame to the endgame.
+    """
 
     def __init__(
         self,
         depth=2,
-        piece_value: dict[str, float] = {
-            "Pawn": 1,
-            "Knight": 3,
-            "Bishop": 3,
-            "Rook": 5,
-            "Queen": 9,
-            "King": 1e6,
-        },
+        piece_value: dict[str, float] = PIECE_VALUE,
+        tt_size_mb: float = 16,
+        movetime: Optional[float] = None,
+        threads: int = 1,
+        quiescence: bool = True,
+        null_move: bool = False,
+        lmr: bool = False,
+        pvs: bool = False,
+        aspiration: bool = False,
+        psqt: bool = True,
     ):
         self.depth = depth
         self.piece_value = piece_value
-        self._alpha_beta_search = AlphaBetaSearch(env=env)
+        self.tt_size_mb = tt_size_mb
+        self.movetime = movetime
+        self.threads = threads
+        self.quiescence = quiescence
+        self.null_move = null_move
+        self.lmr = lmr
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.psqt = psqt
+        self._alpha_beta_search = AlphaBetaSearch(
+            env=get_env(),
+            tt_size_mb=tt_size_mb,
+            threads=threads,
+            quiescence=quiescence,
+            null_move=null_move,
+            lmr=lmr,
+            pvs=pvs,
+            aspiration=aspiration,
+            psqt=psqt,
+        )
 
     def _piece_value(self, white_player_turn: bool):
-        piece_value = np.zeros(shape=12)
-        piece_value[BLACK_ROOK] = -self.piece_value["Rook"]
-        piece_value[BLACK_KNIGHT] = -self.piece_value["Knight"]
-        piece_value[BLACK_BISHOP] = -self.piece_value["Bishop"]
-        piece_value[BLACK_QUEEN] = -self.piece_value["Queen"]
-        piece_value[BLACK_KING] = -self.piece_value["King"]
-        piece_value[BLACK_PAWN] = -self.piece_value["Pawn"]
-        piece_value[WHITE_ROOK] = self.piece_value["Rook"]
-        piece_value[WHITE_KNIGHT] = self.piece_value["Knight"]
-        piece_value[WHITE_BISHOP] = self.piece_value["Bishop"]
-        piece_value[WHITE_QUEEN] = self.piece_value["Queen"]
-        piece_value[WHITE_KING] = self.piece_value["King"]
-        piece_value[WHITE_PAWN] = self.piece_value["Pawn"]
-        if white_player_turn:
-            return piece_value
-        else:
-            return -piece_value
+        return evaluation.piece_values(self.piece_value, white_player_turn)
 
     def policy(self, state):
         piece_value = self._piece_value(bool(state["white_player_turn"]))
         actions, values = self._alpha_beta_search.search(
-            state, self.depth, piece_value)
+            state, self.depth, piece_value, self.movetime)
         optimal_actions = actions[values == np.max(values)]
         return np.random.choice(optimal_actions)
 
+    def close(self) -> None:
+        self._alpha_beta_search.close()
+
+    def tt_stats(self) -> dict:
+        """Transposition table statistics, e.g. the hit rate, empty if it is disabled."""
+        if self._alpha_beta_search.tt is None:
+            return {}
+        return self._alpha_beta_search.tt.stats()
+
     def __repr__(self) -> str:
-        return f"AlphaBetaAgent(depth={self.depth}, piece_value={self.piece_value})"
+        return (
+            f"AlphaBetaAgent(depth={self.depth}, piece_value={self.piece_value}, "
+            f"tt_size_mb={self.tt_size_mb}, movetime={self.movetime}, threads={self.threads}, "
+            f"quiescence={self.quiescence}, null_move={self.null_move}, lmr={self.lmr}, "
+            f"pvs={self.pvs}, aspiration={self.aspiration}, psqt={self.psqt})"
+        )
 
 
 def simulate(  # noqa
@@ -135,6 +156,7 @@ def simulate(  # noqa
     max_rounds: int = MAX_ROUNDS,
 ):
 
+    env = get_env()
     state = _utils.state_init(color=color, board=board)
 
     state_log = np.empty(shape=(max_rounds + 1,), dtype=STATE_DTYPE)
@@ -164,7 +186,7 @@ def simulate(  # noqa
             state_log[idx] = state
             action_log[idx] = action
 
-            state = env.step(state, action)
+            state = env.step(state, action, terminal=True)
 
             if state["is_white_checkmate"]:
                 state_log[idx + 1] = state
@@ -197,6 +219,9 @@ def simulate(  # noqa
             if verbose:
                 if state["is_white_check"]:
                     print("White is check!")
+        else:
+            # max_rounds reached without the game being terminated
+            state_log[idx + 1] = state
 
     except KeyboardInterrupt:
         if verbose:
@@ -8,6 +8,7 @@ BOARD = (
     "♙♙♙♙♙♙♙♙"
     "♖♘♗♕♔♗♘♖"
 )
+FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
 EMPTY = 0
 BLACK_ROOK = 0
 BLACK_KNIGHT = 1
@@ -91,13 +92,34 @@ STATE_DTYPE = [
     ("is_white_checkmate", "?"),
     ("is_black_checkmate", "?"),
     ("is_draw", "?"),
+    ("zobrist_key", "<u8"),
+    ("psqt_mg", "<i4"),
+    ("psqt_eg", "<i4"),
+    ("phase", "<i4"),
 ]
 ACTION_DTYPE = [
     ("src", "<u8"),
     ("dst", "<u8"),
     ("action_flag", "<i8"),
 ]
+# Packed 16-bit moves, from_square | to_square << 6 | kind << 12 where the kind is the action flag
+# relative to the player in turn. The kinds 0, ..., 7 are the moves of the rook, knight, bishop,
+# queen, king, pawn, pawn double and pawn en passant as in ActionFlag.
+MOVE_DTYPE = "<u2"
+MOVE_CASTLE_QUEENSIDE = 8
+MOVE_CASTLE_KINGSIDE = 9
+MOVE_PROMOTE = 10  # 10, ..., 14 promotion to rook, knight, bishop, queen and pawn
+# The planes of encode_planes, 12 pieces, the color in turn, 4 castling rights and en passant.
+N_PLANES = 18
 MAX_ROUNDS = 2048
+PIECE_VALUE = {
+    "Pawn": 1,
+    "Knight": 3,
+    "Bishop": 3,
+    "Rook": 5,
+    "Queen": 9,
+    "King": 1e6,
+}
 LOGO = r"""
 (  ____ \|\     /|(  ____ \(  ____ \(  ____ \
 | (    \/| )   ( || (    \/| (    \/| (    \/
@@ -117,3 +139,4 @@ SEED = 42
 VERBOSE = False
 COLOR = WHITE
 MAX_PLY = 5000
+PERFT_DEPTH = 4
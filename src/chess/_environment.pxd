@@ -0,0 +1,216 @@
+# The declarations of the state, the action and the Environment and Position classes, such that
+# other Cython modules can cimport them and walk positions without the GIL.
+cimport numpy as cnp
+cimport cython
+from libcpp.vector cimport vector as cpp_vector
+
+
+ctypedef unsigned long long Bitboard
+
+cdef packed struct State:
+    # The state should encode all the information to start the game in a given board configuration.
+    # The board has 2 representations:
+    # - bitboards representation (uint64, (12,))
+    # - board representation (long[8][8])
+    cnp.npy_bool white_player_turn
+    Bitboard black_rook
+    Bitboard black_knight
+    Bitboard black_bishop
+    Bitboard black_queen
+    Bitboard black_king
+    Bitboard black_pawn
+    Bitboard white_rook
+    Bitboard white_knight
+    Bitboard white_bishop
+    Bitboard white_queen
+    Bitboard white_king
+    Bitboard white_pawn
+
+    cnp.npy_bool has_black_king_moved
+    cnp.npy_bool has_white_king_moved
+
+    cnp.npy_bool has_black_queenside_rook_moved
+    cnp.npy_bool has_black_kingside_rook_moved
+    cnp.npy_bool has_white_queenside_rook_moved
+    cnp.npy_bool has_white_kingside_rook_moved
+
+    # A half-move
+    Bitboard ply
+
+    # A square with the possibility of en passant
+    Bitboard en_passant_square_black
+    Bitboard en_passant_square_white
+
+    cnp.npy_bool is_white_check
+    cnp.npy_bool is_black_check
+    cnp.npy_bool is_white_checkmate
+    cnp.npy_bool is_black_checkmate
+    cnp.npy_bool is_draw
+
+    # Zobrist hash of the position, updated incrementally by every action
+    Bitboard zobrist_key
+
+    # Piece-square values for white and the game phase, updated incrementally by every action
+    cnp.int32_t psqt_mg
+    cnp.int32_t psqt_eg
+    cnp.int32_t phase
+
+
+cdef packed struct Action:
+    # The action should encode all the information needed to transition between possible states.
+
+    # source (uint64)
+    Bitboard src
+
+    # destination (uint64)
+    Bitboard dst
+
+    # type of action
+    long flag
+
+
+cdef enum:
+    # Upper bound on the number of pseudo actions in a state.
+    MAX_ACTIONS = 512
+
+
+cdef struct ActionList:
+    # A fixed size action buffer, lives on the stack such that move generation does not allocate.
+    Action actions[MAX_ACTIONS]
+    int size
+
+
+cdef class Environment:
+    # A stateless environment with two main public methods: actions(state) and step(state, action).
+    # Attack tables indexed by square (0 = A8, ..., 63 = H1). The sliding pieces use magic
+    # bitboards where the attacks of all squares are stored in one contiguous array, the attacks
+    # of a square starts at its offset and is indexed by its magic key.
+    cdef Bitboard _king_attacks[64]
+    cdef Bitboard _knight_attacks[64]
+
+    cdef Bitboard _rook_magics[64]
+    cdef int _rook_shifts[64]
+    cdef Bitboard _rook_masks[64]
+    cdef int _rook_offsets[64]
+    cdef readonly cnp.ndarray _rook_attacks
+    cdef Bitboard* _rook_attacks_data
+
+    cdef Bitboard _bishop_magics[64]
+    cdef int _bishop_shifts[64]
+    cdef Bitboard _bishop_masks[64]
+    cdef int _bishop_offsets[64]
+    cdef readonly cnp.ndarray _bishop_attacks
+    cdef Bitboard* _bishop_attacks_data
+
+    cdef _actions(self, State state, bint packed=*)
+    cdef void _generate_actions(self, const State* state, ActionList* action_list) noexcept nogil
+    cdef void _filter_legal_actions(self, const State* state, ActionList* action_list) noexcept nogil
+    cdef _pseudo_actions(self, State state, bint packed=*)
+    cdef void _generate_pseudo_actions(self, const State* state, ActionList* action_list) noexcept nogil
+    cdef _pseudo_captures(self, State state, bint packed=*)
+    cdef void _generate_captures(self, const State* state, ActionList* action_list) noexcept nogil
+    cdef _step(self, State state, const Action [:] action, cnp.npy_bool _step_ahead=*)
+    cdef _step_scalar(self, State state, Action action, cnp.npy_bool _step_ahead)
+    cdef void _update_terminal(self, State* state) noexcept nogil
+    cdef bint _has_legal_action(self, const State* state) noexcept nogil
+    cdef int _make_action(self, State* state, Action action) except -1 nogil
+    cdef bint _is_white_check(self, State state) noexcept nogil
+    cdef bint _is_black_check(self, State state) noexcept nogil
+    cdef bint _is_draw(self, State state, bint has_legal_action) noexcept nogil
+    cdef bint _is_white_checkmate(self, State state) noexcept nogil
+    cdef bint _is_black_checkmate(self, State state) noexcept nogil
+    cdef bint _insufficient_material_king_vs_king(self, State state) noexcept nogil
+    cdef bint _is_stalemate(self, State state, bint has_legal_action) noexcept nogil
+    cdef Bitboard king_attackset(self, Bitboard king) noexcept nogil
+    cdef Bitboard knight_attackset(self, Bitboard knight) noexcept nogil
+    cpdef Bitboard rook_attackset_slow(self, int i, int j, Bitboard blockers)
+    cdef Bitboard _rook_attackset(self, Bitboard rook, Bitboard blockers) noexcept nogil
+    cpdef bishop_attackset_slow(self, int i, int j, Bitboard blockers)
+    cdef Bitboard _bishop_attackset(self, Bitboard bishop, Bitboard blockers) noexcept nogil
+    cdef void _king_actions(self, ActionList* action_list, Bitboard king, Bitboard color, Bitboard other_attackset, int flag) noexcept nogil
+    cdef void _knight_actions(self, ActionList* action_list, Bitboard knight, Bitboard target, Bitboard pinned, int king_square, int flag) noexcept nogil
+    cdef void _rook_actions(self, ActionList* action_list, Bitboard rook, Bitboard blockers, Bitboard target, Bitboard pinned, int king_square, int flag) noexcept nogil
+    cdef void _bishop_actions(self, ActionList* action_list, Bitboard bishop, Bitboard blockers, Bitboard target, Bitboard pinned, int king_square, int flag) noexcept nogil
+    cdef void _queen_actions(self, ActionList* action_list, Bitboard queen, Bitboard blockers, Bitboard target, Bitboard pinned, int king_square, int flag) noexcept nogil
+    cdef Bitboard white_pawn_attackset(self, Bitboard pawn) noexcept nogil
+    cdef Bitboard black_pawn_attackset(self, Bitboard pawn) noexcept nogil
+    cdef void _white_pawn_actions(self, ActionList* action_list, Bitboard pawn, Bitboard occupied, Bitboard other_color, Bitboard en_passant_square_white, Bitboard en_passant_pawn, Bitboard target, Bitboard pinned, int king_square) noexcept nogil
+    cdef void _black_pawn_actions(self, ActionList* action_list, Bitboard pawn, Bitboard occupied, Bitboard other_color, Bitboard en_passant_square_black, Bitboard en_passant_pawn, Bitboard target, Bitboard pinned, int king_square) noexcept nogil
+    cdef void _black_rook_queenside_castling_actions(
+        self,
+        ActionList* action_list,
+        Bitboard rook,
+        Bitboard king,
+        Bitboard occupied,
+        Bitboard other_attackset,
+        cnp.npy_bool has_black_king_moved,
+        cnp.npy_bool has_black_queenside_rook_moved,
+    ) noexcept nogil
+    cdef void _white_rook_queenside_castling_actions(
+        self,
+        ActionList* action_list,
+        Bitboard rook,
+        Bitboard king,
+        Bitboard occupied,
+        Bitboard other_attackset,
+        cnp.npy_bool has_white_king_moved,
+        cnp.npy_bool has_white_queenside_rook_moved,
+    ) noexcept nogil
+    cdef void _black_rook_kingside_castling_actions(
+        self,
+        ActionList* action_list,
+        Bitboard rook,
+        Bitboard king,
+        Bitboard occupied,
+        Bitboard other_attackset,
+        cnp.npy_bool has_black_king_moved,
+        cnp.npy_bool has_black_kingside_rook_moved,
+    ) noexcept nogil
+    cdef void _white_rook_kingside_castling_actions(
+        self,
+        ActionList* action_list,
+        Bitboard rook,
+        Bitboard king,
+        Bitboard occupied,
+        Bitboard other_attackset,
+        cnp.npy_bool has_white_king_moved,
+        cnp.npy_bool has_white_kingside_rook_moved,
+    ) noexcept nogil
+    cdef _init_king_attacks(self)
+    cdef _init_knight_attacks(self)
+    cdef _init_rook_magics(self)
+    cdef int _rook_attacks_size(self)
+    cdef _set_rook_attacks(self, cnp.ndarray rook_attacks)
+    cdef _init_rook_attacks(self)
+    cdef _init_bishop_magics(self)
+    cdef int _bishop_attacks_size(self)
+    cdef _set_bishop_attacks(self, cnp.ndarray bishop_attacks)
+    cdef _init_bishop_attacks(self)
+
+    @cython.profile(False)
+    cdef inline Bitboard rook_attacks(self, int square, Bitboard blockers) noexcept nogil:
+        return self._rook_attacks_data[
+            self._rook_offsets[square]
+            + (((blockers & self._rook_masks[square]) * self._rook_magics[square]) >> self._rook_shifts[square])
+        ]
+
+    @cython.profile(False)
+    cdef inline Bitboard bishop_attacks(self, int square, Bitboard blockers) noexcept nogil:
+        return self._bishop_attacks_data[
+            self._bishop_offsets[square]
+            + (((blockers & self._bishop_masks[square]) * self._bishop_magics[square]) >> self._bishop_shifts[square])
+        ]
+
+
+cdef class Position:
+    # A mutable state with an undo stack. make_move applies an action to the state in place and
+    # unmake_move restores the state from before the last action, neither allocates once the undo
+    # stack has grown to the depth of the search.
+    cdef Environment _env
+    cdef State _state
+    cdef cpp_vector[State] _undo_stack
+
+    cdef void _reset(self, State state) noexcept
+    cdef int _make_move(self, Action action) except -1 nogil
+    cdef int _make_null_move(self) except -1 nogil
+    cdef void _unmake_move(self) noexcept nogil
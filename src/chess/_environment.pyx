@@ -1,67 +1,68 @@
 #cython: language_level=3
 #cython: linetrace=True, profile=True, nonecheck=False, boundscheck=False, wraparound=False, cdivision=True
+import concurrent.futures
+
 import numpy as np
 cimport numpy as cnp
+cimport cython
+from libc.stdlib cimport calloc, free
+from libc.string cimport memcpy, memset
 from libcpp.vector cimport vector as cpp_vector
-from libcpp.unordered_map cimport unordered_map as cpp_map
-
-cnp.import_array()
-
-ctypedef unsigned long long Bitboard
-
-cdef packed struct State:
-    # The state should encode all the information to start the game in a given board configuration.
-    # The board has 2 representations:
-    # - bitboards representation (uint64, (12,))
-    # - board representation (long[8][8])
-    cnp.npy_bool white_player_turn
-    Bitboard black_rook
-    Bitboard black_knight
-    Bitboard black_bishop
-    Bitboard black_queen
-    Bitboard black_king
-    Bitboard black_pawn
-    Bitboard white_rook
-    Bitboard white_knight
-    Bitboard white_bishop
-    Bitboard white_queen
-    Bitboard white_king
-    Bitboard white_pawn
-
-    cnp.npy_bool has_black_king_moved
-    cnp.npy_bool has_white_king_moved
-    
-    cnp.npy_bool has_black_queenside_rook_moved
-    cnp.npy_bool has_black_kingside_rook_moved
-    cnp.npy_bool has_white_queenside_rook_moved
-    cnp.npy_bool has_white_kingside_rook_moved
-
-    # A half-move
-    Bitboard ply
-
-    # A square with the possibility of en passant
-    Bitboard en_passant_square_black
-    Bitboard en_passant_square_white
-
-    cnp.npy_bool is_white_check
-    cnp.npy_bool is_black_check
-    cnp.npy_bool is_white_checkmate
-    cnp.npy_bool is_black_checkmate
-    cnp.npy_bool is_draw
-
 
-cdef packed struct Action:
-    # The action should encode all the information needed to transition between possible states.
-
-    # source (uint64)
-    Bitboard src
-
-    # destination (uint64)
-    Bitboard dst
-
-    # type of action
-    long flag
+from chess import _tables
+
+
+cdef extern from *:
+    """
+    #include <chrono>
+    static double monotonic_seconds(void) {
+        return std::chrono::duration<double>(
+            std::chrono::steady_clock::now().time_since_epoch()).count();
+    }
+    """
+    double monotonic_seconds() nogil
+
+
+# Bitboard primitives on the compiler builtins, popcnt and tzcnt/bsf on x86-64. The portable
+# fallback counts bits in parallel and scans by De Bruijn multiplication, the isolated least
+# significant bit times the De Bruijn constant has a unique top 6 bits for each of the 64 squares.
+# See: https://www.chessprogramming.org/Population_Count
+# and: https://www.chessprogramming.org/BitScan#De_Bruijn_Multiplication
+cdef extern from *:
+    """
+    #if defined(__GNUC__) || defined(__clang__)
+    static inline int chess_popcount(unsigned long long x) { return __builtin_popcountll(x); }
+    static inline int chess_ctz(unsigned long long x) { return __builtin_ctzll(x); }
+    #elif defined(_MSC_VER) && defined(_M_X64)
+    #include <intrin.h>
+    static inline int chess_popcount(unsigned long long x) { return (int) __popcnt64(x); }
+    static inline int chess_ctz(unsigned long long x) {
+        unsigned long index;
+        _BitScanForward64(&index, x);
+        return (int) index;
+    }
+    #else
+    static inline int chess_popcount(unsigned long long x) {
+        x = x - ((x >> 1) & 0x5555555555555555ULL);
+        x = (x & 0x3333333333333333ULL) + ((x >> 2) & 0x3333333333333333ULL);
+        x = (x + (x >> 4)) & 0x0f0f0f0f0f0f0f0fULL;
+        return (int) ((x * 0x0101010101010101ULL) >> 56);
+    }
+    static const int CHESS_DEBRUIJN_INDEX[64] = {
+        0, 47, 1, 56, 48, 27, 2, 60, 57, 49, 41, 37, 28, 16, 3, 61,
+        54, 58, 35, 52, 50, 42, 21, 44, 38, 32, 29, 23, 17, 11, 4, 62,
+        46, 55, 26, 59, 40, 36, 15, 53, 34, 51, 20, 43, 31, 22, 10, 45,
+        25, 39, 14, 33, 19, 30, 9, 24, 13, 18, 8, 12, 7, 6, 5, 63
+    };
+    static inline int chess_ctz(unsigned long long x) {
+        return CHESS_DEBRUIJN_INDEX[((x ^ (x - 1)) * 0x03f79d71b4cb0a89ULL) >> 58];
+    }
+    #endif
+    """
+    int chess_popcount(unsigned long long x) nogil
+    int chess_ctz(unsigned long long x) nogil
 
+cnp.import_array()
 
 cpdef enum ActionFlag:
     move_black_rook = 0
@@ -100,6 +101,20 @@ cpdef enum ActionFlag:
     promote_white_pawn
 
 
+# A packed 16-bit move, from_square | to_square << 6 | kind << 12 where the kind is the action flag
+# relative to the player in turn. The kinds 0, ..., 7 are the moves of the rook, knight, bishop,
+# queen, king, pawn, pawn double and pawn en passant as in ActionFlag, 8 and 9 castling queenside
+# and kingside with from and to square 0, and 10, ..., 14 promotion to rook, knight, bishop, queen
+# and pawn. The move 0, a rook moving from A8 to A8, is never legal and marks no move.
+ctypedef cnp.uint16_t Move
+
+cdef enum:
+    MOVE_NONE = 0
+    MOVE_CASTLE_QUEENSIDE = 8
+    MOVE_CASTLE_KINGSIDE = 9
+    MOVE_PROMOTE = 10
+
+
 STATE_DTYPE = [
     ("white_player_turn", "?"),
     ("black_rook", "<u8"),
@@ -128,12 +143,17 @@ STATE_DTYPE = [
     ("is_white_checkmate", "?"),
     ("is_black_checkmate", "?"),
     ("is_draw", "?"),
+    ("zobrist_key", "<u8"),
+    ("psqt_mg", "<i4"),
+    ("psqt_eg", "<i4"),
+    ("phase", "<i4"),
 ]
 ACTION_DTYPE = [
     ("src", "<u8"),
     ("dst", "<u8"),
     ("action_flag", "<i8"),
 ]
+MOVE_DTYPE = "<u2"
 cdef int BLACK = 0
 cdef int WHITE = 1
 cdef int MAX_PLY = 5000
@@ -297,6 +317,831 @@ cdef Bitboard[64] MAGIC_BISHOP = [
 cdef Bitboard NO_MOVE = 0
 
 
+@cython.profile(False)
+cdef inline int bitscan(Bitboard bb) noexcept nogil:
+    # Square index (0 = A8, ..., 63 = H1) of the least significant bit. The builtins are undefined
+    # for an empty bitboard, tzcnt gives 64 and bsf any value, hence it is square 0 as an index.
+    if bb == EMPTY:
+        return 0
+    return chess_ctz(bb)
+
+
+@cython.profile(False)
+cdef inline int pop_lsb(Bitboard* bb) noexcept nogil:
+    # Square index of the least significant bit, which is cleared. Only for a non-empty bb, the
+    # callers loop while bb is non-empty.
+    cdef int square = chess_ctz(bb[0])
+    bb[0] &= bb[0] - 1
+    return square
+
+
+# The squares strictly between two squares on a rank, file or diagonal and the whole line through
+# them, empty if the squares are not aligned. Used for check evasions and pinned pieces.
+cdef Bitboard[64][64] BETWEEN
+cdef Bitboard[64][64] LINE
+
+
+cdef void _init_lines() noexcept nogil:
+    cdef int src, direction, i, j, di, dj, step
+    cdef Bitboard ray, line
+    cdef int[8] dis = [-1, -1, -1, 0, 0, 1, 1, 1]
+    cdef int[8] djs = [-1, 0, 1, -1, 1, -1, 0, 1]
+    memset(BETWEEN, 0, sizeof(BETWEEN))
+    memset(LINE, 0, sizeof(LINE))
+    for src in range(64):
+        for direction in range(8):
+            di = dis[direction]
+            dj = djs[direction]
+            # the line through src in the direction, both ways
+            line = (<Bitboard> 1) << src
+            for step in range(-1, 2, 2):
+                i = src // 8 + step * di
+                j = src % 8 + step * dj
+                while 0 <= i < 8 and 0 <= j < 8:
+                    line |= (<Bitboard> 1) << (8 * i + j)
+                    i += step * di
+                    j += step * dj
+            ray = 0
+            i = src // 8 + di
+            j = src % 8 + dj
+            while 0 <= i < 8 and 0 <= j < 8:
+                BETWEEN[src][8 * i + j] = ray
+                LINE[src][8 * i + j] = line
+                ray |= (<Bitboard> 1) << (8 * i + j)
+                i += di
+                j += dj
+
+
+_init_lines()
+
+
+# Zobrist keys, random numbers from a splitmix64 generator with a fixed seed such that keys are
+# the same across processes. See: https://www.chessprogramming.org/Zobrist_Hashing
+cdef Bitboard[12][64] ZOBRIST_PIECE
+cdef Bitboard ZOBRIST_WHITE_PLAYER_TURN
+cdef Bitboard[4] ZOBRIST_CASTLING
+cdef Bitboard[8] ZOBRIST_EN_PASSANT_FILE
+
+
+cdef Bitboard splitmix64(Bitboard* seed) noexcept nogil:
+    cdef Bitboard z
+    seed[0] += <Bitboard> 0x9e3779b97f4a7c15ULL
+    z = seed[0]
+    z = (z ^ (z >> 30)) * <Bitboard> 0xbf58476d1ce4e5b9ULL
+    z = (z ^ (z >> 27)) * <Bitboard> 0x94d049bb133111ebULL
+    return z ^ (z >> 31)
+
+
+cdef void _init_zobrist() noexcept nogil:
+    global ZOBRIST_WHITE_PLAYER_TURN
+    cdef int piece, square, i
+    cdef Bitboard seed = 42
+    for piece in range(12):
+        for square in range(64):
+            ZOBRIST_PIECE[piece][square] = splitmix64(&seed)
+    ZOBRIST_WHITE_PLAYER_TURN = splitmix64(&seed)
+    for i in range(4):
+        ZOBRIST_CASTLING[i] = splitmix64(&seed)
+    for i in range(8):
+        ZOBRIST_EN_PASSANT_FILE[i] = splitmix64(&seed)
+
+
+_init_zobrist()
+
+
+@cython.profile(False)
+cdef inline Bitboard pin_mask(Bitboard src, Bitboard pinned, int king_square) noexcept nogil:
+    # The destinations of a pinned piece are on the line through the king and the piece.
+    if src & pinned:
+        return LINE[king_square][bitscan(src)]
+    return ~EMPTY
+
+
+@cython.profile(False)
+cdef inline Bitboard* piece_bitboards(State* state) noexcept nogil:
+    # The 12 piece bitboards are consecutive in the packed State, indexed by BLACK_ROOK, ...
+    return &state.black_rook
+
+
+cdef Bitboard zobrist_castling_en_passant(const State* state) noexcept nogil:
+    cdef Bitboard key = 0
+    cdef Bitboard en_passant_square = state.en_passant_square_black | state.en_passant_square_white
+    if not (state.has_white_king_moved or state.has_white_kingside_rook_moved):
+        key ^= ZOBRIST_CASTLING[0]
+    if not (state.has_white_king_moved or state.has_white_queenside_rook_moved):
+        key ^= ZOBRIST_CASTLING[1]
+    if not (state.has_black_king_moved or state.has_black_kingside_rook_moved):
+        key ^= ZOBRIST_CASTLING[2]
+    if not (state.has_black_king_moved or state.has_black_queenside_rook_moved):
+        key ^= ZOBRIST_CASTLING[3]
+    if en_passant_square:
+        key ^= ZOBRIST_EN_PASSANT_FILE[bitscan(en_passant_square) & 7]
+    return key
+
+
+cdef Bitboard _zobrist_key(State* state) noexcept nogil:
+    cdef int piece
+    cdef Bitboard bb
+    cdef Bitboard* pieces = piece_bitboards(state)
+    cdef Bitboard key = zobrist_castling_en_passant(state)
+    if state.white_player_turn:
+        key ^= ZOBRIST_WHITE_PLAYER_TURN
+    for piece in range(12):
+        bb = pieces[piece]
+        while bb:
+            key ^= ZOBRIST_PIECE[piece][pop_lsb(&bb)]
+    return key
+
+
+def zobrist_key(state):
+    cdef State state_
+    if isinstance(state, np.void):
+        state_ = state
+    elif isinstance(state, np.ndarray):
+        if state.shape[0] > 1:
+            raise ValueError()
+        state_ = state[0]
+    else:
+        raise NotImplementedError()
+    return _zobrist_key(&state_)
+
+
+# Piece-square tables of PeSTO in hundredths of a pawn, for the middlegame and the endgame, by piece
+# type in the order of the piece constants, ROOK, ..., PAWN. The squares are from the view of white,
+# A8 first as the squares of the board, the tables of black are mirrored.
+# See: https://www.chessprogramming.org/PeSTO%27s_Evaluation_Function
+cdef int[384] PSQT_MG_TABLE = [
+    # rook
+    32, 42, 32, 51, 63, 9, 31, 43,
+    27, 32, 58, 62, 80, 67, 26, 44,
+    -5, 19, 26, 36, 17, 45, 61, 16,
+    -24, -11, 7, 26, 24, 35, -8, -20,
+    -36, -26, -12, -1, 9, -7, 6, -23,
+    -45, -25, -16, -17, 3, 0, -5, -33,
+    -44, -16, -20, -9, -1, 11, -6, -71,
+    -19, -13, 1, 17, 16, 7, -37, -26,
+    # knight
+    -167, -89, -34, -49, 61, -97, -15, -107,
+    -73, -41, 72, 36, 23, 62, 7, -17,
+    -47, 60, 37, 65, 84, 129, 73, 44,
+    -9, 17, 19, 53, 37, 69, 18, 22,
+    -13, 4, 16, 13, 28, 19, 21, -8,
+    -23, -9, 12, 10, 19, 17, 25, -16,
+    -29, -53, -12, -3, -1, 18, -14, -19,
+    -105, -21, -58, -33, -17, -28, -19, -23,
+    # bishop
+    -29, 4, -82, -37, -25, -42, 7, -8,
+    -26, 16, -18, -13, 30, 59, 18, -47,
+    -16, 37, 43, 40, 35, 50, 37, -2,
+    -4, 5, 19, 50, 37, 37, 7, -2,
+    -6, 13, 13, 26, 34, 12, 10, 4,
+    0, 15, 15, 15, 14, 27, 18, 10,
+    4, 15, 16, 0, 7, 21, 33, 1,
+    -33, -3, -14, -21, -13, -12, -39, -21,
+    # queen
+    -28, 0, 29, 12, 59, 44, 43, 45,
+    -24, -39, -5, 1, -16, 57, 28, 54,
+    -13, -17, 7, 8, 29, 56, 47, 57,
+    -27, -27, -16, -16, -1, 17, -2, 1,
+    -9, -26, -9, -10, -2, -4, 3, -3,
+    -14, 2, -11, -2, -5, 2, 14, 5,
+    -35, -8, 11, 2, 8, 15, -3, 1,
+    -1, -18, -9, 10, -15, -25, -31, -50,
+    # king
+    -65, 23, 16, -15, -56, -34, 2, 13,
+    29, -1, -20, -7, -8, -4, -38, -29,
+    -9, 24, 2, -16, -20, 6, 22, -22,
+    -17, -20, -12, -27, -30, -25, -14, -36,
+    -49, -1, -27, -39, -46, -44, -33, -51,
+    -14, -14, -22, -46, -44, -30, -15, -27,
+    1, 7, -8, -64, -43, -16, 9, 8,
+    -15, 36, 12, -54, 8, -28, 24, 14,
+    # pawn
+    0, 0, 0, 0, 0, 0, 0, 0,
+    98, 134, 61, 95, 68, 126, 34, -11,
+    -6, 7, 26, 31, 65, 56, 25, -20,
+    -14, 13, 6, 21, 23, 12, 17, -23,
+    -27, -2, -5, 12, 17, 6, 10, -25,
+    -26, -4, -4, -10, 3, 3, 33, -12,
+    -35, -1, -20, -23, -15, 24, 38, -22,
+    0, 0, 0, 0, 0, 0, 0, 0,
+]
+cdef int[384] PSQT_EG_TABLE = [
+    # rook
+    13, 10, 18, 15, 12, 12, 8, 5,
+    11, 13, 13, 11, -3, 3, 8, 3,
+    7, 7, 7, 5, 4, -3, -5, -3,
+    4, 3, 13, 1, 2, 1, -1, 2,
+    3, 5, 8, 4, -5, -6, -8, -11,
+    -4, 0, -5, -1, -7, -12, -8, -16,
+    -6, -6, 0, 2, -9, -9, -11, -3,
+    -9, 2, 3, -1, -5, -13, 4, -20,
+    # knight
+    -58, -38, -13, -28, -31, -27, -63, -99,
+    -25, -8, -25, -2, -9, -25, -24, -52,
+    -24, -20, 10, 9, -1, -9, -19, -41,
+    -17, 3, 22, 22, 22, 11, 8, -18,
+    -18, -6, 16, 25, 16, 17, 4, -18,
+    -23, -3, -1, 15, 10, -3, -20, -22,
+    -42, -20, -10, -5, -2, -20, -23, -44,
+    -29, -51, -23, -15, -22, -18, -50, -64,
+    # bishop
+    -14, -21, -11, -8, -7, -9, -17, -24,
+    -8, -4, 7, -12, -3, -13, -4, -14,
+    2, -8, 0, -1, -2, 6, 0, 4,
+    -3, 9, 12, 9, 14, 10, 3, 2,
+    -6, 3, 13, 19, 7, 10, -3, -9,
+    -12, -3, 8, 10, 13, 3, -7, -15,
+    -14, -18, -7, -1, 4, -9, -15, -27,
+    -23, -9, -23, -5, -9, -16, -5, -17,
+    # queen
+    -9, 22, 22, 27, 27, 19, 10, 20,
+    -17, 20, 32, 41, 58, 25, 30, 0,
+    -20, 6, 9, 49, 47, 35, 19, 9,
+    3, 22, 24, 45, 57, 40, 57, 36,
+    -18, 28, 19, 47, 31, 34, 39, 23,
+    -16, -27, 15, 6, 9, 17, 10, 5,
+    -22, -23, -30, -16, -16, -23, -36, -32,
+    -33, -28, -22, -43, -5, -32, -20, -41,
+    # king
+    -74, -35, -18, -18, -11, 15, 4, -17,
+    -12, 17, 14, 17, 17, 38, 23, 11,
+    10, 17, 23, 15, 20, 45, 44, 13,
+    -8, 22, 24, 27, 26, 33, 26, 3,
+    -18, -4, 21, 24, 27, 23, 9, -11,
+    -19, -3, 11, 21, 23, 16, 7, -9,
+    -27, -11, 4, 13, 14, 4, -5, -17,
+    -53, -34, -21, -11, -28, -14, -24, -43,
+    # pawn
+    0, 0, 0, 0, 0, 0, 0, 0,
+    178, 173, 158, 134, 147, 132, 165, 187,
+    94, 100, 85, 67, 56, 53, 82, 84,
+    32, 24, 13, 5, -2, 4, 17, 17,
+    13, 9, -3, -7, -7, -8, 3, -1,
+    4, 7, -6, 1, 0, -5, -1, -8,
+    13, 8, 8, 10, 13, 0, 2, -7,
+    0, 0, 0, 0, 0, 0, 0, 0,
+]
+
+# The game phase of each piece type, 24 with all pieces on the board and 0 with only kings and
+# pawns. Evaluations are blended from the middlegame to the endgame value by the phase.
+cdef enum: PHASE_MAX = 24
+cdef int[6] PHASE_TABLE = [2, 1, 1, 4, 0, 0]
+
+# The signed tables of each piece, positive for white and negative for black.
+cdef int[12][64] PSQT_MG
+cdef int[12][64] PSQT_EG
+cdef int[12] PHASE
+
+
+cdef void _init_psqt() noexcept nogil:
+    cdef int piece, square
+    for piece in range(6):
+        PHASE[BLACK_ROOK + piece] = PHASE_TABLE[piece]
+        PHASE[WHITE_ROOK + piece] = PHASE_TABLE[piece]
+        for square in range(64):
+            PSQT_MG[WHITE_ROOK + piece][square] = PSQT_MG_TABLE[64 * piece + square]
+            PSQT_EG[WHITE_ROOK + piece][square] = PSQT_EG_TABLE[64 * piece + square]
+            PSQT_MG[BLACK_ROOK + piece][square] = -PSQT_MG_TABLE[64 * piece + (square ^ 56)]
+            PSQT_EG[BLACK_ROOK + piece][square] = -PSQT_EG_TABLE[64 * piece + (square ^ 56)]
+
+
+_init_psqt()
+
+
+cdef void _psqt_terms(State* state) noexcept nogil:
+    # Sets the piece-square values and the game phase of the state from the pieces.
+    cdef int piece, square
+    cdef Bitboard bb
+    cdef Bitboard* pieces = piece_bitboards(state)
+    state.psqt_mg = 0
+    state.psqt_eg = 0
+    state.phase = 0
+    for piece in range(12):
+        bb = pieces[piece]
+        while bb:
+            square = pop_lsb(&bb)
+            state.psqt_mg += PSQT_MG[piece][square]
+            state.psqt_eg += PSQT_EG[piece][square]
+            state.phase += PHASE[piece]
+
+
+@cython.profile(False)
+cdef inline int psqt_value(const State* state) noexcept nogil:
+    # The piece-square value for white, the middlegame and endgame values blended by the phase.
+    cdef int phase = min(state.phase, PHASE_MAX)
+    return (state.psqt_mg * phase + state.psqt_eg * (PHASE_MAX - phase)) // PHASE_MAX
+
+
+def psqt_terms(state):
+    """The middlegame and endgame piece-square values for white and the game phase of the state.
+
+    These are kept up to date by each action in the psqt_mg, psqt_eg and phase fields of the state,
+    this computes them from the pieces.
+    """
+    cdef State state_
+    if isinstance(state, np.void):
+        state_ = state
+    elif isinstance(state, np.ndarray):
+        if state.shape[0] > 1:
+            raise ValueError()
+        state_ = state[0]
+    else:
+        raise NotImplementedError()
+    _psqt_terms(&state_)
+    return state_.psqt_mg, state_.psqt_eg, state_.phase
+
+
+def psqt_tables():
+    """The middlegame and endgame piece-square values, (12, 64), the phase, (12,), by piece and the
+    phase at which the value is the middlegame value.
+
+    The values of the black pieces are negative, such that the sum over the pieces on their
+    squares is psqt_mg and psqt_eg of the state. These are the tables of the search evaluation,
+    see psqt_value.
+    """
+    return (
+        np.array(PSQT_MG, dtype=np.int32),
+        np.array(PSQT_EG, dtype=np.int32),
+        np.array(PHASE, dtype=np.int32),
+        int(PHASE_MAX),
+    )
+
+
+@cython.profile(False)
+cdef inline void push_action(ActionList* action_list, Bitboard src, Bitboard dst, long flag) noexcept nogil:
+    action_list.actions[action_list.size].src = src
+    action_list.actions[action_list.size].dst = dst
+    action_list.actions[action_list.size].flag = flag
+    action_list.size += 1
+
+
+cdef State as_state(state) except *:
+    # The state of a STATE_DTYPE record or of a STATE_DTYPE array of one element.
+    if isinstance(state, np.ndarray):
+        if state.shape != (1,):
+            raise ValueError(f"Expected one state, got an array of shape {state.shape}.")
+        state = state[0]
+    return state
+
+
+cdef cnp.ndarray state_to_array(const State* state):
+    cdef cnp.ndarray state_array = np.empty(1, dtype=STATE_DTYPE)
+    memcpy(cnp.PyArray_DATA(state_array), state, sizeof(State))
+    return state_array
+
+
+cdef cnp.ndarray action_list_to_array(const ActionList* action_list):
+    cdef cnp.ndarray actions_array = np.empty(action_list.size, dtype=ACTION_DTYPE)
+    memcpy(cnp.PyArray_DATA(actions_array), action_list.actions, action_list.size * sizeof(Action))
+    return actions_array
+
+
+cdef cnp.ndarray action_list_to_moves(const ActionList* action_list):
+    cdef int i
+    cdef cnp.ndarray moves_array = np.empty(action_list.size, dtype=MOVE_DTYPE)
+    cdef Move* moves = <Move*> cnp.PyArray_DATA(moves_array)
+    for i in range(action_list.size):
+        moves[i] = encode_move(action_list.actions[i])
+    return moves_array
+
+
+@cython.profile(False)
+cdef inline Move encode_move(Action action) noexcept nogil:
+    cdef Move kind
+    if action.flag < castle_queenside_black:
+        kind = action.flag % 8
+    elif action.flag < promote_black_rook:
+        return (MOVE_CASTLE_QUEENSIDE + (action.flag - castle_queenside_black) % 2) << 12
+    else:
+        kind = MOVE_PROMOTE + (action.flag - promote_black_rook) % 5
+    return bitscan(action.src) | bitscan(action.dst) << 6 | kind << 12
+
+
+@cython.profile(False)
+cdef inline Action decode_move(Move move, bint white) noexcept nogil:
+    cdef Action action
+    cdef int kind = move >> 12
+    if kind < MOVE_CASTLE_QUEENSIDE:
+        action.flag = kind + 8 * white
+    elif kind < MOVE_PROMOTE:
+        action.flag = castle_queenside_black + 2 * white + kind - MOVE_CASTLE_QUEENSIDE
+        action.src = 0
+        action.dst = 0
+        return action
+    else:
+        action.flag = promote_black_rook + 5 * white + kind - MOVE_PROMOTE
+    action.src = (<Bitboard> 1) << (move & 63)
+    action.dst = (<Bitboard> 1) << ((move >> 6) & 63)
+    return action
+
+
+cdef inline bint is_packed(actions):
+    return isinstance(actions, (np.ndarray, np.generic)) and actions.dtype == np.uint16
+
+
+def actions_to_moves(actions):
+    """The ACTION_DTYPE actions as packed 16-bit moves, see Move."""
+    cdef const Action[:] actions_view = np.asarray(actions, dtype=ACTION_DTYPE).reshape(-1)
+    cdef cnp.ndarray moves = np.empty(actions_view.shape[0], dtype=MOVE_DTYPE)
+    cdef Move[:] moves_view = moves
+    cdef Py_ssize_t i
+    with nogil:
+        for i in range(actions_view.shape[0]):
+            moves_view[i] = encode_move(actions_view[i])
+    return moves
+
+
+def moves_to_actions(moves, white_player_turn):
+    """The packed 16-bit moves as ACTION_DTYPE actions given whether white is in turn for each."""
+    moves = np.asarray(moves, dtype=MOVE_DTYPE).reshape(-1)
+    cdef const Move[:] moves_view = moves
+    cdef const cnp.npy_bool[:] white_view = np.broadcast_to(
+        np.asarray(white_player_turn, dtype=np.bool_).reshape(-1), moves.shape
+    )
+    cdef cnp.ndarray actions = np.empty(moves_view.shape[0], dtype=ACTION_DTYPE)
+    cdef Action[:] actions_view = actions
+    cdef Py_ssize_t i
+    with nogil:
+        for i in range(moves_view.shape[0]):
+            actions_view[i] = decode_move(moves_view[i], white_view[i])
+    return actions
+
+
+# FEN parsing and serialization, the piece letters in the order of the piece constants. The
+# halfmove clock is ignored on input and written as 0, the fullmove number sets the ply.
+# See: https://www.chessprogramming.org/Forsyth-Edwards_Notation
+cdef const char* FEN_PIECES = b"rnbqkpRNBQKP"
+cdef enum:
+    # Upper bound on the length of a FEN string written by write_fen.
+    MAX_FEN_LENGTH = 128
+
+
+cdef inline int fen_piece(char c) noexcept nogil:
+    cdef int piece
+    for piece in range(12):
+        if FEN_PIECES[piece] == c:
+            return piece
+    return -1
+
+
+cdef int parse_fen(Environment env, const char* fen, Py_ssize_t length, State* state) noexcept nogil:
+    # Parses the FEN of the given length (or up to a NUL) into state, -1 if it is invalid. The
+    # check flags are computed with the attack tables of env.
+    cdef Py_ssize_t i = 0
+    cdef int square = 0
+    cdef int piece, file, rank
+    cdef long fullmove = 0
+    cdef bint white
+    cdef bint K = False, Q = False, k = False, q = False
+    cdef Bitboard en_passant = 0
+    cdef Bitboard* pieces = piece_bitboards(state)
+
+    memset(state, 0, sizeof(State))
+    while i < length and fen[i] == c' ':
+        i += 1
+
+    # piece placement
+    while i < length and fen[i] != c' ' and fen[i] != 0:
+        if c'1' <= fen[i] <= c'8':
+            square += fen[i] - c'0'
+        elif fen[i] == c'/':
+            if square % 8 != 0:
+                return -1
+        else:
+            piece = fen_piece(fen[i])
+            if piece < 0 or square >= 64:
+                return -1
+            pieces[piece] |= (<Bitboard> 1) << square
+            square += 1
+        if square > 64:
+            return -1
+        i += 1
+    if square != 64:
+        return -1
+
+    # player in turn
+    while i < length and fen[i] == c' ':
+        i += 1
+    if i >= length or (fen[i] != c'w' and fen[i] != c'b'):
+        return -1
+    white = fen[i] == c'w'
+    i += 1
+
+    # castling rights
+    while i < length and fen[i] == c' ':
+        i += 1
+    if i >= length or fen[i] == 0:
+        return -1
+    if fen[i] == c'-':
+        i += 1
+    else:
+        while i < length and fen[i] != c' ' and fen[i] != 0:
+            if fen[i] == c'K':
+                K = True
+            elif fen[i] == c'Q':
+                Q = True
+            elif fen[i] == c'k':
+                k = True
+            elif fen[i] == c'q':
+                q = True
+            else:
+                return -1
+            i += 1
+
+    # en passant square
+    while i < length and fen[i] == c' ':
+        i += 1
+    if i >= length or fen[i] == 0:
+        return -1
+    if fen[i] == c'-':
+        i += 1
+    else:
+        if i + 1 >= length or not (c'a' <= fen[i] <= c'h') or not (c'1' <= fen[i + 1] <= c'8'):
+            return -1
+        file = fen[i] - c'a'
+        rank = fen[i + 1] - c'1'
+        en_passant = (<Bitboard> 1) << (8 * (7 - rank) + file)
+        i += 2
+
+    # halfmove clock, ignored, and fullmove number
+    while i < length and fen[i] == c' ':
+        i += 1
+    while i < length and fen[i] != c' ' and fen[i] != 0:
+        i += 1
+    while i < length and fen[i] == c' ':
+        i += 1
+    while i < length and c'0' <= fen[i] <= c'9':
+        fullmove = 10 * fullmove + fen[i] - c'0'
+        i += 1
+    if fullmove == 0:
+        fullmove = 1
+
+    state.white_player_turn = white
+    state.has_white_king_moved = not K and not Q
+    state.has_white_kingside_rook_moved = not K
+    state.has_white_queenside_rook_moved = not Q
+    state.has_black_king_moved = not k and not q
+    state.has_black_kingside_rook_moved = not k
+    state.has_black_queenside_rook_moved = not q
+    if white:
+        state.en_passant_square_white = en_passant
+    else:
+        state.en_passant_square_black = en_passant
+    state.ply = 2 * (fullmove - 1) + (not white)
+    state.zobrist_key = _zobrist_key(state)
+    _psqt_terms(state)
+    state.is_white_check = env._is_white_check(state[0])
+    state.is_black_check = env._is_black_check(state[0])
+    return 0
+
+
+cdef int write_fen(const State* state, char* fen) noexcept nogil:
+    # Writes the FEN of the state to fen, at least MAX_FEN_LENGTH long, returns the length.
+    cdef int i = 0
+    cdef int square, piece, empty, rank, file
+    cdef long fullmove
+    cdef char[24] digits
+    cdef int n_digits = 0
+    cdef Bitboard en_passant
+    cdef const Bitboard* pieces = &state.black_rook
+    for rank in range(8):
+        empty = 0
+        for file in range(8):
+            square = 8 * rank + file
+            for piece in range(12):
+                if pieces[piece] & ((<Bitboard> 1) << square):
+                    break
+            else:
+                empty += 1
+                continue
+            if empty:
+                fen[i] = c'0' + empty
+                i += 1
+                empty = 0
+            fen[i] = FEN_PIECES[piece]
+            i += 1
+        if empty:
+            fen[i] = c'0' + empty
+            i += 1
+        if rank < 7:
+            fen[i] = c'/'
+            i += 1
+
+    fen[i] = c' '
+    fen[i + 1] = c'w' if state.white_player_turn else c'b'
+    fen[i + 2] = c' '
+    i += 3
+
+    if not state.has_white_king_moved and not state.has_white_kingside_rook_moved:
+        fen[i] = c'K'
+        i += 1
+    if not state.has_white_king_moved and not state.has_white_queenside_rook_moved:
+        fen[i] = c'Q'
+        i += 1
+    if not state.has_black_king_moved and not state.has_black_kingside_rook_moved:
+        fen[i] = c'k'
+        i += 1
+    if not state.has_black_king_moved and not state.has_black_queenside_rook_moved:
+        fen[i] = c'q'
+        i += 1
+    if fen[i - 1] == c' ':
+        fen[i] = c'-'
+        i += 1
+    fen[i] = c' '
+    i += 1
+
+    en_passant = state.en_passant_square_white | state.en_passant_square_black
+    if en_passant:
+        square = bitscan(en_passant)
+        fen[i] = c'a' + square % 8
+        fen[i + 1] = c'8' - square // 8
+        i += 2
+    else:
+        fen[i] = c'-'
+        i += 1
+
+    fen[i] = c' '
+    fen[i + 1] = c'0'
+    fen[i + 2] = c' '
+    i += 3
+    fullmove = state.ply // 2 + 1
+    while True:
+        digits[n_digits] = c'0' + fullmove % 10
+        n_digits += 1
+        fullmove //= 10
+        if fullmove == 0:
+            break
+    while n_digits:
+        n_digits -= 1
+        fen[i] = digits[n_digits]
+        i += 1
+    fen[i] = 0
+    return i
+
+
+cdef Environment _fen_env():
+    # The shared Environment of the chess package, imported on use as chess imports this module.
+    from chess import get_env
+    return get_env()
+
+
+def state_from_fen(fen):
+    """The state of a FEN string as a STATE_DTYPE array of one element."""
+    cdef bytes fen_bytes = fen.encode("ascii") if isinstance(fen, str) else bytes(fen)
+    cdef State state
+    if parse_fen(_fen_env(), fen_bytes, len(fen_bytes), &state) < 0:
+        raise ValueError(f"Invalid FEN: {fen}")
+    return state_to_array(&state)
+
+
+def state_to_fen(state):
+    """The FEN string of a state."""
+    cdef State state_
+    cdef char[MAX_FEN_LENGTH] fen
+    if isinstance(state, np.ndarray):
+        if state.shape[0] > 1:
+            raise ValueError()
+        state = state[0]
+    state_ = state
+    return fen[:write_fen(&state_, fen)].decode("ascii")
+
+
+def states_from_fens(fens):
+    """The states of a list or array of FEN strings in one call.
+
+    An array of bytes strings, e.g. read with np.loadtxt(path, dtype="S100", delimiter="\\n"), is
+    parsed without the GIL.
+    """
+    cdef cnp.ndarray buffer
+    cdef const char* data
+    cdef Py_ssize_t itemsize, i, n
+    cdef cnp.ndarray states
+    cdef State* states_data
+    cdef int invalid = -1
+    cdef bytes fen_bytes
+    cdef Environment env = _fen_env()
+    if isinstance(fens, np.ndarray) and fens.dtype.kind == "S":
+        buffer = np.ascontiguousarray(fens.reshape(-1))
+        data = <const char*> buffer.data
+        itemsize = buffer.dtype.itemsize
+        n = buffer.shape[0]
+        states = np.empty(n, dtype=STATE_DTYPE)
+        states_data = <State*> states.data
+        with nogil:
+            for i in range(n):
+                if parse_fen(env, data + i * itemsize, itemsize, &states_data[i]) < 0:
+                    invalid = i
+                    break
+        if invalid >= 0:
+            raise ValueError(f"Invalid FEN at index {invalid}: {fens.reshape(-1)[invalid]}")
+        return states
+    fens = list(fens)
+    states = np.empty(len(fens), dtype=STATE_DTYPE)
+    states_data = <State*> states.data
+    for i, fen in enumerate(fens):
+        fen_bytes = fen.encode("ascii") if isinstance(fen, str) else bytes(fen)
+        if parse_fen(env, fen_bytes, len(fen_bytes), &states_data[i]) < 0:
+            raise ValueError(f"Invalid FEN at index {i}: {fen}")
+    return states
+
+
+def states_to_fens(states):
+    """The FEN strings of an array of states in one call."""
+    cdef const State[:] states_view = np.asarray(states, dtype=STATE_DTYPE).reshape(-1)
+    cdef cnp.ndarray fens = np.zeros(states_view.shape[0], dtype=f"S{MAX_FEN_LENGTH}")
+    cdef char* data = <char*> fens.data
+    cdef Py_ssize_t i
+    with nogil:
+        for i in range(states_view.shape[0]):
+            write_fen(&states_view[i], data + i * MAX_FEN_LENGTH)
+    return [fen.decode("ascii") for fen in fens]
+
+
+# Planes of the states for neural networks, see encode_planes.
+cdef enum:
+    PLANE_WHITE_PLAYER_TURN = 12
+    PLANE_CASTLING = 13
+    PLANE_EN_PASSANT = 17
+    N_PLANES = 18
+
+ctypedef fused Plane:
+    cnp.float32_t
+    cnp.uint8_t
+
+
+cdef void _encode_planes(const State* states, Py_ssize_t n, Plane* out, bint flip) noexcept nogil:
+    cdef Py_ssize_t i
+    cdef int piece, square, mirror, swap
+    cdef Bitboard bb
+    cdef Bitboard* pieces
+    cdef Plane* planes
+    cdef cnp.npy_bool castling[4]
+    for i in range(n):
+        planes = out + i * N_PLANES * 64
+        memset(planes, 0, N_PLANES * 64 * sizeof(Plane))
+        # With flip black in turn is encoded as white in turn on the board mirrored top to bottom.
+        swap = 6 if flip and not states[i].white_player_turn else 0
+        mirror = 56 if swap else 0
+        pieces = piece_bitboards(<State*> &states[i])
+        for piece in range(12):
+            bb = pieces[piece]
+            while bb:
+                planes[((piece + swap) % 12) * 64 + (pop_lsb(&bb) ^ mirror)] = 1
+        if states[i].white_player_turn:
+            for square in range(64):
+                planes[PLANE_WHITE_PLAYER_TURN * 64 + square] = 1
+        castling[0] = not (states[i].has_white_king_moved or states[i].has_white_kingside_rook_moved)
+        castling[1] = not (states[i].has_white_king_moved or states[i].has_white_queenside_rook_moved)
+        castling[2] = not (states[i].has_black_king_moved or states[i].has_black_kingside_rook_moved)
+        castling[3] = not (states[i].has_black_king_moved or states[i].has_black_queenside_rook_moved)
+        for piece in range(4):
+            if castling[(piece + swap // 3) % 4]:
+                for square in range(64):
+                    planes[(PLANE_CASTLING + piece) * 64 + square] = 1
+        bb = states[i].en_passant_square_black | states[i].en_passant_square_white
+        if bb:
+            planes[PLANE_EN_PASSANT * 64 + (bitscan(bb) ^ mirror)] = 1
+
+
+def encode_planes(states, out=None, flip=False):
+    """The (N, 18, 8, 8) planes of the N states as input to a neural network.
+
+    The planes 0, ..., 11 are the pieces in the order of the piece constants, 1 on the squares of
+    the piece with A8 at [0, 0] and H1 at [7, 7]. The plane 12 is 1 if white is in turn, the planes
+    13, ..., 16 are 1 if white can castle kingside and queenside and black can castle kingside and
+    queenside and the plane 17 is 1 on the en passant square.
+
+    With flip the states with black in turn are mirrored top to bottom and the colors are swapped,
+    such that the player in turn is always in the white planes and moves up the board. The plane 12
+    is still the color in turn.
+
+    The planes are written without the GIL to out if given, a C-contiguous float32 or uint8 array
+    of shape (N, 18, 8, 8), e.g. a preallocated batch of a data loader, and out is returned.
+    """
+    states = np.ascontiguousarray(states, dtype=STATE_DTYPE).reshape(-1)
+    cdef Py_ssize_t n = states.shape[0]
+    cdef const State* states_data = <const State*> cnp.PyArray_DATA(states)
+    cdef bint flip_ = flip
+    cdef cnp.ndarray out_
+    if out is None:
+        out = np.empty((n, N_PLANES, 8, 8), dtype=np.float32)
+    if not isinstance(out, np.ndarray) or out.dtype not in (np.float32, np.uint8):
+        raise ValueError("Expected out to be a float32 or uint8 array.")
+    if out.shape != (n, N_PLANES, 8, 8):
+        raise ValueError(f"Expected out of shape {(n, N_PLANES, 8, 8)}, got {out.shape}.")
+    if not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError("Expected out to be a writeable C-contiguous array.")
+    out_ = out
+    if out.dtype == np.float32:
+        with nogil:
+            _encode_planes(states_data, n, <cnp.float32_t*> cnp.PyArray_DATA(out_), flip_)
+    else:
+        with nogil:
+            _encode_planes(states_data, n, <cnp.uint8_t*> cnp.PyArray_DATA(out_), flip_)
+    return out
+
+
 cdef Bitboard ij_to_bb(int i, int j):
     cdef Bitboard cursor = 1
     for i_ in range(8):
@@ -310,27 +1155,79 @@ cdef bint inside_board(long i, long j):
     return 0 <= i <= 7 and 0 <= j <= 7
 
 
-cdef int pop_count(Bitboard x):
-    cdef int i
-    count = 0
-    for i in range(64):
-        count += x & 1
-        x >>= 1
-    return count
+@cython.profile(False)
+cdef inline int pop_count(Bitboard x) noexcept nogil:
+    return chess_popcount(x)
 
 
-cdef Bitboard blockers(int blocker_idx, Bitboard b):
-    cdef int i
+cdef Bitboard blockers(int blocker_idx, Bitboard b) noexcept nogil:
+    # The subset of the squares of b selected by the bits of blocker_idx.
+    cdef int i, square
     cdef Bitboard blockers = 0
-    bits = pop_count(b)
+    cdef int bits = pop_count(b)
     for i in range(bits):
-        bit_index = (b&-b).bit_length()-1
+        square = pop_lsb(&b)
         if blocker_idx & (1 << i):
-            blockers |= (1 << bit_index)
-        b &= b - 1
+            blockers |= (<Bitboard> 1) << square
     return blockers
 
 
+cdef Bitboard rook_rays(int i, int j, Bitboard blockers):
+    # Attacks of a rook at (i, j), each ray stops at the first blocker.
+    cdef int step
+    cdef Bitboard attackset = 0
+
+    for step in range(1, i + 1):
+        attackset |= IJ_TO_BB[i - step][j]
+        if IJ_TO_BB[i - step][j] & blockers:
+            break
+
+    for step in range(1, 8 - i):
+        attackset |= IJ_TO_BB[i + step][j]
+        if IJ_TO_BB[i + step][j] & blockers:
+            break
+
+    for step in range(1, j + 1):
+        attackset |= IJ_TO_BB[i][j - step]
+        if IJ_TO_BB[i][j - step] & blockers:
+            break
+
+    for step in range(1, 8 - j):
+        attackset |= IJ_TO_BB[i][j + step]
+        if IJ_TO_BB[i][j + step] & blockers:
+            break
+
+    return attackset
+
+
+cdef Bitboard bishop_rays(int i, int j, Bitboard blockers):
+    # Attacks of a bishop at (i, j), each ray stops at the first blocker.
+    cdef int step
+    cdef Bitboard attackset = 0
+
+    for step in range(1, min(8 - i, 8 - j)):
+        attackset |= IJ_TO_BB[i + step][j + step]
+        if IJ_TO_BB[i + step][j + step] & blockers:
+            break
+
+    for step in range(1, min(i + 1, 8 - j)):
+        attackset |= IJ_TO_BB[i - step][j + step]
+        if IJ_TO_BB[i - step][j + step] & blockers:
+            break
+
+    for step in range(1, min(i + 1, j + 1)):
+        attackset |= IJ_TO_BB[i - step][j - step]
+        if IJ_TO_BB[i - step][j - step] & blockers:
+            break
+
+    for step in range(1, min(8 - i, j + 1)):
+        attackset |= IJ_TO_BB[i + step][j - step]
+        if IJ_TO_BB[i + step][j - step] & blockers:
+            break
+
+    return attackset
+
+
 def bb_to_ijs(bb):
     ijs = []
     for i in range(8):
@@ -348,67 +1245,258 @@ def bb_to_ij(bb):
 
 cdef class Environment:
     # A stateless environment with two main public methods: actions(state) and step(state, action).
-    cdef readonly cpp_map[Bitboard, Bitboard] _king_attackset_lookup
-    cdef readonly cpp_map[Bitboard, Bitboard] _knight_attackset_lookup
-    
-    cdef readonly cpp_map[Bitboard, Bitboard] _rook_to_magic_lookup
-    cdef readonly cpp_map[Bitboard, Bitboard] _rook_magic_shifts_lookup
-    cdef readonly cpp_map[Bitboard, Bitboard] _rook_blockermask_lookup
-    cdef readonly cpp_map[Bitboard, cpp_map[Bitboard, Bitboard]] _rook_table_lookup
-    
-    cdef readonly cpp_map[Bitboard, Bitboard] _bishop_to_magic_lookup
-    cdef readonly cpp_map[Bitboard, Bitboard] _bishop_magic_shifts_lookup
-    cdef readonly cpp_map[Bitboard, Bitboard] _bishop_blockermask_lookup
-    cdef readonly cpp_map[Bitboard, cpp_map[Bitboard, Bitboard]] _bishop_table_lookup
-
-    def __init__(self):
-        self._init_king_attackset_lookup()
-        self._init_knight_attackset_lookup()
-        
-        self._init_rook_to_magic_lookup()
-        self._init_rook_magic_shifts_lookup()
-        self._init_rook_blockermask_lookup()
-        self._init_rook_table_lookup()
+    # The attributes and cdef methods are declared in _environment.pxd.
+
+    def __init__(self, cache=True):
+        self._init_king_attacks()
+        self._init_knight_attacks()
+        self._init_rook_magics()
+        self._init_bishop_magics()
+
+        # The rook and bishop attack tables are memory-mapped from the cache when possible.
+        attack_tables = _tables.load_attack_tables() if cache else None
+        if attack_tables is None:
+            self._init_rook_attacks()
+            self._init_bishop_attacks()
+            if cache:
+                _tables.save_attack_tables(self.attack_tables())
+        else:
+            self._set_rook_attacks(attack_tables[:self._rook_attacks_size()])
+            self._set_bishop_attacks(attack_tables[self._rook_attacks_size():])
 
-        self._init_bishop_to_magic_lookup()
-        self._init_bishop_magic_shifts_lookup()
-        self._init_bishop_blockermask_lookup()
-        self._init_bishop_table_lookup()
+    def attack_tables(self):
+        """The rook and bishop attack tables concatenated as stored in the cache."""
+        return np.concatenate([self._rook_attacks, self._bishop_attacks])
 
-    def actions(self, state):
+    def actions(self, state, packed=False):
+        # With packed=True the actions are returned as packed 16-bit moves, see Move.
         if isinstance(state, np.void):
-            return self._actions(state)
+            return self._actions(state, packed)
         elif isinstance(state, np.ndarray):
             if state.shape[0] > 1:
                 raise ValueError()
-            return self._actions(state[0])
+            return self._actions(state[0], packed)
         else:
             raise NotImplementedError()
     
-    cdef _actions(self, State state):
-        cdef cnp.ndarray[Action, ndim=1] actions_array
-        cdef cnp.ndarray[State, ndim=1] next_state
-        actions_array = self._pseudo_actions(state)
-        next_state = self._step(state, actions_array, _step_ahead=False)
-        if state.white_player_turn:
-            return actions_array[~next_state["is_white_check"]]
+    cdef _actions(self, State state, bint packed=False):
+        cdef ActionList action_list
+        self._generate_actions(&state, &action_list)
+        if packed:
+            return action_list_to_moves(&action_list)
+        return action_list_to_array(&action_list)
+
+    cdef void _generate_actions(self, const State* state, ActionList* action_list) noexcept nogil:
+        # The legal actions, in the order of the pseudo actions. The checkers and the pinned pieces
+        # are computed once such that only legal actions are generated. When in check the actions
+        # other than king actions capture the checker or block its ray, in double check only the
+        # king moves. En passant captures, which can expose the king along the rank of both pawns,
+        # are tested by making them. Without exactly one king the pseudo actions are filtered.
+        # See: https://www.chessprogramming.org/Move_Generation#Legal
+        cdef const Bitboard* pieces = &state.black_rook
+        cdef bint white = state.white_player_turn
+        cdef int us = WHITE_ROOK if white else BLACK_ROOK
+        cdef int them = BLACK_ROOK if white else WHITE_ROOK
+        cdef Bitboard king = pieces[us + BLACK_KING]
+        cdef Bitboard color, other_color, occupied, attackset, target, checkers, pinned
+        cdef Bitboard snipers, between, en_passant_square, en_passant_pawn, candidates
+        cdef Bitboard other_rook_queen, other_bishop_queen
+        cdef int king_square, i
+        cdef Action action
+        cdef State next_state
+
+        if king == EMPTY or king & (king - 1):
+            self._generate_pseudo_actions(state, action_list)
+            self._filter_legal_actions(state, action_list)
+            return
+        action_list.size = 0
+        king_square = bitscan(king)
+        color = EMPTY
+        other_color = EMPTY
+        for i in range(6):
+            color |= pieces[us + i]
+            other_color |= pieces[them + i]
+        occupied = color | other_color
+        other_rook_queen = pieces[them + BLACK_ROOK] | pieces[them + BLACK_QUEEN]
+        other_bishop_queen = pieces[them + BLACK_BISHOP] | pieces[them + BLACK_QUEEN]
+
+        checkers = (
+            (self._knight_attacks[king_square] & pieces[them + BLACK_KNIGHT])
+            | (self.rook_attacks(king_square, occupied) & other_rook_queen)
+            | (self.bishop_attacks(king_square, occupied) & other_bishop_queen)
+        )
+        if white:
+            checkers |= self.white_pawn_attackset(king) & pieces[them + BLACK_PAWN]
         else:
-            return actions_array[~next_state["is_black_check"]]
-    
-    def pseudo_actions(self, state):
+            checkers |= self.black_pawn_attackset(king) & pieces[them + BLACK_PAWN]
+
+        # a piece of the player alone between the king and a rook, bishop or queen is pinned
+        pinned = EMPTY
+        snipers = (
+            (self.rook_attacks(king_square, other_color) & other_rook_queen)
+            | (self.bishop_attacks(king_square, other_color) & other_bishop_queen)
+        )
+        while snipers:
+            between = BETWEEN[king_square][bitscan(snipers)] & occupied
+            if between and not (between & (between - 1)) and between & color:
+                pinned |= between
+            snipers &= snipers - 1
+
+        # the squares attacked by the other player with the king removed, such that the king does
+        # not step back along the ray of a checking rook, bishop or queen
+        attackset = (
+            self.king_attackset(pieces[them + BLACK_KING])
+            | self._rook_attackset(other_rook_queen, occupied & ~king)
+            | self.knight_attackset(pieces[them + BLACK_KNIGHT])
+            | self._bishop_attackset(other_bishop_queen, occupied & ~king)
+        )
+        if white:
+            attackset |= self.black_pawn_attackset(pieces[them + BLACK_PAWN])
+        else:
+            attackset |= self.white_pawn_attackset(pieces[them + BLACK_PAWN])
+
+        target = ~color
+        if checkers & (checkers - 1):
+            target = EMPTY
+        elif checkers:
+            target &= checkers | BETWEEN[king_square][bitscan(checkers)]
+
+        en_passant_square = state.en_passant_square_white if white else state.en_passant_square_black
+        en_passant_pawn = EMPTY
+        if en_passant_square:
+            if white:
+                candidates = self.black_pawn_attackset(en_passant_square) & pieces[us + BLACK_PAWN]
+            else:
+                candidates = self.white_pawn_attackset(en_passant_square) & pieces[us + BLACK_PAWN]
+            while candidates:
+                action.src = candidates & -candidates
+                action.dst = en_passant_square
+                action.flag = move_white_pawn_en_passant if white else move_black_pawn_en_passant
+                next_state = state[0]
+                self._make_action(&next_state, action)
+                if not (next_state.is_white_check if white else next_state.is_black_check):
+                    en_passant_pawn |= action.src
+                candidates &= candidates - 1
+
+        self._king_actions(action_list, king, color, attackset, BLACK_KING + 8 * white)
+        self._knight_actions(action_list, pieces[us + BLACK_KNIGHT], target, pinned, king_square, BLACK_KNIGHT + 8 * white)
+        self._rook_actions(action_list, pieces[us + BLACK_ROOK], occupied, target, pinned, king_square, BLACK_ROOK + 8 * white)
+        self._bishop_actions(action_list, pieces[us + BLACK_BISHOP], occupied, target, pinned, king_square, BLACK_BISHOP + 8 * white)
+        self._queen_actions(action_list, pieces[us + BLACK_QUEEN], occupied, target, pinned, king_square, BLACK_QUEEN + 8 * white)
+        if white:
+            self._white_pawn_actions(action_list, state.white_pawn, occupied, other_color, en_passant_square, en_passant_pawn, target, pinned, king_square)
+            self._white_rook_queenside_castling_actions(action_list, state.white_rook, king, occupied, attackset, state.has_white_king_moved, state.has_white_queenside_rook_moved)
+            self._white_rook_kingside_castling_actions(action_list, state.white_rook, king, occupied, attackset, state.has_white_king_moved, state.has_white_kingside_rook_moved)
+        else:
+            self._black_pawn_actions(action_list, state.black_pawn, occupied, other_color, en_passant_square, en_passant_pawn, target, pinned, king_square)
+            self._black_rook_queenside_castling_actions(action_list, state.black_rook, king, occupied, attackset, state.has_black_king_moved, state.has_black_queenside_rook_moved)
+            self._black_rook_kingside_castling_actions(action_list, state.black_rook, king, occupied, attackset, state.has_black_king_moved, state.has_black_kingside_rook_moved)
+
+    cdef void _filter_legal_actions(self, const State* state, ActionList* action_list) noexcept nogil:
+        # Removes the pseudo actions leaving the king of the player in check.
+        cdef int i
+        cdef int size = 0
+        cdef State next_state
+        for i in range(action_list.size):
+            next_state = state[0]
+            self._make_action(&next_state, action_list.actions[i])
+            if not (next_state.is_white_check if state.white_player_turn else next_state.is_black_check):
+                action_list.actions[size] = action_list.actions[i]
+                size += 1
+        action_list.size = size
+
+    def actions_batch(self, states, packed=False):
+        """The legal actions of each of the N states in one call.
+
+        Returns the actions of all states concatenated and the N + 1 offsets such that the actions
+        of states[i] are actions[offsets[i]:offsets[i + 1]]. With packed=True the actions are
+        packed 16-bit moves.
+        """
+        cdef const State[:] states_view = np.asarray(states, dtype=STATE_DTYPE).reshape(-1)
+        cdef cpp_vector[Action] actions
+        cdef cpp_vector[Move] moves
+        cdef cnp.ndarray[cnp.int64_t, ndim=1] offsets = np.zeros(states_view.shape[0] + 1, dtype=np.int64)
+        cdef cnp.ndarray actions_array
+        cdef ActionList action_list
+        cdef bint packed_ = packed
+        cdef Py_ssize_t i
+        cdef int j
+        with nogil:
+            if packed_:
+                moves.reserve(32 * states_view.shape[0])
+            else:
+                actions.reserve(32 * states_view.shape[0])
+            for i in range(states_view.shape[0]):
+                self._generate_actions(&states_view[i], &action_list)
+                if packed_:
+                    for j in range(action_list.size):
+                        moves.push_back(encode_move(action_list.actions[j]))
+                    offsets[i + 1] = moves.size()
+                else:
+                    for j in range(action_list.size):
+                        actions.push_back(action_list.actions[j])
+                    offsets[i + 1] = actions.size()
+        if packed_:
+            actions_array = np.empty(moves.size(), dtype=MOVE_DTYPE)
+            if moves.size() > 0:
+                memcpy(cnp.PyArray_DATA(actions_array), moves.data(), moves.size() * sizeof(Move))
+            return actions_array, offsets
+        actions_array = np.empty(actions.size(), dtype=ACTION_DTYPE)
+        if actions.size() > 0:
+            memcpy(cnp.PyArray_DATA(actions_array), actions.data(), actions.size() * sizeof(Action))
+        return actions_array, offsets
+
+    def step_batch(self, states, actions, terminal=False):
+        """The N next states of taking actions[i] in states[i] in one call.
+
+        The actions are ACTION_DTYPE actions or packed 16-bit moves.
+        """
+        states = np.asarray(states, dtype=STATE_DTYPE).reshape(-1)
+        if is_packed(actions):
+            actions = moves_to_actions(actions, states["white_player_turn"])
+        cdef const State[:] states_view = states
+        cdef const Action[:] actions_view = np.asarray(actions, dtype=ACTION_DTYPE).reshape(-1)
+        cdef cnp.ndarray next_states
+        cdef State[:] next_states_view
+        cdef bint step_ahead = terminal
+        cdef Py_ssize_t i
+        if states_view.shape[0] != actions_view.shape[0]:
+            raise ValueError(
+                f"Expected one action per state, got {actions_view.shape[0]} actions "
+                f"for {states_view.shape[0]} states."
+            )
+        next_states = np.empty(states_view.shape[0], dtype=STATE_DTYPE)
+        next_states_view = next_states
+        with nogil:
+            for i in range(states_view.shape[0]):
+                next_states_view[i] = states_view[i]
+                self._make_action(&next_states_view[i], actions_view[i])
+                if step_ahead:
+                    self._update_terminal(&next_states_view[i])
+        return next_states
+
+    def pseudo_actions(self, state, packed=False):
+        # With packed=True the actions are returned as packed 16-bit moves, see Move.
         if isinstance(state, np.void):
-            return self._pseudo_actions(state)
+            return self._pseudo_actions(state, packed)
         elif isinstance(state, np.ndarray):
             if state.shape[0] > 1:
                 raise ValueError()
-            return self._pseudo_actions(state[0])
+            return self._pseudo_actions(state[0], packed)
         else:
             raise NotImplementedError()
             
-    cdef _pseudo_actions(self, State state):
+    cdef _pseudo_actions(self, State state, bint packed=False):
+        cdef ActionList action_list
+        self._generate_pseudo_actions(&state, &action_list)
+        if packed:
+            return action_list_to_moves(&action_list)
+        return action_list_to_array(&action_list)
+
+    cdef void _generate_pseudo_actions(self, const State* state, ActionList* action_list) noexcept nogil:
         cdef Bitboard color, other_color, occupied, other_attackset
-        cdef cpp_vector[Action] action_vector = []
-        
+        action_list.size = 0
+
         if state.white_player_turn:
             
             color = state.white_rook | state.white_knight | state.white_bishop | state.white_queen | state.white_king | state.white_pawn
@@ -416,20 +1504,20 @@ cdef class Environment:
             occupied = color | other_color
             other_attackset = (
                 self.king_attackset(state.black_king)
-                | self.rook_attackset(state.black_rook | state.black_queen, occupied)
+                | self._rook_attackset(state.black_rook | state.black_queen, occupied)
                 | self.knight_attackset(state.black_knight)
-                | self.bishop_attackset(state.black_bishop | state.black_queen, occupied)
+                | self._bishop_attackset(state.black_bishop | state.black_queen, occupied)
                 | self.black_pawn_attackset(state.black_pawn)
             )
             
-            self._king_actions(action_vector, state.white_king, color, other_attackset, ActionFlag.move_white_king)
-            self._knight_actions(action_vector, state.white_knight, color, ActionFlag.move_white_knight)
-            self._rook_actions(action_vector, state.white_rook, occupied, color, ActionFlag.move_white_rook)
-            self._bishop_actions(action_vector, state.white_bishop, occupied, color, ActionFlag.move_white_bishop)
-            self._queen_actions(action_vector, state.white_queen, occupied, color, ActionFlag.move_white_queen)
-            self._white_pawn_actions(action_vector, state.white_pawn, occupied, other_color, state.en_passant_square_white)
-            self._white_rook_queenside_castling_actions(action_vector, state.white_rook, state.white_king, occupied, state.has_white_king_moved, state.has_white_queenside_rook_moved)
-            self._white_rook_kingside_castling_actions(action_vector, state.white_rook, state.white_king, occupied, state.has_white_king_moved, state.has_white_kingside_rook_moved)
+            self._king_actions(action_list, state.white_king, color, other_attackset, ActionFlag.move_white_king)
+            self._knight_actions(action_list, state.white_knight, ~color, EMPTY, 0, ActionFlag.move_white_knight)
+            self._rook_actions(action_list, state.white_rook, occupied, ~color, EMPTY, 0, ActionFlag.move_white_rook)
+            self._bishop_actions(action_list, state.white_bishop, occupied, ~color, EMPTY, 0, ActionFlag.move_white_bishop)
+            self._queen_actions(action_list, state.white_queen, occupied, ~color, EMPTY, 0, ActionFlag.move_white_queen)
+            self._white_pawn_actions(action_list, state.white_pawn, occupied, other_color, state.en_passant_square_white, ~EMPTY, ~color, EMPTY, 0)
+            self._white_rook_queenside_castling_actions(action_list, state.white_rook, state.white_king, occupied, other_attackset, state.has_white_king_moved, state.has_white_queenside_rook_moved)
+            self._white_rook_kingside_castling_actions(action_list, state.white_rook, state.white_king, occupied, other_attackset, state.has_white_king_moved, state.has_white_kingside_rook_moved)
         
         else:
             
@@ -438,42 +1526,111 @@ cdef class Environment:
             occupied = color | other_color
             other_attackset = (
                 self.king_attackset(state.white_king)
-                | self.rook_attackset(state.white_rook | state.white_queen, occupied)
+                | self._rook_attackset(state.white_rook | state.white_queen, occupied)
                 | self.knight_attackset(state.white_knight)
-                | self.bishop_attackset(state.white_bishop | state.white_queen, occupied)
+                | self._bishop_attackset(state.white_bishop | state.white_queen, occupied)
                 | self.white_pawn_attackset(state.white_pawn)
             )
     
-            self._king_actions(action_vector, state.black_king, color, other_attackset, ActionFlag.move_black_king)
-            self._knight_actions(action_vector, state.black_knight, color, ActionFlag.move_black_knight)
-            self._rook_actions(action_vector, state.black_rook, occupied, color, ActionFlag.move_black_rook)
-            self._bishop_actions(action_vector, state.black_bishop, occupied, color, ActionFlag.move_black_bishop)
-            self._queen_actions(action_vector, state.black_queen, occupied, color, ActionFlag.move_black_queen)
-            self._black_pawn_actions(action_vector, state.black_pawn, occupied, other_color, state.en_passant_square_black)
-            self._black_rook_queenside_castling_actions(action_vector, state.black_rook, state.black_king, occupied, state.has_black_king_moved, state.has_black_queenside_rook_moved)
-            self._black_rook_kingside_castling_actions(action_vector, state.black_rook, state.black_king, occupied, state.has_black_king_moved, state.has_black_kingside_rook_moved)
+            self._king_actions(action_list, state.black_king, color, other_attackset, ActionFlag.move_black_king)
+            self._knight_actions(action_list, state.black_knight, ~color, EMPTY, 0, ActionFlag.move_black_knight)
+            self._rook_actions(action_list, state.black_rook, occupied, ~color, EMPTY, 0, ActionFlag.move_black_rook)
+            self._bishop_actions(action_list, state.black_bishop, occupied, ~color, EMPTY, 0, ActionFlag.move_black_bishop)
+            self._queen_actions(action_list, state.black_queen, occupied, ~color, EMPTY, 0, ActionFlag.move_black_queen)
+            self._black_pawn_actions(action_list, state.black_pawn, occupied, other_color, state.en_passant_square_black, ~EMPTY, ~color, EMPTY, 0)
+            self._black_rook_queenside_castling_actions(action_list, state.black_rook, state.black_king, occupied, other_attackset, state.has_black_king_moved, state.has_black_queenside_rook_moved)
+            self._black_rook_kingside_castling_actions(action_list, state.black_rook, state.black_king, occupied, other_attackset, state.has_black_king_moved, state.has_black_kingside_rook_moved)
             
-        if action_vector.size() == 0:
-            return np.array([], dtype=ACTION_DTYPE)
-    
-        # Cast memoryview of cpp vector to numpy array
-        cdef Action [::1] actions_view = <Action [:action_vector.size()]>action_vector.data()
-        cdef cnp.ndarray[Action, ndim=1] actions_array = np.asarray(actions_view, dtype=ACTION_DTYPE)
-        return actions_array
-    
-    def step(self, state, action):
+
+    def pseudo_captures(self, state, packed=False):
+        # The pseudo actions capturing a piece or promoting a pawn, the actions searched by the
+        # quiescence search. With packed=True the actions are returned as packed 16-bit moves.
+        if isinstance(state, np.void):
+            return self._pseudo_captures(state, packed)
+        elif isinstance(state, np.ndarray):
+            if state.shape[0] > 1:
+                raise ValueError()
+            return self._pseudo_captures(state[0], packed)
+        else:
+            raise NotImplementedError()
+
+    cdef _pseudo_captures(self, State state, bint packed=False):
+        cdef ActionList action_list
+        self._generate_captures(&state, &action_list)
+        if packed:
+            return action_list_to_moves(&action_list)
+        return action_list_to_array(&action_list)
+
+    cdef void _generate_captures(self, const State* state, ActionList* action_list) noexcept nogil:
+        # The pseudo actions to a square of the other player and the pawn promotions, in the order
+        # of the pseudo actions. The piece generators of the pseudo actions are given the other
+        # player as target, and the last rank for pawns, hence castling and quiet moves are left
+        # out.
+        cdef const Bitboard* pieces = &state.black_rook
+        cdef bint white = state.white_player_turn
+        cdef int us = WHITE_ROOK if white else BLACK_ROOK
+        cdef int them = BLACK_ROOK if white else WHITE_ROOK
+        cdef Bitboard color = EMPTY
+        cdef Bitboard other_color = EMPTY
+        cdef Bitboard occupied, other_attackset
+        cdef int i
+        action_list.size = 0
+        for i in range(6):
+            color |= pieces[us + i]
+            other_color |= pieces[them + i]
+        occupied = color | other_color
+        other_attackset = (
+            self.king_attackset(pieces[them + BLACK_KING])
+            | self._rook_attackset(pieces[them + BLACK_ROOK] | pieces[them + BLACK_QUEEN], occupied)
+            | self.knight_attackset(pieces[them + BLACK_KNIGHT])
+            | self._bishop_attackset(pieces[them + BLACK_BISHOP] | pieces[them + BLACK_QUEEN], occupied)
+        )
+        if white:
+            other_attackset |= self.black_pawn_attackset(pieces[them + BLACK_PAWN])
+        else:
+            other_attackset |= self.white_pawn_attackset(pieces[them + BLACK_PAWN])
+
+        self._king_actions(action_list, pieces[us + BLACK_KING], ~other_color, other_attackset, BLACK_KING + 8 * white)
+        self._knight_actions(action_list, pieces[us + BLACK_KNIGHT], other_color, EMPTY, 0, BLACK_KNIGHT + 8 * white)
+        self._rook_actions(action_list, pieces[us + BLACK_ROOK], occupied, other_color, EMPTY, 0, BLACK_ROOK + 8 * white)
+        self._bishop_actions(action_list, pieces[us + BLACK_BISHOP], occupied, other_color, EMPTY, 0, BLACK_BISHOP + 8 * white)
+        self._queen_actions(action_list, pieces[us + BLACK_QUEEN], occupied, other_color, EMPTY, 0, BLACK_QUEEN + 8 * white)
+        if white:
+            self._white_pawn_actions(action_list, state.white_pawn, occupied, other_color, state.en_passant_square_white, ~EMPTY, other_color | RANK_8, EMPTY, 0)
+        else:
+            self._black_pawn_actions(action_list, state.black_pawn, occupied, other_color, state.en_passant_square_black, ~EMPTY, other_color | RANK_1, EMPTY, 0)
+
+    def step(self, state, action, terminal=False):
+        # The checkmate and draw flags are only computed if terminal=True, otherwise they are
+        # False and can be computed on demand with terminal(state). The action is an ACTION_DTYPE
+        # action or a packed 16-bit move.
         if isinstance(action, np.void):
             action = np.asarray(action, dtype=ACTION_DTYPE).reshape(-1)
+        elif is_packed(action):
+            action = moves_to_actions(action, state["white_player_turn"])
         if isinstance(state, np.void):
-            return self._step(state, action, _step_ahead=True)
+            return self._step(state, action, _step_ahead=terminal)
         elif isinstance(state, np.ndarray):
             if state.shape[0] > 1:
                 raise ValueError()
-            return self._step(state[0], action, _step_ahead=True)
+            return self._step(state[0], action, _step_ahead=terminal)
         else:
             raise NotImplementedError()
-    
-    cdef _step(self, State state, const Action [:] action, cnp.npy_bool _step_ahead=True):
+
+    def terminal(self, state):
+        cdef State state_
+        if isinstance(state, np.void):
+            state_ = state
+        elif isinstance(state, np.ndarray):
+            if state.shape[0] > 1:
+                raise ValueError()
+            state_ = state[0]
+        else:
+            raise NotImplementedError()
+        self._update_terminal(&state_)
+        return state_to_array(&state_)
+
+    cdef _step(self, State state, const Action [:] action, cnp.npy_bool _step_ahead=False):
         cdef int i
         cdef cnp.ndarray[State, ndim=1] new_state = np.empty(action.shape[0], dtype=STATE_DTYPE)
         cdef State [:] new_state_view = new_state
@@ -482,7 +1639,43 @@ cdef class Environment:
         return new_state
     
     cdef _step_scalar(self, State state, Action action, cnp.npy_bool _step_ahead):
-        
+        self._make_action(&state, action)
+        if _step_ahead:
+            self._update_terminal(&state)
+        return state
+
+    cdef void _update_terminal(self, State* state) noexcept nogil:
+        # Sets the checkmate and draw flags, stops at the first legal action of the player in turn.
+        cdef bint has_legal_action = self._has_legal_action(state)
+        state.is_white_check = self._is_white_check(state[0])
+        state.is_black_check = self._is_black_check(state[0])
+        state.is_white_checkmate = state.is_white_check and not has_legal_action
+        state.is_black_checkmate = state.is_black_check and not has_legal_action
+        state.is_draw = self._is_draw(state[0], has_legal_action)
+
+    cdef bint _has_legal_action(self, const State* state) noexcept nogil:
+        cdef int i
+        cdef ActionList action_list
+        cdef State next_state
+        self._generate_pseudo_actions(state, &action_list)
+        for i in range(action_list.size):
+            next_state = state[0]
+            self._make_action(&next_state, action_list.actions[i])
+            if state.white_player_turn and not next_state.is_white_check:
+                return True
+            if not state.white_player_turn and not next_state.is_black_check:
+                return True
+        return False
+
+    cdef int _make_action(self, State* state, Action action) except -1 nogil:
+        # Applies the action to the state in place and updates the check flags, zobrist key and
+        # piece-square values.
+        cdef int piece, square
+        cdef Bitboard changed
+        cdef Bitboard[12] before
+        memcpy(before, piece_bitboards(state), sizeof(before))
+        state.zobrist_key ^= zobrist_castling_en_passant(state) ^ ZOBRIST_WHITE_PLAYER_TURN
+
         # change color
         state.white_player_turn = not state.white_player_turn
 
@@ -500,9 +1693,22 @@ cdef class Environment:
         state.white_king = state.white_king & ~action.dst
         state.white_pawn = state.white_pawn & ~action.dst
         
+        # a captured rook can not castle
+        if action.dst & A8:
+            state.has_black_queenside_rook_moved = True
+        if action.dst & H8:
+            state.has_black_kingside_rook_moved = True
+        if action.dst & A1:
+            state.has_white_queenside_rook_moved = True
+        if action.dst & H1:
+            state.has_white_kingside_rook_moved = True
+
         # reset
         state.en_passant_square_black = EMPTY
         state.en_passant_square_white = EMPTY
+        state.is_white_checkmate = False
+        state.is_black_checkmate = False
+        state.is_draw = False
     
         if action.flag == ActionFlag.move_black_rook:
             state.black_rook = state.black_rook & ~action.src | action.dst
@@ -523,24 +1729,7 @@ cdef class Environment:
             state.black_pawn = state.black_pawn & ~action.src | action.dst
         elif action.flag == ActionFlag.move_black_pawn_double:
             state.black_pawn = state.black_pawn & ~action.src | action.dst
-            if action.dst & FILE_A:
-                state.en_passant_square_white = A6
-            elif action.dst & FILE_B:
-                state.en_passant_square_white = B6
-            elif action.dst & FILE_C:
-                state.en_passant_square_white = C6
-            elif action.dst & FILE_D:
-                state.en_passant_square_white = D6
-            elif action.dst & FILE_E:
-                state.en_passant_square_white = E6
-            elif action.dst & FILE_F:
-                state.en_passant_square_white = F6
-            elif action.dst & FILE_G:
-                state.en_passant_square_white = G6
-            elif action.dst & FILE_H:
-                state.en_passant_square_white = H6
-            else:
-                raise NotImplementedError()
+            state.en_passant_square_white = action.dst >> 8
         elif action.flag == ActionFlag.move_white_rook:
             state.white_rook = state.white_rook & ~action.src | action.dst
             if action.src & A1:
@@ -560,24 +1749,7 @@ cdef class Environment:
             state.white_pawn = state.white_pawn & ~action.src | action.dst
         elif action.flag == ActionFlag.move_white_pawn_double:
             state.white_pawn = state.white_pawn & ~action.src | action.dst
-            if action.dst & FILE_A:
-                state.en_passant_square_black = A3
-            elif action.dst & FILE_B:
-                state.en_passant_square_black = B3
-            elif action.dst & FILE_C:
-                state.en_passant_square_black = C3
-            elif action.dst & FILE_D:
-                state.en_passant_square_black = D3
-            elif action.dst & FILE_E:
-                state.en_passant_square_black = E3
-            elif action.dst & FILE_F:
-                state.en_passant_square_black = F3
-            elif action.dst & FILE_G:
-                state.en_passant_square_black = G3
-            elif action.dst & FILE_H:
-                state.en_passant_square_black = H3
-            else:
-                raise NotImplementedError()
+            state.en_passant_square_black = action.dst << 8
         elif action.flag == ActionFlag.castle_queenside_black:
             state.black_rook = (state.black_rook & ~A8) | D8
             state.black_king = C8
@@ -600,34 +1772,34 @@ cdef class Environment:
             state.has_white_kingside_rook_moved = True
         elif action.flag == ActionFlag.promote_black_rook:
             state.black_pawn = state.black_pawn & ~action.src
-            state.black_rook = state.black_rook | action.src
+            state.black_rook = state.black_rook | action.dst
         elif action.flag == ActionFlag.promote_black_knight:
             state.black_pawn = state.black_pawn & ~action.src
-            state.black_knight = state.black_knight | action.src
+            state.black_knight = state.black_knight | action.dst
         elif action.flag == ActionFlag.promote_black_bishop:
             state.black_pawn = state.black_pawn & ~action.src
-            state.black_bishop = state.black_bishop | action.src
+            state.black_bishop = state.black_bishop | action.dst
         elif action.flag == ActionFlag.promote_black_queen:
             state.black_pawn = state.black_pawn & ~action.src
-            state.black_queen = state.black_queen | action.src
+            state.black_queen = state.black_queen | action.dst
         elif action.flag == ActionFlag.promote_black_pawn:
             state.black_pawn = state.black_pawn & ~action.src
-            state.black_pawn = state.black_pawn | action.src
+            state.black_pawn = state.black_pawn | action.dst
         elif action.flag == ActionFlag.promote_white_rook:
             state.white_pawn = state.white_pawn & ~action.src
-            state.white_rook = state.white_rook | action.src
+            state.white_rook = state.white_rook | action.dst
         elif action.flag == ActionFlag.promote_white_knight:
             state.white_pawn = state.white_pawn & ~action.src
-            state.white_knight = state.white_knight | action.src
+            state.white_knight = state.white_knight | action.dst
         elif action.flag == ActionFlag.promote_white_bishop:
             state.white_pawn = state.white_pawn & ~action.src
-            state.white_bishop = state.white_bishop | action.src
+            state.white_bishop = state.white_bishop | action.dst
         elif action.flag == ActionFlag.promote_white_queen:
             state.white_pawn = state.white_pawn & ~action.src
-            state.white_queen = state.white_queen | action.src
+            state.white_queen = state.white_queen | action.dst
         elif action.flag == ActionFlag.promote_white_pawn:
             state.white_pawn = state.white_pawn & ~action.src
-            state.white_pawn = state.white_pawn | action.src
+            state.white_pawn = state.white_pawn | action.dst
         elif action.flag == ActionFlag.move_black_pawn_en_passant:
             state.black_pawn = state.black_pawn & ~action.src | action.dst
             state.white_pawn = state.white_pawn & ~(action.dst >> 8)
@@ -635,23 +1807,31 @@ cdef class Environment:
             state.white_pawn = state.white_pawn & ~action.src | action.dst
             state.black_pawn = state.black_pawn & ~(action.dst << 8)
         else:
-            raise NotImplementedError()
-    
+            with gil:
+                raise NotImplementedError()
+
+        # update the zobrist key and the piece-square values with the squares that changed for
+        # each piece
+        for piece in range(12):
+            changed = before[piece] ^ piece_bitboards(state)[piece]
+            while changed:
+                square = pop_lsb(&changed)
+                state.zobrist_key ^= ZOBRIST_PIECE[piece][square]
+                if before[piece] & ((<Bitboard> 1) << square):
+                    state.psqt_mg -= PSQT_MG[piece][square]
+                    state.psqt_eg -= PSQT_EG[piece][square]
+                    state.phase -= PHASE[piece]
+                else:
+                    state.psqt_mg += PSQT_MG[piece][square]
+                    state.psqt_eg += PSQT_EG[piece][square]
+                    state.phase += PHASE[piece]
+        state.zobrist_key ^= zobrist_castling_en_passant(state)
+
         state.ply = state.ply + 1
-        state.is_black_check = self._is_black_check(state)
-        state.is_white_check = self._is_white_check(state)
-        
-    
-        # Simulate one step ahead, _step_ahead=False to avoid infinite recursion
-        if _step_ahead:
-            next_pseudo_states = self._step(state, self._pseudo_actions(state), _step_ahead=False)
-            if state.is_black_check:
-                state.is_black_checkmate = next_pseudo_states["is_black_check"].all()
-            if state.is_white_check:
-                state.is_white_checkmate = next_pseudo_states["is_white_check"].all()
-            state.is_draw = self._is_draw(state, next_pseudo_states)
-            
-        return state
+        state.is_black_check = self._is_black_check(state[0])
+        state.is_white_check = self._is_white_check(state[0])
+        return 0
+
 
     def is_white_check(self, state):
         return self._is_white_check(state[0])
@@ -660,61 +1840,67 @@ cdef class Environment:
         return self._is_black_check(state[0])
     
     def is_white_checkmate(self, state):
-        next_pseudo_states = self._step(state[0], self._pseudo_actions(state[0]), _step_ahead=False)
-        return self._is_white_checkmate(state[0], next_pseudo_states)
-    
+        return self._is_white_checkmate(state[0])
+
     def is_black_checkmate(self, state):
-        next_pseudo_states = self._step(state[0], self._pseudo_actions(state[0]), _step_ahead=False)
-        return self._is_black_checkmate(state[0], next_pseudo_states)
+        return self._is_black_checkmate(state[0])
+
+    def is_stalemate(self, state):
+        cdef State state_ = state[0]
+        return self._is_stalemate(state_, self._has_legal_action(&state_))
+
+    def is_draw(self, state):
+        cdef State state_ = state[0]
+        return self._is_draw(state_, self._has_legal_action(&state_))
+
+    def has_legal_action(self, state):
+        cdef State state_ = state[0]
+        return self._has_legal_action(&state_)
     
-    cdef bint _is_white_check(self, State state):
+    cdef bint _is_white_check(self, State state) noexcept nogil:
         cdef Bitboard color, other_color, occupied, other_attackset
         color = state.white_rook | state.white_knight | state.white_bishop | state.white_queen | state.white_king | state.white_pawn
         other_color = state.black_rook | state.black_knight | state.black_bishop | state.black_queen | state.black_king | state.black_pawn
         occupied = color | other_color
         other_attackset = (
-            self.rook_attackset(state.black_rook | state.black_queen, occupied)
+            self._rook_attackset(state.black_rook | state.black_queen, occupied)
             | self.knight_attackset(state.black_knight)
-            | self.bishop_attackset(state.black_bishop | state.black_queen, occupied)
+            | self._bishop_attackset(state.black_bishop | state.black_queen, occupied)
             | self.black_pawn_attackset(state.black_pawn)
         )
         if other_attackset & state.white_king:
             return True
         return False
     
-    cdef bint _is_black_check(self, State state):
+    cdef bint _is_black_check(self, State state) noexcept nogil:
         cdef Bitboard color, other_color, occupied, other_attackset
         color = state.black_rook | state.black_knight | state.black_bishop | state.black_queen | state.black_king | state.black_pawn
         other_color = state.white_rook | state.white_knight | state.white_bishop | state.white_queen | state.white_king | state.white_pawn
         occupied = color | other_color
         other_attackset = (
-            self.rook_attackset(state.white_rook | state.white_queen, occupied)
+            self._rook_attackset(state.white_rook | state.white_queen, occupied)
             | self.knight_attackset(state.white_knight)
-            | self.bishop_attackset(state.white_bishop | state.white_queen, occupied)
+            | self._bishop_attackset(state.white_bishop | state.white_queen, occupied)
             | self.white_pawn_attackset(state.white_pawn)
         )
         if other_attackset & state.black_king:
             return True
         return False
     
-    cdef bint _is_draw(self, State state, cnp.ndarray[State, ndim=1] next_pseudo_states):
+    cdef bint _is_draw(self, State state, bint has_legal_action) noexcept nogil:
         return (
             (state.ply >= MAX_PLY)
             or self._insufficient_material_king_vs_king(state)
-            or self._is_stalemate(state, next_pseudo_states)
+            or self._is_stalemate(state, has_legal_action)
         )
-    
-    cdef bint _is_white_checkmate(self, State state, cnp.ndarray[State, ndim=1] next_pseudo_states):
-        if self._is_white_check(state):
-            return next_pseudo_states["is_white_check"].all()
-        return False
-    
-    cdef bint _is_black_checkmate(self, State state, cnp.ndarray[State, ndim=1] next_pseudo_states):
-        if self._is_black_check(state):
-            return next_pseudo_states["is_black_check"].all()
-        return False
-    
-    cdef bint _insufficient_material_king_vs_king(self, State state):
+
+    cdef bint _is_white_checkmate(self, State state) noexcept nogil:
+        return self._is_white_check(state) and not self._has_legal_action(&state)
+
+    cdef bint _is_black_checkmate(self, State state) noexcept nogil:
+        return self._is_black_check(state) and not self._has_legal_action(&state)
+
+    cdef bint _insufficient_material_king_vs_king(self, State state) noexcept nogil:
         return (
             state.black_rook
             | state.black_knight
@@ -727,22 +1913,24 @@ cdef class Environment:
             | state.white_queen 
             | state.white_pawn
         ) == EMPTY
-    
-    cdef bint _is_stalemate(self, State state, cnp.ndarray[State, ndim=1] next_pseudo_states):
-        if state.white_player_turn:    
-            return not state.is_white_check and next_pseudo_states["is_white_check"].all()
+
+    cdef bint _is_stalemate(self, State state, bint has_legal_action) noexcept nogil:
+        if has_legal_action:
+            return False
+        if state.white_player_turn:
+            return not self._is_white_check(state)
         else:
-            return not state.is_black_check and next_pseudo_states["is_black_check"].all()
+            return not self._is_black_check(state)
 
-    cdef Bitboard king_attackset(self, Bitboard king):
-        return self._king_attackset_lookup[king]
+    cdef Bitboard king_attackset(self, Bitboard king) noexcept nogil:
+        if king == EMPTY:
+            return EMPTY
+        return self._king_attacks[bitscan(king)]
 
-    cdef Bitboard knight_attackset(self, Bitboard knight):
-        attackset = 0
+    cdef Bitboard knight_attackset(self, Bitboard knight) noexcept nogil:
+        cdef Bitboard attackset = 0
         while knight:
-            src = knight & -knight
-            attackset |= self._knight_attackset_lookup[src]
-            knight &= knight - 1
+            attackset |= self._knight_attacks[pop_lsb(&knight)]
         return attackset
 
     cpdef Bitboard rook_attackset_slow(self, int i, int j, Bitboard blockers):
@@ -772,17 +1960,13 @@ cdef class Environment:
     
         return attackset
 
-    cpdef rook_attackset(self, Bitboard rook, Bitboard blockers):
-        cdef Bitboard src, dst, attackset
-        cdef int key
-        attackset = 0
-        if rook == EMPTY:
-            return attackset
+    def rook_attackset(self, Bitboard rook, Bitboard blockers):
+        return self._rook_attackset(rook, blockers)
+
+    cdef Bitboard _rook_attackset(self, Bitboard rook, Bitboard blockers) noexcept nogil:
+        cdef Bitboard attackset = 0
         while rook:
-            src = rook & -rook
-            key = self.rook_key(src, blockers & self.rook_blockermask(src))
-            attackset |= self.rook_table(src, key)
-            rook &= rook - 1
+            attackset |= self.rook_attacks(pop_lsb(&rook), blockers)
         return attackset
 
     cpdef bishop_attackset_slow(self, int i, int j, Bitboard blockers):
@@ -812,265 +1996,243 @@ cdef class Environment:
     
         return attackset
 
-    cpdef Bitboard bishop_attackset(self, Bitboard bishop, Bitboard blockers):
-        cdef Bitboard src, dst, attackset
-        cdef int key
-        attackset = 0
-        if bishop == EMPTY:
-            return attackset
+    def bishop_attackset(self, Bitboard bishop, Bitboard blockers):
+        return self._bishop_attackset(bishop, blockers)
+
+    cdef Bitboard _bishop_attackset(self, Bitboard bishop, Bitboard blockers) noexcept nogil:
+        cdef Bitboard attackset = 0
         while bishop:
-            src = bishop & -bishop
-            key = self.bishop_key(src, blockers & self.bishop_blockermask(src))
-            attackset |= self.bishop_table(src, key)
-            bishop &= bishop - 1
+            attackset |= self.bishop_attacks(pop_lsb(&bishop), blockers)
         return attackset
 
-    cdef Bitboard rook_to_magic(self, Bitboard rook):
-        return self._rook_to_magic_lookup[rook]    
-    
-    cdef Bitboard rook_magic_shifts(self, Bitboard rook):
-        return self._rook_magic_shifts_lookup[rook]
-    
-    cdef Bitboard rook_blockermask(self, Bitboard rook):
-        return self._rook_blockermask_lookup[rook]
-    
-    cdef Bitboard rook_key(self, Bitboard b, Bitboard blockers):
-        return (blockers * self.rook_to_magic(b)) >> (64 - self.rook_magic_shifts(b))
-    
-    cdef Bitboard rook_table(self, Bitboard rook, Bitboard key):
-        return self._rook_table_lookup[rook][key]
-
-    cdef Bitboard bishop_to_magic(self, Bitboard bishop):
-        return self._bishop_to_magic_lookup[bishop]
-    
-    cdef Bitboard bishop_magic_shifts(self, Bitboard bishop):
-        return self._bishop_magic_shifts_lookup[bishop]
-    
-    cdef Bitboard bishop_blockermask(self, Bitboard bishop):
-        return self._bishop_blockermask_lookup[bishop]
-    
-    cdef Bitboard bishop_key(self, Bitboard b, Bitboard blockers):
-        return (blockers * self.bishop_to_magic(b)) >> (64 - self.bishop_magic_shifts(b))
-    
-    cdef Bitboard bishop_table(self, Bitboard bishop, int key):
-        return self._bishop_table_lookup[bishop][key]
-
-    cdef void _king_actions(self, cpp_vector[Action]& action_vector, Bitboard king, Bitboard color, Bitboard other_attackset, int flag):
+    cdef void _king_actions(self, ActionList* action_list, Bitboard king, Bitboard color, Bitboard other_attackset, int flag) noexcept nogil:
         cdef Bitboard dst, attackset 
         attackset = self.king_attackset(king) & ~color & ~other_attackset
         while attackset:
             dst = attackset & -attackset
-            action_vector.push_back(Action(src=king, dst=dst, flag=flag))
+            push_action(action_list, king, dst, flag)
             attackset = attackset & (attackset - 1)
     
-    cdef void _knight_actions(self, cpp_vector[Action]& action_vector, Bitboard knight, Bitboard color, int flag):
+    cdef void _knight_actions(self, ActionList* action_list, Bitboard knight, Bitboard target, Bitboard pinned, int king_square, int flag) noexcept nogil:
         cdef Bitboard src, dst, attackset
         while knight:
             src = knight & -knight
-            attackset = self.knight_attackset(src) & ~color
+            attackset = self._knight_attacks[bitscan(knight)] & target & pin_mask(src, pinned, king_square)
             while attackset:
                 dst = attackset & -attackset
-                action_vector.push_back(Action(src=src, dst=dst, flag=flag))
+                push_action(action_list, src, dst, flag)
                 attackset = attackset & (attackset - 1)
             knight &= knight - 1
 
-    cdef void _rook_actions(self, cpp_vector[Action]& action_vector, Bitboard rook, Bitboard blockers, Bitboard color, int flag):
+    cdef void _rook_actions(self, ActionList* action_list, Bitboard rook, Bitboard blockers, Bitboard target, Bitboard pinned, int king_square, int flag) noexcept nogil:
         cdef Bitboard src, dst, attackset
-        cdef int key
         while rook:
             src = rook & -rook
-            key = self.rook_key(src, blockers & self.rook_blockermask(src))
-            attackset = self.rook_table(src, key) & ~color
+            attackset = self.rook_attacks(bitscan(src), blockers) & target & pin_mask(src, pinned, king_square)
             while attackset:
                 dst = attackset & -attackset
-                action_vector.push_back(Action(src=src, dst=dst, flag=flag))
+                push_action(action_list, src, dst, flag)
                 attackset = attackset & (attackset - 1)
             rook &= rook - 1
 
-    cdef void _bishop_actions(self, cpp_vector[Action]& action_vector, Bitboard bishop, Bitboard blockers, Bitboard color, int flag):
+    cdef void _bishop_actions(self, ActionList* action_list, Bitboard bishop, Bitboard blockers, Bitboard target, Bitboard pinned, int king_square, int flag) noexcept nogil:
         cdef Bitboard src, dst, attackset
-        cdef int key
         while bishop:
             src = bishop & -bishop
-            key = self.bishop_key(src, blockers & self.bishop_blockermask(src))
-            attackset = self.bishop_table(src, key) & ~color
+            attackset = self.bishop_attacks(bitscan(src), blockers) & target & pin_mask(src, pinned, king_square)
             while attackset:
                 dst = attackset & -attackset
-                action_vector.push_back(Action(src=src, dst=dst, flag=flag))
+                push_action(action_list, src, dst, flag)
                 attackset = attackset & (attackset - 1)
             bishop &= bishop - 1
     
-    cdef void _queen_actions(self, cpp_vector[Action]& action_vector, Bitboard queen, Bitboard blockers, Bitboard color, int flag):
-        self._rook_actions(action_vector, queen, blockers, color, flag)
-        self._bishop_actions(action_vector, queen, blockers, color, flag)
+    cdef void _queen_actions(self, ActionList* action_list, Bitboard queen, Bitboard blockers, Bitboard target, Bitboard pinned, int king_square, int flag) noexcept nogil:
+        self._rook_actions(action_list, queen, blockers, target, pinned, king_square, flag)
+        self._bishop_actions(action_list, queen, blockers, target, pinned, king_square, flag)
 
-    cdef Bitboard white_pawn_attackset(self, Bitboard pawn):
+    cdef Bitboard white_pawn_attackset(self, Bitboard pawn) noexcept nogil:
         cdef Bitboard northeastone, northwestone
         northeastone = ((pawn & ~FILE_H) >> 7)
         northwestone = ((pawn & ~FILE_A) >> 9)
         return northwestone | northeastone
     
-    cdef Bitboard black_pawn_attackset(self, Bitboard pawn):
+    cdef Bitboard black_pawn_attackset(self, Bitboard pawn) noexcept nogil:
         cdef Bitboard southeastone, southwestone
         southeastone = ((pawn & ~FILE_H) << 9)
         southwestone = ((pawn & ~FILE_A) << 7)
         return southwestone | southeastone
     
-    cdef void _white_pawn_actions(self, cpp_vector[Action]& action_vector, Bitboard pawn, Bitboard occupied, Bitboard other_color, Bitboard en_passant_square_white):
-        cdef Bitboard src, dst, northone, northtwo, attackset
+    cdef void _white_pawn_actions(self, ActionList* action_list, Bitboard pawn, Bitboard occupied, Bitboard other_color, Bitboard en_passant_square_white, Bitboard en_passant_pawn, Bitboard target, Bitboard pinned, int king_square) noexcept nogil:
+        # Only the pawns in en_passant_pawn capture en passant, the other actions are to target.
+        cdef Bitboard src, dst, northone, northtwo, attackset, mask
         while pawn:
             src = pawn & -pawn
+            mask = target & pin_mask(src, pinned, king_square)
     
-            northone = ((src & ~RANK_8) >> 8) & (~occupied)
+            northone = ((src & ~RANK_8) >> 8) & (~occupied) & mask
             while northone:
                 dst = northone & -northone
                 if dst & RANK_8:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_rook))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_knight))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_bishop))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_queen))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_pawn))
+                    push_action(action_list, src, dst, ActionFlag.promote_white_rook)
+                    push_action(action_list, src, dst, ActionFlag.promote_white_knight)
+                    push_action(action_list, src, dst, ActionFlag.promote_white_bishop)
+                    push_action(action_list, src, dst, ActionFlag.promote_white_queen)
+                    push_action(action_list, src, dst, ActionFlag.promote_white_pawn)
                 else:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.move_white_pawn))
+                    push_action(action_list, src, dst, ActionFlag.move_white_pawn)
                 northone = northone & (northone - 1)
     
-            northtwo = (src >> 16) & (~occupied) & RANK_4
+            northtwo = (((src >> 8) & (~occupied)) >> 8) & (~occupied) & RANK_4 & mask
             while northtwo:
                 dst = northtwo & -northtwo
-                action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.move_white_pawn_double))
+                push_action(action_list, src, dst, ActionFlag.move_white_pawn_double)
                 northtwo = northtwo & (northtwo - 1)
     
-            attackset = self.white_pawn_attackset(src) & (other_color | en_passant_square_white)
+            attackset = self.white_pawn_attackset(src) & (other_color & mask)
+            if src & en_passant_pawn:
+                attackset |= self.white_pawn_attackset(src) & en_passant_square_white
             while attackset:
                 dst = attackset & -attackset
                 if dst & en_passant_square_white:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.move_white_pawn_en_passant))
+                    push_action(action_list, src, dst, ActionFlag.move_white_pawn_en_passant)
                 elif dst & RANK_8:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_rook))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_knight))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_bishop))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_queen))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_white_pawn))
+                    push_action(action_list, src, dst, ActionFlag.promote_white_rook)
+                    push_action(action_list, src, dst, ActionFlag.promote_white_knight)
+                    push_action(action_list, src, dst, ActionFlag.promote_white_bishop)
+                    push_action(action_list, src, dst, ActionFlag.promote_white_queen)
+                    push_action(action_list, src, dst, ActionFlag.promote_white_pawn)
                 else:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.move_white_pawn))
+                    push_action(action_list, src, dst, ActionFlag.move_white_pawn)
                 attackset = attackset & (attackset - 1)
     
             pawn = pawn & (pawn - 1)
     
-    cdef void _black_pawn_actions(self, cpp_vector[Action]& action_vector, Bitboard pawn, Bitboard occupied, Bitboard other_color, Bitboard en_passant_square_black):
-        cdef Bitboard src, dst, southone, southtwo, attackset
+    cdef void _black_pawn_actions(self, ActionList* action_list, Bitboard pawn, Bitboard occupied, Bitboard other_color, Bitboard en_passant_square_black, Bitboard en_passant_pawn, Bitboard target, Bitboard pinned, int king_square) noexcept nogil:
+        # Only the pawns in en_passant_pawn capture en passant, the other actions are to target.
+        cdef Bitboard src, dst, southone, southtwo, attackset, mask
         while pawn:
             src = pawn & -pawn
+            mask = target & pin_mask(src, pinned, king_square)
     
-            southone = ((src & ~RANK_1) << 8) & (~occupied)
+            southone = ((src & ~RANK_1) << 8) & (~occupied) & mask
             while southone:
                 dst = southone & -southone
                 if dst & RANK_1:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_rook))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_knight))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_bishop))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_queen))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_pawn))
+                    push_action(action_list, src, dst, ActionFlag.promote_black_rook)
+                    push_action(action_list, src, dst, ActionFlag.promote_black_knight)
+                    push_action(action_list, src, dst, ActionFlag.promote_black_bishop)
+                    push_action(action_list, src, dst, ActionFlag.promote_black_queen)
+                    push_action(action_list, src, dst, ActionFlag.promote_black_pawn)
                 else:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.move_black_pawn))
+                    push_action(action_list, src, dst, ActionFlag.move_black_pawn)
                 southone = southone & (southone - 1)
     
-            southtwo = (src << 16) & (~occupied) & RANK_5
+            southtwo = (((src << 8) & (~occupied)) << 8) & (~occupied) & RANK_5 & mask
             while southtwo:
                 dst = southtwo & -southtwo
-                action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.move_black_pawn_double))
+                push_action(action_list, src, dst, ActionFlag.move_black_pawn_double)
                 southtwo = southtwo & (southtwo - 1)
     
-            attackset = self.black_pawn_attackset(src) & (other_color | en_passant_square_black)
+            attackset = self.black_pawn_attackset(src) & (other_color & mask)
+            if src & en_passant_pawn:
+                attackset |= self.black_pawn_attackset(src) & en_passant_square_black
             while attackset:
                 dst = attackset & -attackset
                 if dst & en_passant_square_black:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.move_black_pawn_en_passant))
+                    push_action(action_list, src, dst, ActionFlag.move_black_pawn_en_passant)
                 elif dst & RANK_1:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_rook))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_knight))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_bishop))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_queen))
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.promote_black_pawn))
+                    push_action(action_list, src, dst, ActionFlag.promote_black_rook)
+                    push_action(action_list, src, dst, ActionFlag.promote_black_knight)
+                    push_action(action_list, src, dst, ActionFlag.promote_black_bishop)
+                    push_action(action_list, src, dst, ActionFlag.promote_black_queen)
+                    push_action(action_list, src, dst, ActionFlag.promote_black_pawn)
                 else:
-                    action_vector.push_back(Action(src=src, dst=dst, flag=ActionFlag.move_black_pawn))
+                    push_action(action_list, src, dst, ActionFlag.move_black_pawn)
                 attackset = attackset & (attackset - 1)
     
             pawn = pawn & (pawn - 1)
 
     cdef void _black_rook_queenside_castling_actions(
         self,
-        cpp_vector[Action]& action_vector,
+        ActionList* action_list,
         Bitboard rook,
         Bitboard king,
         Bitboard occupied,
+        Bitboard other_attackset,
         cnp.npy_bool has_black_king_moved,
         cnp.npy_bool has_black_queenside_rook_moved,
-    ):
+    ) noexcept nogil:
         if not (
             (has_black_king_moved or has_black_queenside_rook_moved)
             or (occupied & (B8 | C8 | D8))
+            or (other_attackset & (C8 | D8 | E8))
             or (not rook & A8)
             or (not king & E8)  # Redundant check, but nice for tests
         ):
-            action_vector.push_back(Action(src=NO_MOVE, dst=NO_MOVE, flag=ActionFlag.castle_queenside_black))
+            push_action(action_list, NO_MOVE, NO_MOVE, ActionFlag.castle_queenside_black)
     
     cdef void _white_rook_queenside_castling_actions(
         self,
-        cpp_vector[Action]& action_vector,
+        ActionList* action_list,
         Bitboard rook,
         Bitboard king,
         Bitboard occupied,
+        Bitboard other_attackset,
         cnp.npy_bool has_white_king_moved,
         cnp.npy_bool has_white_queenside_rook_moved,
-    ):
+    ) noexcept nogil:
         if not (
             (has_white_king_moved or has_white_queenside_rook_moved)
-            or (occupied & (B1 | C2 | D3))
+            or (occupied & (B1 | C1 | D1))
+            or (other_attackset & (C1 | D1 | E1))
             or (not rook & A1)
             or (not king & E1)  # Redundant check, but nice for tests
         ):
-            action_vector.push_back(Action(src=NO_MOVE, dst=NO_MOVE, flag=ActionFlag.castle_queenside_white))
+            push_action(action_list, NO_MOVE, NO_MOVE, ActionFlag.castle_queenside_white)
     
     cdef void _black_rook_kingside_castling_actions(
         self,
-        cpp_vector[Action]& action_vector,
+        ActionList* action_list,
         Bitboard rook,
         Bitboard king,
         Bitboard occupied,
+        Bitboard other_attackset,
         cnp.npy_bool has_black_king_moved,
         cnp.npy_bool has_black_kingside_rook_moved,
-    ):
+    ) noexcept nogil:
         if not (
-            (has_black_kingside_rook_moved or has_black_kingside_rook_moved)
+            (has_black_king_moved or has_black_kingside_rook_moved)
             or (occupied & (F8 | G8))
+            or (other_attackset & (E8 | F8 | G8))
             or (not rook & H8)
             or (not king & E8)  # Redundant check, but nice for tests
         ):
-            action_vector.push_back(Action(src=NO_MOVE, dst=NO_MOVE, flag=ActionFlag.castle_kingside_black))
+            push_action(action_list, NO_MOVE, NO_MOVE, ActionFlag.castle_kingside_black)
     
     cdef void _white_rook_kingside_castling_actions(
         self,
-        cpp_vector[Action]& action_vector,
+        ActionList* action_list,
         Bitboard rook,
         Bitboard king,
         Bitboard occupied,
+        Bitboard other_attackset,
         cnp.npy_bool has_white_king_moved,
         cnp.npy_bool has_white_kingside_rook_moved,
-    ):
+    ) noexcept nogil:
         if not (
-            (has_white_kingside_rook_moved or has_white_kingside_rook_moved)
+            (has_white_king_moved or has_white_kingside_rook_moved)
             or (occupied & (F1 | G1))
+            or (other_attackset & (E1 | F1 | G1))
             or (not rook & H1)
             or (not king & E1)  # Redundant check, but nice for tests
         ):
-            action_vector.push_back(Action(src=NO_MOVE, dst=NO_MOVE, flag=ActionFlag.castle_kingside_white))
+            push_action(action_list, NO_MOVE, NO_MOVE, ActionFlag.castle_kingside_white)
 
-    cdef _init_king_attackset_lookup(self):
+    cdef _init_king_attacks(self):
         cdef int src_i, src_j, di, dj
         for src_i in range(8):
             for src_j in range(8):
-                self._king_attackset_lookup[ij_to_bb(src_i, src_j)] = 0
+                self._king_attacks[8 * src_i + src_j] = 0
                 for di in [-1, 0, 1]:
                     for dj in [-1, 0, 1]:
                         if di == 0 and dj == 0:
@@ -1078,13 +2240,13 @@ cdef class Environment:
                         dst_i = src_i + di
                         dst_j = src_j + dj
                         if inside_board(dst_i, dst_j):
-                            self._king_attackset_lookup[ij_to_bb(src_i, src_j)] |= ij_to_bb(dst_i, dst_j)
+                            self._king_attacks[8 * src_i + src_j] |= ij_to_bb(dst_i, dst_j)
 
-    cdef _init_knight_attackset_lookup(self):
+    cdef _init_knight_attacks(self):
         cdef int src_i, src_j, di, dj
         for src_i in range(8):
             for src_j in range(8):
-                self._knight_attackset_lookup[ij_to_bb(src_i, src_j)] = 0
+                self._knight_attacks[8 * src_i + src_j] = 0
                 for di, dj in [
                     (-2, -1),
                     (2, 1),
@@ -1098,188 +2260,983 @@ cdef class Environment:
                     dst_i = src_i + di
                     dst_j = src_j + dj
                     if inside_board(dst_i, dst_j):
-                        self._knight_attackset_lookup[ij_to_bb(src_i, src_j)] |= ij_to_bb(dst_i, dst_j)
+                        self._knight_attacks[8 * src_i + src_j] |= ij_to_bb(dst_i, dst_j)
 
-    cdef _init_rook_to_magic_lookup(self):
-        cdef int idx, i, j
-        cdef Bitboard bb
-        idx = 0
-        for i in range(8):
-            for j in range(8):    
-                bb = ij_to_bb(i, j)
-                self._rook_to_magic_lookup[bb] = <Bitboard> MAGIC_ROOK[idx]
-                idx += 1
-
-    cdef _init_rook_magic_shifts_lookup(self):
-        cdef int i, j
-        cdef Bitboard bb
+    cdef _init_rook_magics(self):
+        cdef int i, j, step, square, bits
+        cdef int offset = 0
         for i in range(8):
             for j in range(8):
-                bb = ij_to_bb(i, j)
-                self._rook_magic_shifts_lookup[bb] = 0
-    
-                for step in range(1, i):
-                    self._rook_magic_shifts_lookup[bb] += 1
-    
-                for step in range(1, 7 - i):
-                    self._rook_magic_shifts_lookup[bb] += 1
-    
-                for step in range(1, j):
-                    self._rook_magic_shifts_lookup[bb] += 1
-    
-                for step in range(1, 7 - j):
-                    self._rook_magic_shifts_lookup[bb] += 1
+                square = 8 * i + j
+                self._rook_magics[square] = MAGIC_ROOK[square]
+                self._rook_masks[square] = 0
 
-    cdef _init_rook_blockermask_lookup(self):
-        cdef int i, j, step
-        cdef Bitboard bb
-        for i in range(8):
-            for j in range(8):
-                bb = ij_to_bb(i, j)
-                self._rook_blockermask_lookup[bb] = 0
-    
                 for step in range(1, i):
-                    self._rook_blockermask_lookup[bb] |= ij_to_bb(i - step, j)
-    
+                    self._rook_masks[square] |= ij_to_bb(i - step, j)
+
                 for step in range(1, 7 - i):
-                    self._rook_blockermask_lookup[bb] |= ij_to_bb(i + step, j)
-    
+                    self._rook_masks[square] |= ij_to_bb(i + step, j)
+
                 for step in range(1, j):
-                    self._rook_blockermask_lookup[bb] |= ij_to_bb(i, j - step)
-    
+                    self._rook_masks[square] |= ij_to_bb(i, j - step)
+
                 for step in range(1, 7 - j):
-                    self._rook_blockermask_lookup[bb] |= ij_to_bb(i, j + step)
+                    self._rook_masks[square] |= ij_to_bb(i, j + step)
+
+                bits = pop_count(self._rook_masks[square])
+                self._rook_shifts[square] = 64 - bits
+                self._rook_offsets[square] = offset
+                offset += 1 << bits
+
+    cdef int _rook_attacks_size(self):
+        return self._rook_offsets[63] + (1 << (64 - self._rook_shifts[63]))
+
+    cdef _set_rook_attacks(self, cnp.ndarray rook_attacks):
+        self._rook_attacks = rook_attacks
+        self._rook_attacks_data = <Bitboard*> cnp.PyArray_DATA(self._rook_attacks)
 
-    cdef _init_rook_table_lookup(self):
-        cdef int i, j, blocker_idx
-        cdef Bitboard bb, key, blockers_, attackset
+    cdef _init_rook_attacks(self):
+        cdef int i, j, square, blocker_idx
+        cdef Bitboard key, blockers_, attackset, entry
+        self._set_rook_attacks(np.zeros(self._rook_attacks_size(), dtype=np.uint64))
         for i in range(8):
             for j in range(8):
-                bb = ij_to_bb(i, j)
-                for blocker_idx in range(0, 1 << self.rook_magic_shifts(bb)):
-                    blockers_ = blockers(blocker_idx, self.rook_blockermask(bb))
-                    key = self.rook_key(bb, blockers_)
-                    attackset = self.rook_attackset_slow(i, j, blockers_)
-                    self._rook_table_lookup[bb][key] = attackset
-
-    cdef _init_bishop_to_magic_lookup(self):
-        cdef int idx, i, j
-        cdef Bitboard bb
-        idx = 0
+                square = 8 * i + j
+                for blocker_idx in range(0, 1 << (64 - self._rook_shifts[square])):
+                    blockers_ = blockers(blocker_idx, self._rook_masks[square])
+                    key = (blockers_ * self._rook_magics[square]) >> self._rook_shifts[square]
+                    attackset = rook_rays(i, j, blockers_)
+                    entry = self._rook_attacks_data[self._rook_offsets[square] + key]
+                    if entry != EMPTY and entry != attackset:
+                        raise RuntimeError(f"Rook magic collision on square {square}")
+                    self._rook_attacks_data[self._rook_offsets[square] + key] = attackset
+
+    cdef _init_bishop_magics(self):
+        cdef int i, j, step, square, bits
+        cdef int offset = 0
         for i in range(8):
             for j in range(8):
-                bb = ij_to_bb(i, j)
-                self._bishop_to_magic_lookup[bb] = MAGIC_BISHOP[idx]
-                idx += 1
+                square = 8 * i + j
+                self._bishop_magics[square] = MAGIC_BISHOP[square]
+                self._bishop_masks[square] = 0
 
-    cdef _init_bishop_magic_shifts_lookup(self):
-        cdef int i, j, step
-        cdef Bitboard bb
-        for i in range(8):
-            for j in range(8):
-                bb = ij_to_bb(i, j)
-                self._bishop_magic_shifts_lookup[bb] = 0
-    
                 for step in range(1, min(7 - i, 7 - j)):
-                    self._bishop_magic_shifts_lookup[bb] += 1
-    
-                for step in range(1, min(i, 7 - j)):
-                    self._bishop_magic_shifts_lookup[bb] += 1
-    
-                for step in range(1, min(i, j)):
-                    self._bishop_magic_shifts_lookup[bb] += 1
-    
-                for step in range(1, min(7 - i, j)):
-                    self._bishop_magic_shifts_lookup[bb] += 1
+                    self._bishop_masks[square] |= ij_to_bb(i + step, j + step)
 
-    cdef _init_bishop_blockermask_lookup(self):
-        cdef int i, j, step
-        cdef Bitboard bb
-        for i in range(8):
-            for j in range(8):
-                bb = ij_to_bb(i, j)
-                self._bishop_blockermask_lookup[bb] = 0
-    
-                for step in range(1, min(7 - i, 7 - j)):
-                    self._bishop_blockermask_lookup[bb] |= ij_to_bb(i + step, j + step)
-    
                 for step in range(1, min(i, 7 - j)):
-                    self._bishop_blockermask_lookup[bb] |= ij_to_bb(i - step, j + step)
-    
+                    self._bishop_masks[square] |= ij_to_bb(i - step, j + step)
+
                 for step in range(1, min(i, j)):
-                    self._bishop_blockermask_lookup[bb] |= ij_to_bb(i - step, j - step)
-    
+                    self._bishop_masks[square] |= ij_to_bb(i - step, j - step)
+
                 for step in range(1, min(7 - i, j)):
-                    self._bishop_blockermask_lookup[bb] |= ij_to_bb(i + step, j - step)
+                    self._bishop_masks[square] |= ij_to_bb(i + step, j - step)
+
+                bits = pop_count(self._bishop_masks[square])
+                self._bishop_shifts[square] = 64 - bits
+                self._bishop_offsets[square] = offset
+                offset += 1 << bits
+
+    cdef int _bishop_attacks_size(self):
+        return self._bishop_offsets[63] + (1 << (64 - self._bishop_shifts[63]))
+
+    cdef _set_bishop_attacks(self, cnp.ndarray bishop_attacks):
+        self._bishop_attacks = bishop_attacks
+        self._bishop_attacks_data = <Bitboard*> cnp.PyArray_DATA(self._bishop_attacks)
 
-    cdef _init_bishop_table_lookup(self):
-        cdef int i, j, step, blocker_idx
-        cdef Bitboard bb, key, blockers_, attackset
+    cdef _init_bishop_attacks(self):
+        cdef int i, j, square, blocker_idx
+        cdef Bitboard key, blockers_, attackset, entry
+        self._set_bishop_attacks(np.zeros(self._bishop_attacks_size(), dtype=np.uint64))
         for i in range(8):
             for j in range(8):
-                bb = ij_to_bb(i, j)
-                for blocker_idx in range(0, 1 << self.bishop_magic_shifts(bb)):
-                    blockers_ = blockers(blocker_idx, self.bishop_blockermask(bb))
-                    key = self.bishop_key(bb, blockers_)
-                    attackset = self.bishop_attackset_slow(i, j, blockers_)
-                    self._bishop_table_lookup[bb][key] = attackset
-                
+                square = 8 * i + j
+                for blocker_idx in range(0, 1 << (64 - self._bishop_shifts[square])):
+                    blockers_ = blockers(blocker_idx, self._bishop_masks[square])
+                    key = (blockers_ * self._bishop_magics[square]) >> self._bishop_shifts[square]
+                    attackset = bishop_rays(i, j, blockers_)
+                    entry = self._bishop_attacks_data[self._bishop_offsets[square] + key]
+                    if entry != EMPTY and entry != attackset:
+                        raise RuntimeError(f"Bishop magic collision on square {square}")
+                    self._bishop_attacks_data[self._bishop_offsets[square] + key] = attackset
+
+
+cdef class Position:
+    # A mutable state with an undo stack. make_move applies an action to the state in place and
+    # unmake_move restores the state from before the last action, neither allocates once the undo
+    # stack has grown to the depth of the search. The attributes and cdef methods are declared in
+    # _environment.pxd such that other Cython modules can cimport Position.
+
+    def __init__(self, Environment env, state):
+        self._env = env
+        self._undo_stack.reserve(64)
+        if isinstance(state, np.void):
+            self._reset(state)
+        elif isinstance(state, np.ndarray):
+            if state.shape[0] > 1:
+                raise ValueError()
+            self._reset(state[0])
+        else:
+            raise NotImplementedError()
+
+    @property
+    def state(self):
+        return state_to_array(&self._state)
+
+    def __len__(self):
+        # The number of moves that can be unmade.
+        return self._undo_stack.size()
+
+    def actions(self):
+        return self._env._actions(self._state)
+
+    def pseudo_actions(self):
+        return self._env._pseudo_actions(self._state)
+
+    def pseudo_captures(self):
+        return self._env._pseudo_captures(self._state)
+
+    def make_move(self, action):
+        if isinstance(action, np.ndarray):
+            if action.shape[0] > 1:
+                raise ValueError()
+            action = action[0]
+        self._make_move(Action(src=action["src"], dst=action["dst"], flag=action["action_flag"]))
+
+    def make_null_move(self):
+        self._make_null_move()
+
+    def unmake_move(self):
+        if self._undo_stack.empty():
+            raise IndexError("No move to unmake.")
+        self._unmake_move()
+
+    cdef void _reset(self, State state) noexcept:
+        self._state = state
+        self._undo_stack.clear()
+
+    cdef int _make_move(self, Action action) except -1 nogil:
+        cdef State state = self._state
+        self._env._make_action(&state, action)
+        self._undo_stack.push_back(self._state)
+        self._state = state
+        return 0
+
+    cdef int _make_null_move(self) except -1 nogil:
+        # Passes the turn to the other player, en passant is no longer possible. Used by null-move
+        # pruning and undone by unmake_move.
+        cdef State state = self._state
+        state.zobrist_key ^= zobrist_castling_en_passant(&state) ^ ZOBRIST_WHITE_PLAYER_TURN
+        state.white_player_turn = not state.white_player_turn
+        state.en_passant_square_black = EMPTY
+        state.en_passant_square_white = EMPTY
+        state.ply += 1
+        state.zobrist_key ^= zobrist_castling_en_passant(&state)
+        self._undo_stack.push_back(self._state)
+        self._state = state
+        return 0
+
+    cdef void _unmake_move(self) noexcept nogil:
+        self._state = self._undo_stack.back()
+        self._undo_stack.pop_back()
+
+
+cdef enum Bound:
+    BOUND_EXACT = 1
+    BOUND_LOWER = 2
+    BOUND_UPPER = 3
+
+
+# Search scores are integers, the piece values in hundredths, relative to the player to move.
+ctypedef long long Score
+cdef Score SCORE_INFINITY = (<Score> 1) << 60
+cdef double SCORE_SCALE = 100
+
+
+cdef packed struct TTEntry:
+    Bitboard key
+    Score score
+    Move best_move
+    # remaining search depth of the score, 0 marks an empty entry
+    short depth
+    unsigned char bound
+    unsigned char generation
+
+
+@cython.profile(False)
+cdef inline Bitboard tt_entry_checksum(const TTEntry* entry) noexcept nogil:
+    return (
+        <Bitboard> entry.score
+        ^ (<Bitboard> entry.best_move << 16)
+        ^ (<Bitboard> entry.depth << 32)
+        ^ (<Bitboard> entry.bound << 56)
+        ^ (<Bitboard> entry.generation << 48)
+    )
+
+
+@cython.final
+cdef class TranspositionTable:
+    # A fixed-size hash table of search results keyed by the zobrist key. The number of entries is
+    # the largest power of two fitting in size_mb, the index is the low bits of the key. An entry is
+    # replaced when it is from an earlier search or when the new result is searched at least as
+    # deep. The table is shared by the threads of a parallel search without locks, the stored key is
+    # xor'ed with the data of the entry such that an entry torn by concurrent writes is a miss.
+    # See: https://www.chessprogramming.org/Transposition_Table
+    # and: https://www.chessprogramming.org/Shared_Hash_Table#Lock-less
+    cdef TTEntry* _entries
+    cdef Bitboard _mask
+    cdef unsigned char _generation
+    cdef readonly Bitboard probes
+    cdef readonly Bitboard hits
+    cdef readonly Bitboard stores
+
+    def __cinit__(self, double size_mb=16):
+        cdef Bitboard n_entries = 1
+        if size_mb * 2**20 < sizeof(TTEntry):
+            raise ValueError(f"Transposition table size {size_mb} MB is too small.")
+        while 2 * n_entries * sizeof(TTEntry) <= size_mb * 2**20:
+            n_entries *= 2
+        self._entries = <TTEntry*> calloc(n_entries, sizeof(TTEntry))
+        if self._entries is NULL:
+            raise MemoryError()
+        self._mask = n_entries - 1
+
+    def __dealloc__(self):
+        free(self._entries)
+
+    def __len__(self):
+        return self._mask + 1
+
+    @property
+    def size_mb(self):
+        return (self._mask + 1) * sizeof(TTEntry) / <double> 2**20
+
+    @property
+    def hit_rate(self):
+        return self.hits / <double> self.probes if self.probes else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self),
+            "size_mb": self.size_mb,
+            "probes": self.probes,
+            "hits": self.hits,
+            "stores": self.stores,
+            "hit_rate": self.hit_rate,
+        }
+
+    def clear(self):
+        memset(self._entries, 0, (self._mask + 1) * sizeof(TTEntry))
+        self._generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    cdef void _new_search(self) noexcept nogil:
+        self._generation = (self._generation + 1) & 0xff
+
+    cdef bint _probe(self, Bitboard key, TTEntry* entry) noexcept nogil:
+        # Copies the entry of the key to entry, False if there is none.
+        entry[0] = self._entries[key & self._mask]
+        self.probes += 1
+        if entry.depth > 0 and entry.key ^ tt_entry_checksum(entry) == key:
+            self.hits += 1
+            return True
+        return False
+
+    cdef void _store(
+        self, Bitboard key, int depth, int bound, Score score, Move best_move
+    ) noexcept nogil:
+        cdef TTEntry* slot = &self._entries[key & self._mask]
+        cdef TTEntry entry = slot[0]
+        if (
+            entry.depth > 0
+            and entry.generation == self._generation
+            and entry.key ^ tt_entry_checksum(&entry) != key
+            and entry.depth > depth
+        ):
+            return
+        entry.score = score
+        entry.best_move = best_move
+        entry.depth = depth
+        entry.bound = bound
+        entry.generation = self._generation
+        entry.key = key ^ tt_entry_checksum(&entry)
+        slot[0] = entry
+        self.stores += 1
+
+
+# The deadline of a timed search is checked when the number of nodes is a multiple of this.
+cdef enum: DEADLINE_CHECK_NODES = 1024
+
+# Maximum number of plies from the root that has killer moves.
+cdef enum: MAX_SEARCH_PLY = 128
+
+# The depth is reduced by this in the search after a null move, done from this depth.
+# See: https://www.chessprogramming.org/Null_Move_Pruning
+cdef enum: NULL_MOVE_REDUCTION = 2
+cdef enum: NULL_MOVE_MIN_DEPTH = 3
+
+# Quiet actions after this many actions are searched one ply shallower, from this depth.
+# See: https://www.chessprogramming.org/Late_Move_Reductions
+cdef enum: LMR_FULL_DEPTH_ACTIONS = 3
+cdef enum: LMR_MIN_DEPTH = 3
+
+# Captures in the quiescence search that leave the player to move more than this many pawns below
+# alpha after the captured piece is added to the static value are pruned.
+# See: https://www.chessprogramming.org/Delta_Pruning
+cdef enum: DELTA_MARGIN_PAWNS = 2
+
+# Move ordering scores, the transposition table action first, then promotions, captures by most
+# valuable victim and least valuable attacker, killer moves and quiet moves by the history table.
+# See: https://www.chessprogramming.org/Move_Ordering
+cdef enum:
+    ORDER_TT_ACTION = 1 << 30
+    ORDER_PROMOTION = 1 << 29
+    ORDER_CAPTURE = 1 << 28
+    ORDER_KILLER_0 = (1 << 28) - 1
+    ORDER_KILLER_1 = (1 << 28) - 2
+    ORDER_HISTORY_MAX = (1 << 28) - 3
+
+# Value of each piece type in the order of the piece constants, BLACK_ROOK, ..., BLACK_PAWN.
+cdef int[6] ORDER_PIECE_VALUE = [500, 300, 300, 900, 10000, 100]
+
+# Destination square of the king of each castling action, C8, G8, C1 and G1 as in ActionFlag.
+cdef int[4] CASTLING_KING_SQUARE = [2, 6, 58, 62]
+
+
+cdef inline int history_square(Action action) noexcept nogil:
+    # The history table square of a quiet action, the king's destination for castling as these
+    # actions have no source and destination.
+    if castle_queenside_black <= action.flag <= castle_kingside_white:
+        return CASTLING_KING_SQUARE[action.flag - castle_queenside_black]
+    return bitscan(action.dst)
+
+
+cdef inline int action_piece_type(long flag) noexcept nogil:
+    # The type of the moving piece, the index of the black piece constant.
+    if flag < castle_queenside_black:
+        return BLACK_PAWN if flag % 8 >= 5 else flag % 8
+    elif flag < promote_black_rook:
+        return BLACK_KING
+    return BLACK_PAWN
+
+
+cdef inline int promoted_piece_type(long flag) noexcept nogil:
+    # The type of the piece promoted to, the index of the black piece constant.
+    cdef int piece = (flag - promote_black_rook) % 5
+    return BLACK_PAWN if piece == 4 else piece
+
+
+cdef inline int captured_piece_type(State* state, Action action) noexcept nogil:
+    # The type of the captured piece, the index of the black piece constant, or -1.
+    cdef int piece
+    cdef Bitboard* pieces = piece_bitboards(state)
+    if action.flag == move_black_pawn_en_passant or action.flag == move_white_pawn_en_passant:
+        return BLACK_PAWN
+    if castle_queenside_black <= action.flag <= castle_kingside_white:
+        return -1
+    for piece in range(12):
+        if pieces[piece] & action.dst:
+            return piece % 6
+    return -1
+
+
+cdef inline bint in_check(const State* state) noexcept nogil:
+    # Whether the player to move is in check.
+    return state.is_white_check if state.white_player_turn else state.is_black_check
+
+
+cdef inline bint has_non_pawn_material(const State* state) noexcept nogil:
+    # Whether the player to move has a rook, knight, bishop or queen, null moves are not tried
+    # without as zugzwang is then common.
+    if state.white_player_turn:
+        return (state.white_rook | state.white_knight | state.white_bishop | state.white_queen) != EMPTY
+    return (state.black_rook | state.black_knight | state.black_bishop | state.black_queen) != EMPTY
 
 
 cdef class AlphaBetaSearch:
+    # Negamax with alpha-beta pruning, iterative deepening, a transposition table, move ordering and
+    # a quiescence search at the leaves. Null-move pruning, late-move reductions, principal
+    # variation search and aspiration windows are options. The search runs without the GIL on a
+    # Position with integer scores relative to the player to move, search is the Python wrapper
+    # converting the actions and values to numpy arrays.
     cdef Environment _env
-
-    def __init__(self, env):
+    cdef readonly TranspositionTable tt
+    cdef object _tt_piece_value
+    # statistics of the last search, the nodes visited and the depth of the returned values
+    cdef readonly long nodes
+    cdef readonly int completed_depth
+    cdef double _deadline
+    cdef bint _timed
+    cdef bint _stopped
+    # whether captures and promotions are searched beyond depth 0, see _quiescence
+    cdef readonly bint quiescence
+    # whether the evaluation adds the piece-square value to the material, see _evaluate
+    cdef readonly bint psqt
+    # the selective search options, see _negamax and _iterative_deepening
+    cdef readonly bint null_move
+    cdef readonly bint lmr
+    cdef readonly bint pvs
+    cdef readonly bint aspiration
+    cdef Score _aspiration_window
+    # the piece values of the player to move at the root, scaled to integers
+    cdef Score[12] _piece_value
+    cdef Score _delta_margin
+    cdef bint _white_root
+    # quiet actions causing a cutoff, by ply, and the history scores by action flag and destination
+    cdef Move[MAX_SEARCH_PLY][2] _killers
+    cdef int[30][64] _history
+    # searches of the other threads of a parallel search, sharing the transposition table, and
+    # the pool of threads started by the first parallel search until close
+    cdef readonly int threads
+    cdef list _helpers
+    cdef object _executor
+
+    def __init__(
+        self,
+        env,
+        tt_size_mb=0,
+        threads=1,
+        quiescence=True,
+        null_move=False,
+        lmr=False,
+        pvs=False,
+        aspiration=False,
+        psqt=True,
+    ):
+        cdef AlphaBetaSearch helper
+        if threads < 1:
+            raise ValueError(f"The number of threads {threads} must be positive.")
         self._env = env
-
-    cpdef search(self, State state, int depth, cnp.ndarray[double, ndim=1] piece_value):
-        cdef cnp.ndarray[Action, ndim=1] actions = self._env._actions(state)
-        cdef cnp.ndarray[double, ndim=1] value_array = np.empty(shape=actions.shape[0], dtype=np.float64)
-        for idx in range(actions.shape[0]):
-            new_state = self._env._step(state, actions[[idx]])
-            value_array[idx] = self._alphabeta(
-                state=new_state,
-                depth=depth - 1,
-                piece_value=piece_value,
-                alpha=-np.inf,
-                beta=np.inf,
-                maximizing_player=False,
+        self.tt = TranspositionTable(tt_size_mb) if tt_size_mb else None
+        self.threads = threads
+        self.quiescence = quiescence
+        self.null_move = null_move
+        self.lmr = lmr
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.psqt = psqt
+        self._helpers = []
+        for _ in range(threads - 1):
+            helper = AlphaBetaSearch(
+                env,
+                quiescence=quiescence,
+                null_move=null_move,
+                lmr=lmr,
+                pvs=pvs,
+                aspiration=aspiration,
+                psqt=psqt,
             )
-        return actions, value_array
+            helper.tt = self.tt
+            self._helpers.append(helper)
+        self._executor = None
+
+    def close(self):
+        """Shut down the threads of a parallel search, a later search starts them again."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
-    cdef _alphabeta(
+    def history(self):
+        """The history scores of the last search, (30, 64) by action flag and destination square.
+
+        Castling actions are scored on the destination square of the king.
+        """
+        return np.array(self._history, dtype=np.int32)
+
+    def search(
         self,
-        State state,
+        state,
         int depth,
         cnp.ndarray[double, ndim=1] piece_value,
-        double alpha,
-        double beta,
-        bint maximizing_player,
+        movetime=None,
     ):
-        """Minimax with alpha-beta pruning."""
+        """The actions of the state and their values searched to depth with iterative deepening.
+
+        The state is a STATE_DTYPE record or array of one element.
+
+        With a movetime in seconds the search stops when the time is used and the values of the
+        deepest completed iteration are returned, depth 1 is always completed. Each iteration
+        searches the actions in the order of the values of the previous iteration.
+
+        The actions with the best value have exact values, the values of the other actions are
+        upper bounds below the best value. Values are computed with the piece values rounded to
+        hundredths, a state without legal actions has value -inf for the player to move. With
+        quiescence the states at depth are valued by the quiescence search instead of the piece
+        values alone. With null_move or lmr parts of the tree are searched to a lower depth, and
+        the values can differ from those of the full width search. pvs and aspiration only change
+        the windows of the search and the nodes visited, the best actions and their value are
+        those of the search without them, with or without the transposition table. With psqt the
+        piece-square value of the state, in hundredths of a pawn, is added to the value of the
+        pieces.
+        """
+        cdef State state_ = as_state(state)
+        cdef cnp.ndarray actions = self._env._actions(state_)
+        cdef cnp.ndarray[Score, ndim=1] scores = np.zeros(actions.shape[0], dtype=np.int64)
+        cdef Position position
+        cdef AlphaBetaSearch helper
+        if self.tt is not None:
+            # Scores are relative to the piece values, these are negated when the player changes.
+            if self._tt_piece_value is None or not np.array_equal(self._tt_piece_value, piece_value):
+                self.tt.clear()
+                self._tt_piece_value = piece_value.copy()
+            self.tt._new_search()
+        deadline = None if movetime is None else monotonic_seconds() + movetime
+        self._prepare(state_, piece_value, deadline)
+        if self.threads > 1 and actions.shape[0] > 1:
+            for helper in self._helpers:
+                helper._prepare(state_, piece_value, deadline)
+            actions, scores = self._parallel_iterative_deepening(state_, actions, depth)
+        else:
+            position = Position(self._env, np.empty(1, dtype=STATE_DTYPE))
+            position._reset(state_)
+            with nogil:
+                self._iterative_deepening(
+                    position, <Action*> actions.data, <Score*> scores.data, actions.shape[0], depth
+                )
+        values = scores / SCORE_SCALE
+        values[scores >= SCORE_INFINITY] = np.inf
+        values[scores <= -SCORE_INFINITY] = -np.inf
+        return actions, values
+
+    cdef _set_piece_value(self, cnp.ndarray[double, ndim=1] piece_value, bint white_root):
+        cdef int piece
+        for piece in range(12):
+            self._piece_value[piece] = <Score> round(piece_value[piece] * SCORE_SCALE)
+        self._delta_margin = DELTA_MARGIN_PAWNS * abs(self._piece_value[WHITE_PAWN])
+        self._aspiration_window = max(abs(self._piece_value[WHITE_PAWN]) // 2, 1)
+        self._white_root = white_root
+
+    cdef _prepare(self, State state, cnp.ndarray[double, ndim=1] piece_value, deadline):
+        self._set_piece_value(piece_value, state.white_player_turn)
+        self.nodes = 0
+        self.completed_depth = 0
+        memset(self._killers, 0, sizeof(self._killers))
+        memset(self._history, 0, sizeof(self._history))
+        self._timed = deadline is not None
+        self._stopped = False
+        if self._timed:
+            self._deadline = deadline
+
+    cdef _parallel_iterative_deepening(self, State state, cnp.ndarray actions, int depth):
+        # Root parallel search, each iteration splits the root actions ordered by the scores of the
+        # previous iteration round robin between the threads. The scores of the actions of a thread
+        # are exact for the best actions of the thread and upper bounds below for the others, hence
+        # the merged scores are exact for the best actions overall as in the serial search. With
+        # aspiration the merged best score is checked against the window of the iteration.
+        cdef AlphaBetaSearch worker
+        cdef list workers = [self] + self._helpers
+        cdef cnp.ndarray scores = np.zeros(actions.shape[0], dtype=np.int64)
+        cdef cnp.ndarray iteration_scores
+        cdef Score alpha, beta
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.threads, thread_name_prefix=f"AlphaBetaSearch-{id(self):x}"
+            )
+        for iteration_depth in range(1, depth + 1):
+            self._root_window(scores[0], iteration_depth, &alpha, &beta)
+            while True:
+                splits = [np.arange(idx, actions.shape[0], len(workers)) for idx in range(len(workers))]
+                futures = [
+                    self._executor.submit(
+                        worker._search_root_actions, state, actions[split], iteration_depth, alpha, beta
+                    )
+                    for worker, split in zip(workers, splits)
+                ]
+                results = [future.result() for future in futures]
+                self.nodes = sum(worker.nodes for worker in workers)
+                if any(result is None for result in results):
+                    return actions, scores
+                iteration_scores = np.empty(actions.shape[0], dtype=np.int64)
+                for split, result in zip(splits, results):
+                    iteration_scores[split] = result
+                if not self._widen_window(iteration_scores.max(), &alpha, &beta):
+                    break
+            order = np.argsort(-iteration_scores, kind="stable")
+            actions = actions[order]
+            scores = iteration_scores[order]
+            for worker in workers:
+                worker.completed_depth = iteration_depth
+            if self._timed and monotonic_seconds() >= self._deadline:
+                break
+        return actions, scores
+
+    def _search_root_actions(self, State state, cnp.ndarray actions, int depth, Score alpha, Score beta):
+        # The scores of the root actions of the state at depth, None if the search was stopped.
+        cdef cnp.ndarray[Score, ndim=1] scores = np.zeros(actions.shape[0], dtype=np.int64)
+        cdef Position position = Position(self._env, np.empty(1, dtype=STATE_DTYPE))
+        cdef bint completed
+        position._reset(state)
+        with nogil:
+            completed = self._search_root(
+                position, <Action*> actions.data, <Score*> scores.data, actions.shape[0], depth,
+                alpha, beta,
+            )
+        return scores if completed else None
+
+    cdef void _root_window(
+        self, Score previous_score, int depth, Score* alpha, Score* beta
+    ) noexcept nogil:
+        # The window of the root search at depth. With aspiration it is half a pawn around the best
+        # score of the previous iteration, unless it is a mate, otherwise it is infinite.
+        # See: https://www.chessprogramming.org/Aspiration_Windows
+        alpha[0] = -SCORE_INFINITY - 1
+        beta[0] = SCORE_INFINITY + 1
+        if self.aspiration and depth > 1 and -SCORE_INFINITY < previous_score < SCORE_INFINITY:
+            alpha[0] = previous_score - self._aspiration_window
+            beta[0] = previous_score + self._aspiration_window
+
+    cdef bint _widen_window(self, Score best_score, Score* alpha, Score* beta) noexcept nogil:
+        # Opens the side of the root window the best score failed, False if the score is inside.
+        if best_score <= alpha[0]:
+            alpha[0] = -SCORE_INFINITY - 1
+        elif best_score >= beta[0]:
+            beta[0] = SCORE_INFINITY + 1
+        else:
+            return False
+        return True
 
-        if depth == 0:
-            value = self.state_value(state, piece_value)
+    cdef bint _search_root(
+        self,
+        Position position,
+        Action* actions,
+        Score* scores,
+        int n_actions,
+        int depth,
+        Score alpha,
+        Score beta,
+    ) noexcept nogil:
+        # Scores the root actions at depth in the window (alpha, beta), False if the search was
+        # stopped.
+        cdef int idx
+        cdef Score best_score = -SCORE_INFINITY
+        for idx in range(n_actions):
+            position._make_move(actions[idx])
+            # Scores equal to the best score are exact, hence actions with equal score are found,
+            # the window is just below the best score such that worse actions fail low.
+            scores[idx] = -self._negamax(
+                position, depth - 1, 1, -beta, -max(alpha, best_score - 1), True
+            )
+            position._unmake_move()
+            if self._stopped:
+                return False
+            best_score = max(best_score, scores[idx])
+        return True
+
+    cdef void _iterative_deepening(
+        self, Position position, Action* actions, Score* scores, int n_actions, int depth
+    ) noexcept nogil:
+        # Searches the root actions to depth 1, 2, ..., depth and keeps the actions and scores of
+        # the last completed iteration sorted by descending score. An iteration failing the
+        # aspiration window is searched again with the failed side opened.
+        cdef Score[MAX_ACTIONS] iteration_scores
+        cdef int iteration_depth, idx, jdx
+        cdef Score score, alpha, beta, best_score
+        cdef Action action
+        for iteration_depth in range(1, depth + 1):
+            self._root_window(
+                scores[0] if n_actions > 0 else -SCORE_INFINITY, iteration_depth, &alpha, &beta
+            )
+            while True:
+                if not self._search_root(
+                    position, actions, iteration_scores, n_actions, iteration_depth, alpha, beta
+                ):
+                    return
+                best_score = -SCORE_INFINITY
+                for idx in range(n_actions):
+                    best_score = max(best_score, iteration_scores[idx])
+                if not self._widen_window(best_score, &alpha, &beta):
+                    break
+            self.completed_depth = iteration_depth
+            # the best actions first in the next iteration, the insertion sort is stable
+            for idx in range(n_actions):
+                action = actions[idx]
+                score = iteration_scores[idx]
+                jdx = idx
+                while jdx > 0 and scores[jdx - 1] < score:
+                    scores[jdx] = scores[jdx - 1]
+                    actions[jdx] = actions[jdx - 1]
+                    jdx -= 1
+                scores[jdx] = score
+                actions[jdx] = action
+            if self._timed and monotonic_seconds() >= self._deadline:
+                return
+
+    cdef Score _evaluate(self, const State* state) noexcept nogil:
+        # The material value for the player to move, with psqt plus the piece-square value kept in
+        # the state by make_action.
+        cdef int piece
+        cdef Score score = 0
+        cdef const Bitboard* pieces = &state.black_rook
+        for piece in range(12):
+            score += pop_count(pieces[piece]) * self._piece_value[piece]
+        if self.psqt:
+            score += psqt_value(state) if self._white_root else -psqt_value(state)
+        return score if state.white_player_turn == self._white_root else -score
+
+    cdef void _order_actions(
+        self, State* state, Action* actions, int n_actions, int ply, Move tt_move
+    ) noexcept nogil:
+        # Sorts the actions by descending move ordering score with an insertion sort.
+        cdef int[MAX_ACTIONS] scores
+        cdef int idx, jdx, score, victim
+        cdef Action action
+        cdef Move move
+        for idx in range(n_actions):
+            action = actions[idx]
+            move = encode_move(action)
+            victim = captured_piece_type(state, action)
+            if move == tt_move:
+                score = ORDER_TT_ACTION
+            elif action.flag >= promote_black_rook:
+                score = ORDER_PROMOTION + ORDER_PIECE_VALUE[promoted_piece_type(action.flag)]
+                if victim >= 0:
+                    score += ORDER_PIECE_VALUE[victim]
+            elif victim >= 0:
+                score = (
+                    ORDER_CAPTURE
+                    + 16 * ORDER_PIECE_VALUE[victim]
+                    - ORDER_PIECE_VALUE[action_piece_type(action.flag)] // 100
+                )
+            elif ply < MAX_SEARCH_PLY and move == self._killers[ply][0]:
+                score = ORDER_KILLER_0
+            elif ply < MAX_SEARCH_PLY and move == self._killers[ply][1]:
+                score = ORDER_KILLER_1
+            else:
+                score = min(self._history[action.flag][history_square(action)], ORDER_HISTORY_MAX)
+            jdx = idx
+            while jdx > 0 and scores[jdx - 1] < score:
+                scores[jdx] = scores[jdx - 1]
+                actions[jdx] = actions[jdx - 1]
+                jdx -= 1
+            scores[jdx] = score
+            actions[jdx] = action
+
+    cdef void _update_cutoff(self, State* state, Action action, int depth, int ply) noexcept nogil:
+        # Quiet actions causing a beta cutoff become killer moves and gain history score.
+        cdef Move move
+        if action.flag >= promote_black_rook or captured_piece_type(state, action) >= 0:
+            return
+        move = encode_move(action)
+        if ply < MAX_SEARCH_PLY and move != self._killers[ply][0]:
+            self._killers[ply][1] = self._killers[ply][0]
+            self._killers[ply][0] = move
+        self._history[action.flag][history_square(action)] += depth * depth
+
+    cdef inline bint _check_deadline(self) noexcept nogil:
+        # Stops a timed search when the deadline has passed, checked every DEADLINE_CHECK_NODES.
+        if (
+            self._timed
+            and self.completed_depth > 0
+            and self.nodes % DEADLINE_CHECK_NODES == 0
+            and monotonic_seconds() >= self._deadline
+        ):
+            self._stopped = True
+        return self._stopped
+
+    cdef Score _material_gain(self, State* state, Action action) noexcept nogil:
+        # The change of _evaluate for the player to move by the captured and promoted pieces.
+        cdef int us = WHITE_ROOK if state.white_player_turn else BLACK_ROOK
+        cdef int them = BLACK_ROOK if state.white_player_turn else WHITE_ROOK
+        cdef int victim = captured_piece_type(state, action)
+        cdef Score gain = 0
+        if victim >= 0:
+            gain -= self._piece_value[them + victim]
+        if action.flag >= promote_black_rook:
+            gain += (
+                self._piece_value[us + promoted_piece_type(action.flag)]
+                - self._piece_value[us + BLACK_PAWN]
+            )
+        return gain if state.white_player_turn == self._white_root else -gain
+
+    cdef Score _quiescence(self, Position position, int ply, Score alpha, Score beta) noexcept nogil:
+        # Searches the captures and promotions until the state is quiet, such that a capture
+        # sequence is not cut off at depth 0. The player to move can stand pat on the static value
+        # and captures which, with the value of the captured piece and a margin, do not reach
+        # alpha are pruned. In check all the legal actions are searched, as in _negamax a state
+        # without legal actions has score -inf. Returns the fail-soft score for the player to move,
+        # or alpha if it is below alpha and captures were pruned as their score is only bounded by
+        # alpha. At MAX_SEARCH_PLY, e.g. after a long sequence of checks, the static value is
+        # returned.
+        # See: https://www.chessprogramming.org/Quiescence_Search
+        cdef ActionList action_list
+        cdef State* state = &position._state
+        cdef bint white = state.white_player_turn
+        cdef bint checked = in_check(state)
+        cdef Score stand_pat = -SCORE_INFINITY
+        cdef Score value = -SCORE_INFINITY
+        cdef Score child_value
+        cdef Action action
+        cdef int idx
+        cdef bint pruned = False
+
+        self.nodes += 1
+        if self._check_deadline():
+            return 0
+        if ply >= MAX_SEARCH_PLY:
+            return self._evaluate(state)
+
+        if checked:
+            self._env._generate_actions(state, &action_list)
         else:
-            actions = self._env._actions(state)
-            if maximizing_player:
-                value = -np.inf
-                for idx in range(actions.shape[0]):
-                    new_state = self._env._step(state, actions[[idx]])
-                    new_value = self._alphabeta(new_state, depth - 1, piece_value, alpha, beta, False)
-                    value = max(value, new_value)
-                    alpha = max(alpha, value)
-                    if alpha >= beta:
-                        break
+            stand_pat = self._evaluate(state)
+            if stand_pat >= beta:
+                return stand_pat
+            value = stand_pat
+            alpha = max(alpha, stand_pat)
+            self._env._generate_captures(state, &action_list)
+        self._order_actions(state, action_list.actions, action_list.size, ply, MOVE_NONE)
+
+        for idx in range(action_list.size):
+            action = action_list.actions[idx]
+            if not checked and stand_pat + self._material_gain(state, action) + self._delta_margin <= alpha:
+                pruned = True
+                continue
+            position._make_move(action)
+            # the captures are pseudo actions, those leaving the king in check are skipped
+            if position._state.is_white_check if white else position._state.is_black_check:
+                position._unmake_move()
+                continue
+            child_value = -self._quiescence(position, ply + 1, -beta, -alpha)
+            position._unmake_move()
+            if self._stopped:
+                return 0
+            value = max(value, child_value)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+        return max(value, alpha) if pruned else value
+
+    cdef Score _negamax(
+        self, Position position, int depth, int ply, Score alpha, Score beta, bint allow_null
+    ) noexcept nogil:
+        # Negamax with alpha-beta pruning, returns the fail-soft score for the player to move.
+        #
+        # With null_move the other player moves twice in a row in a search reduced by
+        # NULL_MOVE_REDUCTION, if that still fails high the state is cut off. It is not tried in
+        # check, without rook, knight, bishop or queen, nor twice in a row, allow_null is False
+        # after a null move. With lmr the quiet actions after the first LMR_FULL_DEPTH_ACTIONS are
+        # searched one ply shallower with a zero window and again at full depth if they raise
+        # alpha. With pvs the actions after the first are searched with a zero window and again
+        # with the full window if the score is inside it.
+        # See: https://www.chessprogramming.org/Principal_Variation_Search
+        cdef ActionList action_list
+        cdef TTEntry entry
+        cdef bint tt_hit = False
+        cdef Bitboard key = position._state.zobrist_key
+        cdef bint checked = in_check(&position._state)
+        cdef bint quiet
+        cdef Score alpha_orig = alpha
+        cdef Score beta_orig = beta
+        cdef Score value = -SCORE_INFINITY
+        cdef Score child_value
+        cdef Action action
+        cdef Move best_move = MOVE_NONE
+        cdef int idx, bound, reduction
+
+        self.nodes += 1
+        if self._check_deadline():
+            return 0
+
+        if depth == 0:
+            if self.quiescence:
+                return self._quiescence(position, ply, alpha, beta)
+            return self._evaluate(&position._state)
+
+        if self.tt is not None:
+            tt_hit = self.tt._probe(key, &entry)
+        # The window is not narrowed by a bound, the stored bound of this search is relative to
+        # the window it is given, hence a bound only returns when it cuts off the window.
+        if tt_hit and entry.depth >= depth and (
+            entry.bound == BOUND_EXACT
+            or (entry.bound == BOUND_LOWER and entry.score >= beta)
+            or (entry.bound == BOUND_UPPER and entry.score <= alpha)
+        ):
+            return entry.score
+
+        if (
+            self.null_move
+            and allow_null
+            and not checked
+            and depth >= NULL_MOVE_MIN_DEPTH
+            and beta < SCORE_INFINITY
+            and has_non_pawn_material(&position._state)
+        ):
+            position._make_null_move()
+            child_value = -self._negamax(
+                position, depth - 1 - NULL_MOVE_REDUCTION, ply + 1, -beta, -beta + 1, False
+            )
+            position._unmake_move()
+            if self._stopped:
+                return 0
+            if child_value >= beta:
+                # a mate found after passing is not proven, hence the bound is returned
+                return beta
+
+        self._env._generate_actions(&position._state, &action_list)
+        self._order_actions(
+            &position._state,
+            action_list.actions,
+            action_list.size,
+            ply,
+            entry.best_move if tt_hit else MOVE_NONE,
+        )
+
+        for idx in range(action_list.size):
+            action = action_list.actions[idx]
+            quiet = (
+                action.flag < promote_black_rook
+                and captured_piece_type(&position._state, action) < 0
+            )
+            position._make_move(action)
+            reduction = 0
+            if (
+                self.lmr
+                and idx >= LMR_FULL_DEPTH_ACTIONS
+                and depth >= LMR_MIN_DEPTH
+                and quiet
+                and not checked
+                and not in_check(&position._state)
+            ):
+                reduction = 1
+            if idx == 0 or not (self.pvs or reduction):
+                child_value = -self._negamax(position, depth - 1, ply + 1, -beta, -alpha, True)
             else:
-                value = np.inf
-                for idx in range(actions.shape[0]):
-                    new_state = self._env._step(state, actions[[idx]])
-                    new_value = self._alphabeta(new_state, depth - 1, piece_value, alpha, beta, True)
-                    value = min(value, new_value)
-                    beta = min(beta, value)
-                    if alpha >= beta:
-                        break
+                child_value = -self._negamax(
+                    position, depth - 1 - reduction, ply + 1, -alpha - 1, -alpha, True
+                )
+                if child_value > alpha and reduction and self.pvs:
+                    child_value = -self._negamax(
+                        position, depth - 1, ply + 1, -alpha - 1, -alpha, True
+                    )
+                if child_value > alpha and (child_value < beta or not self.pvs):
+                    child_value = -self._negamax(position, depth - 1, ply + 1, -beta, -alpha, True)
+            position._unmake_move()
+            if self._stopped:
+                return 0
+            if child_value > value or best_move == MOVE_NONE:
+                best_move = encode_move(action)
+            value = max(value, child_value)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self._update_cutoff(&position._state, action, depth, ply)
+                break
+
+        if self.tt is not None:
+            if value <= alpha_orig:
+                bound = BOUND_UPPER
+            elif value >= beta_orig:
+                bound = BOUND_LOWER
+            else:
+                bound = BOUND_EXACT
+            self.tt._store(key, depth, bound, value, best_move)
         return value
 
     def state_value(self, State state, cnp.ndarray[double, ndim=1] piece_value):
@@ -1297,3 +3254,19 @@ cdef class AlphaBetaSearch:
             + pop_count(state.white_king) * piece_value[WHITE_KING]
             + pop_count(state.white_pawn) * piece_value[WHITE_PAWN]
         )
+
+    def evaluate(self, states, cnp.ndarray[double, ndim=1] piece_value, white_root=True):
+        """The values of the N states for the player to move as evaluated at the leaves of search.
+
+        The piece values are those of the player at the root, white if white_root, as given to
+        search. The values are in pawns with the piece values rounded to hundredths and, with psqt,
+        include the piece-square value.
+        """
+        cdef const State[:] states_view = np.asarray(states, dtype=STATE_DTYPE).reshape(-1)
+        cdef cnp.ndarray[Score, ndim=1] scores = np.empty(states_view.shape[0], dtype=np.int64)
+        cdef Py_ssize_t i
+        self._set_piece_value(piece_value, white_root)
+        with nogil:
+            for i in range(states_view.shape[0]):
+                scores[i] = self._evaluate(&states_view[i])
+        return scores / SCORE_SCALE
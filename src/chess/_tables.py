@@ -0,0 +1,63 @@
+"""On-disk cache of the magic bitboard attack tables.
+
+Building the rook and bishop attack tables enumerates every blocker subset of every square, so
+the tables are built once and stored as a memory-mapped ``.npy`` file next to a sha256 checksum.
+The cache directory is ``$CHESS_CACHE_DIR`` or ``$XDG_CACHE_HOME/chess`` (``~/.cache/chess``).
+"""
+import hashlib
+import os
+import pathlib
+import tempfile
+
+import numpy as np
+
+# Bump when the layout of the tables changes, old cache files are then ignored.
+ATTACK_TABLES_VERSION = 1
+ATTACK_TABLES_SIZE = 102400 + 5248
+ATTACK_TABLES_SHA256 = "da53db2a27a2d59ed48cd2929fe5d62d711c6fd7bdaff2de0c1f8215fd464a5b"
+
+
+def cache_dir() -> pathlib.Path:
+    if "CHESS_CACHE_DIR" in os.environ:
+        return pathlib.Path(os.environ["CHESS_CACHE_DIR"])
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache")
+    return pathlib.Path(xdg_cache_home) / "chess"
+
+
+def attack_tables_path() -> pathlib.Path:
+    return cache_dir() / f"attack_tables-v{ATTACK_TABLES_VERSION}.npy"
+
+
+def checksum(attack_tables: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(attack_tables).view(np.uint8)).hexdigest()
+
+
+def load_attack_tables():
+    """Memory-map the cached attack tables, None if missing or if the checksum does not match."""
+    path = attack_tables_path()
+    try:
+        attack_tables = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if (
+        attack_tables.dtype != np.uint64
+        or attack_tables.shape != (ATTACK_TABLES_SIZE,)
+        or checksum(attack_tables) != ATTACK_TABLES_SHA256
+    ):
+        return None
+    return attack_tables
+
+
+def save_attack_tables(attack_tables: np.ndarray) -> bool:
+    """Atomically write the attack tables to the cache, False if the cache is not writable."""
+    if checksum(attack_tables) != ATTACK_TABLES_SHA256:
+        raise ValueError("Attack tables does not match the expected checksum.")
+    path = attack_tables_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".npy", delete=False) as f:
+            np.save(f, attack_tables)
+        os.replace(f.name, path)
+    except OSError:
+        return False
+    return True
@@ -1,5 +1,17 @@
 import numpy as np
-from ._environment import bb_to_ij, ActionFlag
+from ._environment import (  # noqa: F401
+    bb_to_ij,
+    psqt_terms,
+    zobrist_key,
+    ActionFlag,
+    actions_to_moves,
+    encode_planes,
+    moves_to_actions,
+    state_from_fen,
+    state_to_fen,
+    states_from_fens,
+    states_to_fens,
+)
 from ._constants import (
     EMPTY,
     WHITE,
@@ -49,6 +61,9 @@ def board_swapcolor(board: str):
     return board.translate(str.maketrans(TRANSLATIONTABLE))
 
 
+PIECE_NAME_BY_STR = dict(zip(PIECE_STRS, PIECE_NAMES))
+
+
 def state_init(color: int = WHITE, board: str = BOARD, **kwargs):
     assert color in set([WHITE, BLACK])
     assert len(board) == 64
@@ -59,13 +74,11 @@ def state_init(color: int = WHITE, board: str = BOARD, **kwargs):
     state["ply"] = 0
     for key, value in kwargs.items():
         state[key] = value
-    cursor = 1
-    for entry in board:
-        for piece_name, piece_str in zip(PIECE_NAMES, PIECE_STRS):
-            if entry == piece_str:
-                state[0][piece_name] |= np.uint64(cursor)
-                break
-        cursor = cursor << 1
+    for square, entry in enumerate(board):
+        if entry in PIECE_NAME_BY_STR:
+            state[0][PIECE_NAME_BY_STR[entry]] |= np.uint64(1 << square)
+    state["zobrist_key"] = zobrist_key(state)
+    state["psqt_mg"], state["psqt_eg"], state["phase"] = psqt_terms(state)
     return state
 
 
@@ -133,7 +146,7 @@ def simulate_random_game(env, verbose=False):
     for ply in range(MAX_PLY + 1):
         choices = env.actions(state)
         assert len(choices) > 0, f"\n{state_str(state)}"
-        state = env.step(state, np.random.choice(choices))
+        state = env.step(state, np.random.choice(choices), terminal=True)
         if verbose:
             print(state_str(state))
         if (
@@ -192,6 +205,30 @@ def flipud_invariant(testdata):
     ]
 
 
+def action_uci(action) -> str:
+    """The action in UCI long algebraic notation, e.g. e2e4, e1g1 or e7e8q."""
+    flag = action["action_flag"]
+    if flag == ActionFlag.castle_queenside_black:
+        return "e8c8"
+    elif flag == ActionFlag.castle_kingside_black:
+        return "e8g8"
+    elif flag == ActionFlag.castle_queenside_white:
+        return "e1c1"
+    elif flag == ActionFlag.castle_kingside_white:
+        return "e1g1"
+    src_i, src_j = bb_to_ij(action["src"])
+    dst_i, dst_j = bb_to_ij(action["dst"])
+    uci = (
+        LETTERS[src_j]
+        + str(REVERSED_NUMBERS[src_i])
+        + LETTERS[dst_j]
+        + str(REVERSED_NUMBERS[dst_i])
+    )
+    if ActionFlag.promote_black_rook <= flag <= ActionFlag.promote_white_pawn:
+        uci += "rnbqp"[(flag - ActionFlag.promote_black_rook) % 5]
+    return uci
+
+
 def actions_str(actions) -> str:
     return "\n".join([f"{idx:<3}: {_action_str(a)}" for idx, a in enumerate(actions)])
 
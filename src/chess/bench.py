@@ -0,0 +1,107 @@
+"""Search benchmark, the time and nodes per second of the alpha-beta search by number of threads.
+
+The reference positions of perft are searched to a fixed depth with 1, 2, 4, ... threads and the
+speedup is the time with 1 thread divided by the time with the given number of threads. The leaf
+evaluation rate is the number of evaluations per second of the reference positions by the evaluation
+at the leaves of the search, see AlphaBetaSearch.evaluate.
+
+The selectivity benchmark searches the reference positions with each of the selective search
+options of AlphaBetaSearch alone and all together, and reports the nodes and the time to depth.
+"""
+import os
+import time
+
+import numpy as np
+
+from chess import get_env
+from chess._agent import AlphaBetaAgent
+from chess._environment import AlphaBetaSearch
+from chess._utils import state_from_fen
+from chess.perft import POSITIONS
+
+SEARCH_DEPTH = 6
+EVALUATION_STATES = 1 << 16
+SEARCH_OPTIONS = ("null_move", "lmr", "pvs", "aspiration")
+
+
+def default_threads() -> list[int]:
+    """1, 2, 4, ... up to the number of CPU cores."""
+    threads = [1]
+    while threads[-1] * 2 <= (os.cpu_count() or 1):
+        threads.append(threads[-1] * 2)
+    return threads
+
+
+def search_time(
+    threads: int, depth: int, tt_size_mb: float = 16, env=None, **options
+) -> tuple[int, float]:
+    """The nodes and seconds of searching the reference positions to depth.
+
+    The options are given to AlphaBetaSearch, e.g. null_move=True.
+    """
+    if env is None:
+        env = get_env()
+    agent = AlphaBetaAgent()
+    total_nodes = 0
+    total_seconds = 0.0
+    for _, fen, _ in POSITIONS:
+        state = state_from_fen(fen)
+        piece_value = agent._piece_value(bool(state["white_player_turn"]))
+        with AlphaBetaSearch(env, tt_size_mb=tt_size_mb, threads=threads, **options) as search:
+            start = time.perf_counter()
+            search.search(state, depth, piece_value)
+            total_seconds += time.perf_counter() - start
+            total_nodes += search.nodes
+    return total_nodes, total_seconds
+
+
+def evaluation_rate(n_states: int = EVALUATION_STATES, repeat: int = 5, env=None) -> float:
+    """The leaf evaluations per second of the reference positions, the best of repeat runs."""
+    if env is None:
+        env = get_env()
+    states = np.concatenate([state_from_fen(fen) for _, fen, _ in POSITIONS])
+    states = np.resize(states, n_states)
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    search = AlphaBetaSearch(env)
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        search.evaluate(states, piece_value)
+        seconds = min(seconds, time.perf_counter() - start)
+    return n_states / seconds
+
+
+def bench(threads: list[int] = None, depth: int = SEARCH_DEPTH, env=None) -> dict[int, float]:
+    """Print the speedup curve of the search and return the speedup by number of threads."""
+    if threads is None:
+        threads = default_threads()
+    speedups = {}
+    base_seconds = None
+    for n_threads in threads:
+        nodes, seconds = search_time(n_threads, depth, env=env)
+        if base_seconds is None:
+            base_seconds = seconds
+        speedups[n_threads] = base_seconds / seconds
+        print(
+            f"threads {n_threads:>3}  nodes {nodes:>10}  time {seconds:>8.3f}s  "
+            f"nodes/second {nodes / seconds:>10.0f}  speedup {speedups[n_threads]:>5.2f}"
+        )
+    print(f"leaf evaluations/second {evaluation_rate(env=env):.0f}")
+    return speedups
+
+
+def selectivity(depth: int = SEARCH_DEPTH, env=None) -> dict[str, tuple[int, float]]:
+    """Print and return the nodes and seconds to depth without options, each alone and all."""
+    configurations = {"none": {}}
+    for option in SEARCH_OPTIONS:
+        configurations[option] = {option: True}
+    configurations["all"] = {option: True for option in SEARCH_OPTIONS}
+    results = {}
+    for name, options in configurations.items():
+        nodes, seconds = search_time(1, depth, env=env, **options)
+        results[name] = (nodes, seconds)
+        print(
+            f"{name:<12}  nodes {nodes:>10}  time {seconds:>8.3f}s  "
+            f"nodes {nodes / results['none'][0]:>6.2f}x  time {seconds / results['none'][1]:>6.2f}x"
+        )
+    return results
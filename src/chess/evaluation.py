@@ -0,0 +1,142 @@
+"""Vectorized evaluation of batches of states, e.g. to label logged games.
+
+The states are evaluated column by column with NumPy. The 12 bitboards of a state are 96 bytes and
+each byte indexes a table of the popcount and piece-square values of its 8 squares, such that a
+batch is evaluated by 96 lookups per state. The piece-square tables and the game phase are those
+of the search, see psqt_tables, and the piece values are given as for AlphaBetaAgent, hence
+evaluate(states) is the value of the search at depth 0 for white.
+"""
+import numpy as np
+
+from chess._constants import (
+    BLACK_BISHOP,
+    BLACK_KING,
+    BLACK_KNIGHT,
+    BLACK_PAWN,
+    BLACK_QUEEN,
+    BLACK_ROOK,
+    PIECE_NAMES,
+    PIECE_VALUE,
+    STATE_DTYPE,
+    WHITE_ROOK,
+)
+from chess._environment import psqt_tables
+
+# The phase is PHASE_MAX with all pieces on the board, the value is the middlegame value at this
+# phase and the endgame value at phase 0.
+PSQT_MG, PSQT_EG, PHASE, PHASE_MAX = psqt_tables()
+# The number of states looked up at a time, such that the bytes of a chunk stay in the cache.
+CHUNK_SIZE = 1 << 14
+
+_PIECE_TYPES = {
+    "Rook": BLACK_ROOK,
+    "Knight": BLACK_KNIGHT,
+    "Bishop": BLACK_BISHOP,
+    "Queen": BLACK_QUEEN,
+    "King": BLACK_KING,
+    "Pawn": BLACK_PAWN,
+}
+# The bitboards are consecutive in STATE_DTYPE, black rook first.
+_PIECE_OFFSET = np.dtype(STATE_DTYPE).fields[PIECE_NAMES[0]][1]
+_PIECE_BYTES = 12 * 8
+# Sums of terms packed in an int64, each term a signed field of _FIELD_BITS bits.
+_FIELD_BITS = 21
+_COUNT_BITS = 5
+
+
+def piece_values(piece_value: dict[str, float] = PIECE_VALUE, white: bool = True) -> np.ndarray:
+    """The value of each of the 12 pieces, positive for the pieces of white if white is True."""
+    values = np.zeros(12)
+    for name, piece in _PIECE_TYPES.items():
+        values[BLACK_ROOK + piece] = -piece_value[name]
+        values[WHITE_ROOK + piece] = piece_value[name]
+    return values if white else -values
+
+
+# The squares of each byte value, (256, 8), and byte k of a bitboard is the squares 8 k to 8 k + 7.
+_BYTE_SQUARES = np.unpackbits(
+    np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder="little"
+).astype(np.int64)
+# The middlegame value, the endgame value and the phase of byte value b of byte k of the bitboards
+# packed in an int64, (96, 256).
+_PSQT_TABLE = (
+    np.einsum("bi,ki->kb", _BYTE_SQUARES, PSQT_MG.reshape(_PIECE_BYTES, 8).astype(np.int64))
+    + (np.einsum(
+        "bi,ki->kb", _BYTE_SQUARES, PSQT_EG.reshape(_PIECE_BYTES, 8).astype(np.int64)
+    ) << _FIELD_BITS)
+    + (np.repeat(PHASE.astype(np.int64), 8)[:, None] * _BYTE_SQUARES.sum(axis=1) << 2 * _FIELD_BITS)
+)
+# The popcount of byte value b of byte k packed in the field of its piece, (96, 256). A field holds
+# up to 31 pieces of a kind, the most on a board is 10.
+_COUNT_TABLE = _BYTE_SQUARES.sum(axis=1) << (
+    _COUNT_BITS * (np.arange(_PIECE_BYTES)[:, None] // 8)
+)
+
+
+def _lookup(states: np.ndarray, table: np.ndarray) -> np.ndarray:
+    # The sum over the 96 bytes of the bitboards of each state of the table values of the byte.
+    states = np.ascontiguousarray(states, dtype=STATE_DTYPE).reshape(-1)
+    data = states.view(np.uint8).reshape(len(states), -1)
+    data = data[:, _PIECE_OFFSET:_PIECE_OFFSET + _PIECE_BYTES]
+    sums = np.empty(len(states), dtype=np.int64)
+    for start in range(0, len(states), CHUNK_SIZE):
+        columns = np.ascontiguousarray(data[start:start + CHUNK_SIZE].T)
+        chunk = np.zeros(columns.shape[1], dtype=np.int64)
+        for byte, column in enumerate(columns):
+            chunk += table[byte].take(column)
+        sums[start:start + CHUNK_SIZE] = chunk
+    return sums
+
+
+def _unpack(packed: np.ndarray, bits: int) -> np.ndarray:
+    # The signed field in the low bits and the remaining packed fields.
+    half = 1 << (bits - 1)
+    field = ((packed + half) & ((1 << bits) - 1)) - half
+    return field, (packed - field) >> bits
+
+
+def piece_counts(states: np.ndarray) -> np.ndarray:
+    """The (N, 12) number of each piece of the N states, the popcount of the bitboards."""
+    packed = _lookup(states, _COUNT_TABLE)
+    shifts = _COUNT_BITS * np.arange(12)
+    return (packed[:, None] >> shifts) & ((1 << _COUNT_BITS) - 1)
+
+
+def material(states: np.ndarray, piece_value: dict[str, float] = PIECE_VALUE) -> np.ndarray:
+    """The sum of the piece values for white of each state."""
+    return piece_counts(states) @ piece_values(piece_value)
+
+
+def psqt_terms(states: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The middlegame and endgame piece-square values for white and the phase of each state.
+
+    These are the psqt_mg, psqt_eg and phase fields of the states computed from the bitboards.
+    """
+    mg, packed = _unpack(_lookup(states, _PSQT_TABLE), _FIELD_BITS)
+    eg, phase = _unpack(packed, _FIELD_BITS)
+    return mg, eg, phase
+
+
+def psqt_value(states: np.ndarray) -> np.ndarray:
+    """The piece-square value for white in hundredths of a pawn of each state.
+
+    The middlegame and endgame values are blended by the phase, rounded towards zero as in the
+    search.
+    """
+    mg, eg, phase = psqt_terms(states)
+    phase = np.minimum(phase, PHASE_MAX)
+    blended = mg * phase + eg * (PHASE_MAX - phase)
+    return np.sign(blended) * (np.abs(blended) // PHASE_MAX)
+
+
+def evaluate(
+    states: np.ndarray, piece_value: dict[str, float] = PIECE_VALUE, psqt: bool = True
+) -> np.ndarray:
+    """The value for white of each of the N states, in pawns with the default piece values.
+
+    The material value plus, with psqt, the piece-square value as evaluated by AlphaBetaSearch.
+    """
+    values = material(states, piece_value)
+    if psqt:
+        values = values + psqt_value(states) / 100
+    return values
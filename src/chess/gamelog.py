@@ -0,0 +1,240 @@
+"""Compact binary game log, the start state and 16-bit moves of each game appended to one file.
+
+A file starts with the 8-byte magic b"CHESSLOG" and the version, followed by the games. A game is
+a header, the start state as a STATE_DTYPE record, the moves and a state snapshot after every
+snapshot_interval plies such that any ply is replayed from the nearest snapshot.
+
+A move is from_square | to_square << 6 | kind << 12 where the kind is the action flag relative to
+the player in turn, see MOVE_DTYPE. The player in turn alternates from the start state, hence
+a game of n plies is stored in about 170 bytes for the start state and 2 n bytes for the moves.
+"""
+import os
+
+import numpy as np
+
+from chess import get_env
+from chess._constants import (
+    ACTION_DTYPE,
+    MOVE_DTYPE,
+    STATE_DTYPE,
+)
+from chess._utils import actions_to_moves, moves_to_actions
+
+MAGIC = b"CHESSLOG"
+VERSION = 2
+FILE_HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("reserved", "<u4")])
+GAME_HEADER_DTYPE = np.dtype(
+    [("magic", "S4"), ("n_moves", "<u4"), ("snapshot_interval", "<u4"), ("result", "<i4")]
+)
+GAME_MAGIC = b"GAME"
+SNAPSHOT_INTERVAL = 64
+STATE_ITEMSIZE = np.dtype(STATE_DTYPE).itemsize
+
+# Results of a game, from the terminal flags of the last state.
+UNFINISHED = 0
+WHITE_WIN = 1
+BLACK_WIN = 2
+DRAW = 3
+
+
+def encode_actions(actions: np.ndarray) -> np.ndarray:
+    """Encode actions as 16-bit moves, the color of each action is given by its player in turn."""
+    return actions_to_moves(actions)
+
+
+def decode_actions(moves: np.ndarray, white_player_turn: np.ndarray) -> np.ndarray:
+    """Decode 16-bit moves given whether white is in turn for each move."""
+    return moves_to_actions(moves, white_player_turn)
+
+
+def result(state) -> int:
+    """The result of the game ending in the state."""
+    if state["is_black_checkmate"]:
+        return WHITE_WIN
+    elif state["is_white_checkmate"]:
+        return BLACK_WIN
+    elif state["is_draw"]:
+        return DRAW
+    return UNFINISHED
+
+
+def _replay(start_state, actions, env=None) -> np.ndarray:
+    # The states after each action as logged by simulate, with the terminal flags.
+    if env is None:
+        env = get_env()
+    states = np.empty(len(actions) + 1, dtype=STATE_DTYPE)
+    states[0] = start_state
+    for idx, action in enumerate(actions):
+        states[idx + 1] = env.step(states[idx], action, terminal=True)[0]
+    return states
+
+
+class GameLogWriter:
+    """Append-only writer, each game is flushed to the file when it is written.
+
+    Args:
+        path (str): The file, games are appended if it exists.
+        snapshot_interval (int): The plies between state snapshots, 0 for no snapshots.
+    """
+
+    def __init__(self, path, snapshot_interval: int = SNAPSHOT_INTERVAL):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            _check_file_header(np.fromfile(path, dtype=FILE_HEADER_DTYPE, count=1))
+        self._file = open(path, "ab")
+        if not exists:
+            header = np.zeros(1, dtype=FILE_HEADER_DTYPE)
+            header["magic"] = MAGIC
+            header["version"] = VERSION
+            self._file.write(header.tobytes())
+
+    def write(self, state_log: np.ndarray, action_log: np.ndarray) -> None:
+        """Write a game given the states and actions, e.g. the logs returned by simulate."""
+        state_log = np.asarray(state_log, dtype=STATE_DTYPE).reshape(-1)
+        action_log = np.asarray(action_log, dtype=ACTION_DTYPE).reshape(-1)
+        if len(state_log) != len(action_log) + 1:
+            raise ValueError(
+                f"Expected one more state than actions, got {len(state_log)} states "
+                f"and {len(action_log)} actions."
+            )
+        header = np.zeros(1, dtype=GAME_HEADER_DTYPE)
+        header["magic"] = GAME_MAGIC
+        header["n_moves"] = len(action_log)
+        header["snapshot_interval"] = self.snapshot_interval
+        header["result"] = result(state_log[-1])
+        moves = encode_actions(action_log)
+        if self.snapshot_interval:
+            snapshots = state_log[self.snapshot_interval::self.snapshot_interval]
+        else:
+            snapshots = state_log[:0]
+        self._file.write(header.tobytes())
+        self._file.write(state_log[:1].tobytes())
+        self._file.write(moves.tobytes())
+        self._file.write(snapshots.tobytes())
+        self._file.flush()
+
+    def write_actions(self, start_state, actions: np.ndarray, env=None) -> None:
+        """Write a game given the start state and the actions, the states are replayed."""
+        actions = np.asarray(actions, dtype=ACTION_DTYPE).reshape(-1)
+        self.write(_replay(np.asarray(start_state).reshape(-1)[0], actions, env), actions)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameLogReader:
+    """Memory-mapped reader, games and plies are read on access.
+
+    Opening the file scans the game headers to find the offset of each game, the moves and states
+    are views of the memory map and only read from disk when used.
+    """
+
+    def __init__(self, path, env=None):
+        self.path = path
+        self._env = env
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+        _check_file_header(self._data[:FILE_HEADER_DTYPE.itemsize].view(FILE_HEADER_DTYPE))
+        self._offsets = []
+        offset = FILE_HEADER_DTYPE.itemsize
+        while offset < len(self._data):
+            header = self._header_at(offset)
+            self._offsets.append(offset)
+            offset += self._game_size(header)
+        if offset != len(self._data):
+            raise ValueError(f"Truncated game log {path}.")
+
+    def _header_at(self, offset: int) -> np.void:
+        header = self._data[offset:offset + GAME_HEADER_DTYPE.itemsize].view(GAME_HEADER_DTYPE)
+        if len(header) != 1 or header[0]["magic"] != GAME_MAGIC:
+            raise ValueError(f"Corrupted game log {self.path} at byte {offset}.")
+        return header[0]
+
+    @staticmethod
+    def _game_size(header: np.void) -> int:
+        n_moves = int(header["n_moves"])
+        n_snapshots = n_moves // header["snapshot_interval"] if header["snapshot_interval"] else 0
+        return (
+            GAME_HEADER_DTYPE.itemsize
+            + (1 + n_snapshots) * STATE_ITEMSIZE
+            + 2 * n_moves
+        )
+
+    def _sections(self, game: int):
+        offset = self._offsets[game]
+        header = self._header_at(offset)
+        n_moves = int(header["n_moves"])
+        start = offset + GAME_HEADER_DTYPE.itemsize
+        moves = start + STATE_ITEMSIZE
+        snapshots = moves + 2 * n_moves
+        end = offset + self._game_size(header)
+        return (
+            header,
+            self._data[start:moves].view(STATE_DTYPE),
+            self._data[moves:snapshots].view(MOVE_DTYPE),
+            self._data[snapshots:end].view(STATE_DTYPE),
+        )
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def n_plies(self, game: int) -> int:
+        return int(self._header_at(self._offsets[game])["n_moves"])
+
+    def result(self, game: int) -> int:
+        return int(self._header_at(self._offsets[game])["result"])
+
+    def start_state(self, game: int) -> np.ndarray:
+        return np.array(self._sections(game)[1])
+
+    def moves(self, game: int) -> np.ndarray:
+        """The 16-bit moves of the game."""
+        return np.array(self._sections(game)[2])
+
+    def actions(self, game: int) -> np.ndarray:
+        """The actions of the game as an ACTION_DTYPE array."""
+        _, start_state, moves, _ = self._sections(game)
+        white = bool(start_state[0]["white_player_turn"])
+        white_player_turn = (np.arange(len(moves)) % 2 == 0) == white
+        return decode_actions(moves, white_player_turn)
+
+    def state(self, game: int, ply: int) -> np.ndarray:
+        """The state after ply plies, replayed from the nearest snapshot."""
+        header, start_state, moves, snapshots = self._sections(game)
+        n_moves = int(header["n_moves"])
+        if not 0 <= ply <= n_moves:
+            raise IndexError(f"Ply {ply} is not in the game of {n_moves} plies.")
+        interval = int(header["snapshot_interval"])
+        snapshot = ply // interval if interval else 0
+        if snapshot == 0:
+            state, start = start_state[0], 0
+        else:
+            state, start = snapshots[snapshot - 1], snapshot * interval
+        # Only the moves from the snapshot are decoded, the player in turn alternates from the start
+        white = bool(start_state[0]["white_player_turn"])
+        white_player_turn = (np.arange(start, ply) % 2 == 0) == white
+        actions = decode_actions(moves[start:ply], white_player_turn)
+        return _replay(state, actions, self._env)[-1:]
+
+    def replay(self, game: int) -> np.ndarray:
+        """All the states of the game, as the state log of simulate."""
+        return _replay(self.start_state(game)[0], self.actions(game), self._env)
+
+    def __iter__(self):
+        """Iterate over the start state and actions of each game."""
+        for game in range(len(self)):
+            yield self.start_state(game), self.actions(game)
+
+
+def _check_file_header(header: np.ndarray) -> None:
+    if len(header) != 1 or header[0]["magic"] != MAGIC:
+        raise ValueError("Not a game log.")
+    if header[0]["version"] != VERSION:
+        raise ValueError(f"Unsupported game log version {header[0]['version']}.")
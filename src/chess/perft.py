@@ -0,0 +1,107 @@
+"""Perft, the number of leaf nodes of the legal move tree to a fixed depth.
+
+Perft counts are compared against the well known reference counts to catch move generator
+regressions and the nodes per second is used to track the move generator throughput. The engine
+allows promotion to a pawn, hence the reference counts are only used up to the depths without
+promotions. See: https://www.chessprogramming.org/Perft_Results
+"""
+import time
+
+from chess import get_env
+from chess._utils import state_from_fen, action_uci
+
+
+POSITIONS = [
+    (
+        "Initial position",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        [20, 400, 8902, 197281, 4865609],
+    ),
+    (
+        "Kiwipete",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862],
+    ),
+    (
+        "Position 3",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        [14, 191, 2812, 43238, 674624],
+    ),
+    (
+        "Position 6",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594],
+    ),
+]
+
+
+def perft(state, depth: int, env=None) -> int:
+    """The number of leaf nodes of the legal move tree from the state to the given depth."""
+    if env is None:
+        env = get_env()
+    if depth == 0:
+        return 1
+    actions = env.actions(state)
+    if depth == 1:
+        return len(actions)
+    if len(actions) == 0:
+        return 0
+    return sum(perft(next_state, depth - 1, env) for next_state in env.step(state, actions))
+
+
+def divide(state, depth: int, env=None) -> dict:
+    """The perft count below each legal action of the state keyed by the action in UCI notation."""
+    if env is None:
+        env = get_env()
+    actions = env.actions(state)
+    if len(actions) == 0:
+        return {}
+    return {
+        action_uci(action): perft(next_state, depth - 1, env)
+        for action, next_state in zip(actions, env.step(state, actions))
+    }
+
+
+def run(state, depth: int, show_divide: bool = False, env=None) -> int:
+    """Print the perft count, optionally divided by root actions, and the nodes per second."""
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(state, depth, env)
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(state, depth, env)
+    seconds = time.perf_counter() - start
+    if show_divide:
+        for uci, count in sorted(counts.items()):
+            print(f"{uci}: {count}")
+        print()
+    print(f"Nodes: {nodes}")
+    print(f"Time: {seconds:.3f}s")
+    print(f"Nodes/second: {nodes / seconds:.0f}")
+    return nodes
+
+
+def bench(max_depth: int = 4, env=None) -> bool:
+    """Run the reference positions to max_depth, print the throughput and whether counts match."""
+    total_nodes = 0
+    total_seconds = 0.0
+    passed = True
+    for name, fen, expected_counts in POSITIONS:
+        state = state_from_fen(fen)
+        for depth, expected_count in enumerate(expected_counts[:max_depth], start=1):
+            start = time.perf_counter()
+            count = perft(state, depth, env)
+            seconds = time.perf_counter() - start
+            total_nodes += count
+            total_seconds += seconds
+            status = "ok" if count == expected_count else f"FAILED expected {expected_count}"
+            passed = passed and count == expected_count
+            print(
+                f"{name:<20} depth {depth}  nodes {count:>10}  "
+                f"nodes/second {count / seconds:>10.0f}  {status}"
+            )
+    print()
+    print(f"Nodes: {total_nodes}")
+    print(f"Time: {total_seconds:.3f}s")
+    print(f"Nodes/second: {total_nodes / total_seconds:.0f}")
+    return passed
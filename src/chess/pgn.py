@@ -0,0 +1,461 @@
+"""Streaming PGN reader and writer, games in standard algebraic notation (SAN).
+
+The reader is a generator that reads one game at a time, such that arbitrarily large files are
+processed in constant memory. The SAN moves of a game are resolved against the legal actions of
+Environment.actions into an ACTION_DTYPE array and the states after each action, i.e. the same
+state and action logs as returned by simulate. read_games_parallel resolves the games with a pool
+of worker processes while the file is read by the calling process.
+
+The engine allows promotion to a pawn which is written as e.g. e8=P.
+"""
+import collections
+import concurrent.futures
+import os
+import re
+import textwrap
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from chess import get_env
+from chess._constants import (
+    ACTION_DTYPE,
+    FEN,
+    LETTERS,
+    MOVE_CASTLE_KINGSIDE as CASTLE_KINGSIDE,
+    MOVE_CASTLE_QUEENSIDE as CASTLE_QUEENSIDE,
+    MOVE_PROMOTE as PROMOTE,
+    PIECE_NAMES,
+    STATE_DTYPE,
+)
+from chess._utils import actions_to_moves, moves_to_actions, state_from_fen, state_to_fen
+from chess.gamelog import GameLogWriter
+
+WHITE_WIN = "1-0"
+BLACK_WIN = "0-1"
+DRAW = "1/2-1/2"
+UNFINISHED = "*"
+RESULTS = (WHITE_WIN, BLACK_WIN, DRAW, UNFINISHED)
+
+# The Seven Tag Roster, written first and in this order.
+SEVEN_TAG_ROSTER = {
+    "Event": "?",
+    "Site": "?",
+    "Date": "????.??.??",
+    "Round": "?",
+    "White": "?",
+    "Black": "?",
+    "Result": UNFINISHED,
+}
+LINE_WIDTH = 79
+
+# Pieces of the kinds of 16-bit moves, see MOVE_DTYPE, pawn moves and promotions are "".
+PIECE_LETTERS = "RNBQK"
+PAWN = 5
+PROMOTION_LETTERS = "RNBQP"
+
+TAG_REGEX = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]\s*$')
+TOKEN_REGEX = re.compile(
+    r"\{[^}]*\}?"  # comment
+    r"|;[^\n]*"  # rest of line comment
+    r"|[()]"  # variation
+    r"|\$\d+"  # numeric annotation glyph
+    r"|1-0|0-1|1/2-1/2|\*"  # result
+    r"|\d+\.+"  # move number
+    r"|[^\s(){};$]+"  # move
+)
+SAN_REGEX = re.compile(r"^([RNBQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([RNBQP]))?$")
+
+
+class PGNGame(NamedTuple):
+    headers: dict
+    state_log: np.ndarray
+    action_log: np.ndarray
+
+
+def _square_str(square: int) -> str:
+    return LETTERS[square % 8] + str(8 - square // 8)
+
+
+def _occupied(state, white: bool) -> int:
+    # The squares occupied by the pieces of a color.
+    names = PIECE_NAMES[6:] if white else PIECE_NAMES[:6]
+    occupied = 0
+    for name in names:
+        occupied |= int(state[name])
+    return occupied
+
+
+def _san(move: int, moves: np.ndarray, other: int) -> str:
+    # The SAN of a 16-bit move without check suffix given all legal moves and the squares of the
+    # other player.
+    src, dst, kind = move & 63, move >> 6 & 63, move >> 12
+    if kind == CASTLE_QUEENSIDE:
+        return "O-O-O"
+    if kind == CASTLE_KINGSIDE:
+        return "O-O"
+    capture = bool(other >> dst & 1) or kind == 7
+    if kind >= PAWN:
+        san = LETTERS[src % 8] + "x" if capture else ""
+        san += _square_str(dst)
+        if kind >= PROMOTE:
+            san += "=" + PROMOTION_LETTERS[kind - PROMOTE]
+        return san
+    # other pieces of the same kind moving to the same square
+    srcs = moves & 63
+    others = srcs[((moves >> 12) == kind) & ((moves >> 6 & 63) == dst) & (srcs != src)]
+    disambiguation = ""
+    if len(others):
+        if not (others % 8 == src % 8).any():
+            disambiguation = LETTERS[src % 8]
+        elif not (others // 8 == src // 8).any():
+            disambiguation = str(8 - src // 8)
+        else:
+            disambiguation = _square_str(src)
+    return PIECE_LETTERS[kind] + disambiguation + ("x" if capture else "") + _square_str(dst)
+
+
+def action_san(state, action, env=None) -> str:
+    """The action in SAN, e.g. e4, Nbd7, exd8=Q+ or O-O#."""
+    if env is None:
+        env = get_env()
+    state = np.asarray(state, dtype=STATE_DTYPE).reshape(-1)
+    action = np.asarray(action, dtype=ACTION_DTYPE).reshape(-1)
+    moves = env.actions(state, packed=True).astype(np.int64)
+    white = bool(state[0]["white_player_turn"])
+    move = int(actions_to_moves(action)[0])
+    san = _san(move, moves, _occupied(state[0], not white))
+    return san + _check_suffix(env.step(state, action), env)
+
+
+def _check_suffix(next_state, env) -> str:
+    # "+" if the player in turn is in check, "#" if the player is checkmated.
+    check = next_state["is_white_check"] if next_state["white_player_turn"] else (
+        next_state["is_black_check"]
+    )
+    if not check:
+        return ""
+    return "+" if env.has_legal_action(next_state) else "#"
+
+
+def san_action(state, san: str, env=None) -> np.ndarray:
+    """The legal action of the state given in SAN as an ACTION_DTYPE array of length 1.
+
+    The check and annotation suffixes, the capture x and the = of promotions are optional and
+    superfluous disambiguation is allowed.
+
+    Raises:
+        ValueError: If the SAN is not a legal action or is ambiguous.
+    """
+    if env is None:
+        env = get_env()
+    moves = env.actions(state, packed=True)
+    idx = _resolve(san, moves.astype(np.int64))
+    return moves_to_actions(moves[idx], state["white_player_turn"])
+
+
+def _resolve(san: str, moves: np.ndarray) -> int:
+    # The index of the legal move given in SAN.
+    token = san.rstrip("+#!?")
+    kinds = moves >> 12
+    if token in ("O-O", "0-0"):
+        matches = np.flatnonzero(kinds == CASTLE_KINGSIDE)
+    elif token in ("O-O-O", "0-0-0"):
+        matches = np.flatnonzero(kinds == CASTLE_QUEENSIDE)
+    else:
+        match = SAN_REGEX.match(token)
+        if match is None:
+            raise ValueError(f"Invalid SAN {san!r}.")
+        piece, file, rank, dst, promotion = match.groups()
+        srcs = moves & 63
+        mask = (moves >> 6 & 63) == LETTERS.index(dst[0]) + 8 * (8 - int(dst[1]))
+        if piece is not None:
+            mask &= kinds == PIECE_LETTERS.index(piece)
+        elif promotion is not None:
+            mask &= kinds == PROMOTE + PROMOTION_LETTERS.index(promotion)
+        else:
+            mask &= (kinds >= PAWN) & (kinds < CASTLE_QUEENSIDE)
+        if file is not None:
+            mask &= srcs % 8 == LETTERS.index(file)
+        if rank is not None:
+            mask &= srcs // 8 == 8 - int(rank)
+        matches = np.flatnonzero(mask)
+    if len(matches) == 0:
+        raise ValueError(f"Illegal move {san!r}.")
+    if len(matches) > 1:
+        raise ValueError(f"Ambiguous move {san!r}.")
+    return int(matches[0])
+
+
+def game_from_sans(sans: Iterable[str], start_state=None, headers=None, env=None) -> PGNGame:
+    """Resolve the SAN moves from the start state into the state and action logs.
+
+    The checkmate and draw flags are only computed for the last state.
+
+    Raises:
+        ValueError: If a move is not legal, the error gives the ply of the move.
+    """
+    if env is None:
+        env = get_env()
+    if start_state is None:
+        start_state = state_from_fen(FEN)
+    states = [np.asarray(start_state, dtype=STATE_DTYPE).reshape(-1)]
+    moves = []
+    for ply, san in enumerate(sans):
+        state = states[-1]
+        legal_moves = env.actions(state, packed=True)
+        try:
+            idx = _resolve(san, legal_moves.astype(np.int64))
+        except ValueError as error:
+            raise ValueError(f"Ply {ply + 1}: {error}") from None
+        moves.append(legal_moves[idx])
+        states.append(env.step(state, moves[-1]))
+    if moves:
+        # only the last state can be terminal
+        states[-1] = env.step(states[-2], moves[-1], terminal=True)
+    state_log = np.concatenate(states)
+    action_log = moves_to_actions(moves, state_log["white_player_turn"][:-1])
+    return PGNGame(dict(headers or {}), state_log, action_log)
+
+
+def _split_games(lines: Iterable[str]) -> Iterator[tuple[dict, str]]:
+    # The tags and the movetext of each game, a game ends at the next tag section.
+    headers, movetext = {}, []
+    for line in lines:
+        if line.startswith("%"):  # escape mechanism
+            continue
+        match = TAG_REGEX.match(line) if line.startswith("[") else None
+        if match is not None:
+            if movetext:
+                yield headers, "\n".join(movetext)
+                headers, movetext = {}, []
+            headers[match.group(1)] = re.sub(r"\\(.)", r"\1", match.group(2))
+        elif line.strip():
+            movetext.append(line.rstrip("\n"))
+    if headers or movetext:
+        yield headers, "\n".join(movetext)
+
+
+def _sans(movetext: str) -> tuple[list[str], Optional[str]]:
+    # The SAN moves of the main line and the result, comments, variations, annotations and move
+    # numbers are skipped.
+    sans = []
+    result = None
+    depth = 0
+    for token in TOKEN_REGEX.findall(movetext):
+        first = token[0]
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth or first in "{;$" or (first.isdigit() and token[-1] == "."):
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            sans.append(token)
+    return sans, result
+
+
+def _parse_game(headers: dict, movetext: str, env=None) -> PGNGame:
+    sans, result = _sans(movetext)
+    if result is not None:
+        headers.setdefault("Result", result)
+    start_state = state_from_fen(headers["FEN"]) if "FEN" in headers else None
+    return game_from_sans(sans, start_state, headers, env)
+
+
+def _parse_game_or_none(headers: dict, movetext: str) -> Optional[PGNGame]:
+    try:
+        return _parse_game(headers, movetext)
+    except ValueError:
+        return None
+
+
+def _lines(source) -> Iterator[str]:
+    # The lines of a path or a text file object.
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding="utf-8", errors="replace") as file:
+            yield from file
+    else:
+        yield from source
+
+
+def read_games(source, skip_errors: bool = False, env=None) -> Iterator[PGNGame]:
+    """Read the games of a PGN file one at a time.
+
+    Args:
+        source (str | PathLike | TextIO): The path or an open text file.
+        skip_errors (bool): Skip games with illegal moves instead of raising a ValueError.
+        env (Environment): The environment, default is the shared environment.
+    """
+    for idx, (headers, movetext) in enumerate(_split_games(_lines(source))):
+        try:
+            yield _parse_game(headers, movetext, env)
+        except ValueError as error:
+            if not skip_errors:
+                raise ValueError(f"Game {idx + 1}: {error}") from None
+
+
+def _init_worker() -> None:
+    # Loads the attack tables once per worker.
+    get_env()
+
+
+def read_games_parallel(
+    source,
+    workers: Optional[int] = None,
+    skip_errors: bool = False,
+    max_pending: Optional[int] = None,
+) -> Iterator[PGNGame]:
+    """Read the games of a PGN file in order, resolving the moves with a pool of workers.
+
+    The file is split into games by the calling process and at most max_pending games, default is
+    4 per worker, are in flight such that memory stays constant.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 4 * workers
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker
+    ) as executor:
+        parse = _parse_game_or_none if skip_errors else _parse_game
+        pending = collections.deque()
+        for idx, (headers, movetext) in enumerate(_split_games(_lines(source))):
+            pending.append((idx, executor.submit(parse, headers, movetext)))
+            if len(pending) >= max_pending:
+                yield from _results(pending.popleft())
+        while pending:
+            yield from _results(pending.popleft())
+
+
+def _results(item) -> Iterator[PGNGame]:
+    idx, future = item
+    try:
+        game = future.result()
+    except ValueError as error:
+        raise ValueError(f"Game {idx + 1}: {error}") from None
+    if game is not None:
+        yield game
+
+
+def result(state, env=None) -> str:
+    """The result of the game ending in the state, "*" if the game is not finished."""
+    if env is None:
+        env = get_env()
+    state = np.asarray(state, dtype=STATE_DTYPE).reshape(-1)
+    if env.is_black_checkmate(state):
+        return WHITE_WIN
+    if env.is_white_checkmate(state):
+        return BLACK_WIN
+    if env.is_draw(state):
+        return DRAW
+    return UNFINISHED
+
+
+def game_pgn(state_log: np.ndarray, action_log: np.ndarray, headers=None, env=None) -> str:
+    """The game as PGN given the state and action logs, e.g. as returned by simulate.
+
+    The Result tag is the result of the last state unless given in the headers, the SetUp and FEN
+    tags are added if the game does not start in the initial position.
+    """
+    if env is None:
+        env = get_env()
+    state_log = np.asarray(state_log, dtype=STATE_DTYPE).reshape(-1)
+    action_log = np.asarray(action_log, dtype=ACTION_DTYPE).reshape(-1)
+    if len(state_log) != len(action_log) + 1:
+        raise ValueError(
+            f"Expected one more state than actions, got {len(state_log)} states "
+            f"and {len(action_log)} actions."
+        )
+    tags = dict(SEVEN_TAG_ROSTER)
+    tags["Result"] = result(state_log[-1], env)
+    fen = state_to_fen(state_log[:1])
+    if fen.rsplit(" ", 2)[0] != FEN.rsplit(" ", 2)[0]:
+        tags["SetUp"] = "1"
+        tags["FEN"] = fen
+    tags.update(headers or {})
+
+    tokens = []
+    number = int(state_log[0]["ply"]) // 2 + 1
+    if not state_log[0]["white_player_turn"]:
+        tokens.append(f"{number}...")
+    for idx, action in enumerate(action_log):
+        state = state_log[idx:idx + 1]
+        white = bool(state[0]["white_player_turn"])
+        if white:
+            tokens.append(f"{number}.")
+        else:
+            number += 1
+        moves = env.actions(state, packed=True).astype(np.int64)
+        move = int(actions_to_moves(action)[0])
+        san = _san(move, moves, _occupied(state[0], not white))
+        tokens.append(san + _check_suffix(state_log[idx + 1:idx + 2], env))
+    tokens.append(tags["Result"])
+
+    lines = [f'[{key} "{_escape(value)}"]' for key, value in tags.items()]
+    lines.append("")
+    lines.extend(
+        textwrap.wrap(
+            " ".join(tokens), LINE_WIDTH, break_long_words=False, break_on_hyphens=False
+        )
+    )
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class PGNWriter:
+    """Append-only PGN writer, each game is flushed to the file when it is written.
+
+    Args:
+        target (str | PathLike | TextIO): The path, games are appended if it exists, or an open
+            text file.
+    """
+
+    def __init__(self, target, env=None):
+        self._env = env
+        if isinstance(target, (str, os.PathLike)):
+            self._file = open(target, "a", encoding="utf-8")
+            self._close = True
+        else:
+            self._file = target
+            self._close = False
+
+    def write(self, state_log: np.ndarray, action_log: np.ndarray, headers=None) -> None:
+        """Write a game given the state and action logs, e.g. as returned by simulate."""
+        self._file.write(game_pgn(state_log, action_log, headers, self._env) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._close:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def pgn_to_gamelog(
+    source, path, workers: int = 1, skip_errors: bool = True, **kwargs
+) -> int:
+    """Convert the games of a PGN file to a game log, see chess.gamelog, and return the count.
+
+    Games are resolved with a pool of workers processes if workers is larger than 1, the keyword
+    arguments are passed to the GameLogWriter.
+    """
+    if workers > 1:
+        games = read_games_parallel(source, workers=workers, skip_errors=skip_errors)
+    else:
+        games = read_games(source, skip_errors=skip_errors)
+    count = 0
+    with GameLogWriter(path, **kwargs) as writer:
+        for game in games:
+            writer.write(game.state_log, game.action_log)
+            count += 1
+    return count
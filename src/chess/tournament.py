@@ -0,0 +1,175 @@
+"""Tournaments between agents played in parallel by a pool of worker processes.
+
+Agents are given as the strings of the command line interface, e.g. "AlphaBetaAgent(depth=3)",
+such that they can be sent to the workers. Each worker loads the Environment once and plays the
+games it is given, the results are streamed as the games finish. The players alternate colors
+between consecutive games of a pairing.
+"""
+import concurrent.futures
+import math
+import time
+from typing import Callable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from chess import get_env
+from chess._agent import parse, simulate
+from chess._constants import MAX_ROUNDS
+
+WHITE_WIN = "1-0"
+BLACK_WIN = "0-1"
+DRAW = "1/2-1/2"
+
+
+class Game(NamedTuple):
+    idx: int
+    white: str
+    black: str
+    seed: int
+
+
+class GameResult(NamedTuple):
+    game: Game
+    result: str
+    plies: int
+    seconds: float
+
+
+def round_robin(agents: list[str], games: int, seed: int = 0) -> list[Game]:
+    """Each pair of agents plays games games, alternating colors."""
+    schedule = []
+    for i, agent in enumerate(agents):
+        for other in agents[i + 1:]:
+            schedule.extend(_pairing(agent, other, games, seed + len(schedule), len(schedule)))
+    return schedule
+
+
+def gauntlet(agent: str, opponents: list[str], games: int, seed: int = 0) -> list[Game]:
+    """The agent plays games games against each opponent, alternating colors."""
+    schedule = []
+    for opponent in opponents:
+        schedule.extend(_pairing(agent, opponent, games, seed + len(schedule), len(schedule)))
+    return schedule
+
+
+def _pairing(agent: str, other: str, games: int, seed: int, start: int) -> list[Game]:
+    return [
+        Game(start + i, agent, other, seed + i) if i % 2 == 0 else
+        Game(start + i, other, agent, seed + i)
+        for i in range(games)
+    ]
+
+
+def _init_worker() -> None:
+    # Loads the attack tables once per worker.
+    get_env()
+
+
+def play(game: Game, max_rounds: int = MAX_ROUNDS) -> GameResult:
+    """Play the game in this process."""
+    start = time.perf_counter()
+    white_player = parse(game.white)
+    black_player = parse(game.black)
+    # agents may seed numpy in their constructor, each game gets its own seed
+    np.random.seed(game.seed)
+    try:
+        state_log, _ = simulate(white_player, black_player, max_rounds=max_rounds)
+    finally:
+        white_player.close()
+        black_player.close()
+    final_state = state_log[-1]
+    if final_state["is_black_checkmate"]:
+        result = WHITE_WIN
+    elif final_state["is_white_checkmate"]:
+        result = BLACK_WIN
+    else:
+        result = DRAW
+    return GameResult(game, result, int(final_state["ply"]), time.perf_counter() - start)
+
+
+def run(
+    schedule: list[Game],
+    workers: Optional[int] = None,
+    max_rounds: int = MAX_ROUNDS,
+) -> Iterator[GameResult]:
+    """Play the games of the schedule with a pool of workers and yield results as games finish."""
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker
+    ) as executor:
+        futures = [executor.submit(play, game, max_rounds) for game in schedule]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def score(result: GameResult, agent: str) -> float:
+    """The points of the agent in the game, 1 for a win, 0.5 for a draw and 0 for a loss."""
+    if result.result == DRAW:
+        return 0.5
+    winner = result.game.white if result.result == WHITE_WIN else result.game.black
+    return 1.0 if winner == agent else 0.0
+
+
+def elo_difference(points: float, games: int) -> float:
+    """The Elo difference of a player scoring points in games against an opponent.
+
+    The score is clamped to half a point from 0 and games such that the difference is finite.
+    """
+    p = min(max(points, 0.5), games - 0.5) / games
+    return -400 * math.log10(1 / p - 1)
+
+
+def standings(results: list[GameResult]) -> dict[str, dict]:
+    """Wins, draws, losses, points and the Elo relative to the opponents faced by agent."""
+    table = {}
+    for result in results:
+        for agent in (result.game.white, result.game.black):
+            row = table.setdefault(agent, {"wins": 0, "draws": 0, "losses": 0, "games": 0})
+            points = score(result, agent)
+            row["wins"] += points == 1
+            row["draws"] += points == 0.5
+            row["losses"] += points == 0
+            row["games"] += 1
+    for row in table.values():
+        row["points"] = row["wins"] + 0.5 * row["draws"]
+        row["elo"] = elo_difference(row["points"], row["games"])
+    return table
+
+
+def report(results: list[GameResult], seconds: float) -> None:
+    print()
+    print(f"{'Agent':<50} {'Games':>6} {'W':>5} {'D':>5} {'L':>5} {'Points':>7} {'Elo':>7}")
+    rows = sorted(standings(results).items(), key=lambda item: -item[1]["points"])
+    for agent, row in rows:
+        print(
+            f"{agent:<50} {row['games']:>6} {row['wins']:>5} {row['draws']:>5} "
+            f"{row['losses']:>5} {row['points']:>7.1f} {row['elo']:>+7.0f}"
+        )
+    print()
+    print(f"Games: {len(results)}")
+    print(f"Time: {seconds:.3f}s")
+    print(f"Games/second: {len(results) / seconds:.2f}")
+
+
+def tournament(
+    schedule: list[Game],
+    workers: Optional[int] = None,
+    max_rounds: int = MAX_ROUNDS,
+    callback: Optional[Callable[[GameResult], None]] = None,
+    verbose: bool = True,
+) -> list[GameResult]:
+    """Play the schedule, print each result as it finishes and the standings at the end."""
+    results = []
+    start = time.perf_counter()
+    for result in run(schedule, workers=workers, max_rounds=max_rounds):
+        results.append(result)
+        if callback is not None:
+            callback(result)
+        if verbose:
+            print(
+                f"Game {result.game.idx + 1:>4}/{len(schedule)}  {result.game.white} vs "
+                f"{result.game.black}  {result.result}  plies {result.plies}  "
+                f"{result.seconds:.2f}s"
+            )
+    if verbose:
+        report(results, time.perf_counter() - start)
+    return results
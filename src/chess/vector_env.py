@@ -0,0 +1,76 @@
+"""Vectorized self-play environment, N concurrent games stepped with one batched call.
+
+The games are held in one structured array of states. A game is done when the player in turn is
+checkmated or the game is a draw, done games are reset to the initial state of state_init such
+that the returned observations are always states with legal actions.
+"""
+import numpy as np
+
+from chess import get_env
+from chess._constants import BOARD, COLOR, STATE_DTYPE
+from chess._utils import state_init
+
+
+class VectorEnv:
+    """N concurrent games with automatic reset.
+
+    Args:
+        num_envs (int): The number of concurrent games.
+        color (int): The color in turn in the initial state of each game.
+        board (str): The board of the initial state of each game.
+        env (Environment): The environment, default is the shared environment.
+    """
+
+    def __init__(self, num_envs: int, color: int = COLOR, board: str = BOARD, env=None):
+        if num_envs < 1:
+            raise ValueError(f"The number of environments {num_envs} must be positive.")
+        self.num_envs = num_envs
+        self._env = get_env() if env is None else env
+        self._initial_state = state_init(color=color, board=board)
+        self.states = np.empty(num_envs, dtype=STATE_DTYPE)
+        self.reset()
+
+    def reset(self) -> np.ndarray:
+        """Reset all games to the initial state and return the observations."""
+        self.states[:] = self._initial_state
+        return self.states.copy()
+
+    def actions(self) -> tuple[np.ndarray, np.ndarray]:
+        """The legal actions of all games concatenated and the N + 1 offsets, see actions_batch."""
+        return self._env.actions_batch(self.states)
+
+    def sample_actions(self, rng: np.random.Generator = None) -> np.ndarray:
+        """A uniformly random legal action for each game."""
+        if rng is None:
+            rng = np.random.default_rng()
+        actions, offsets = self.actions()
+        counts = np.diff(offsets)
+        return actions[offsets[:-1] + (rng.random(self.num_envs) * counts).astype(np.int64)]
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Take one action in each game.
+
+        Returns:
+            tuple[NDArray, NDArray, NDArray, dict]: The observations, the states after the actions
+                where done games are reset to the initial state. The rewards of the players that
+                took the actions, 1 for checkmating the other player and 0 otherwise. Whether each
+                game is done. The info with the states after the actions before the reset under
+                "final_states".
+        """
+        white_player_turn = self.states["white_player_turn"]
+        next_states = self._env.step_batch(self.states, actions, terminal=True)
+        white_checkmate = next_states["is_white_checkmate"]
+        black_checkmate = next_states["is_black_checkmate"]
+        rewards = np.where(
+            white_player_turn, black_checkmate, white_checkmate
+        ).astype(np.float64)
+        dones = white_checkmate | black_checkmate | next_states["is_draw"]
+        self.states[:] = next_states
+        self.states[dones] = self._initial_state
+        return self.states.copy(), rewards, dones, {"final_states": next_states}
+
+    def __len__(self) -> int:
+        return self.num_envs
+
+    def __repr__(self) -> str:
+        return f"VectorEnv(num_envs={self.num_envs})"
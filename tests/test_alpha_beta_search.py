@@ -0,0 +1,317 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from chess._agent import AlphaBetaAgent
+from chess._environment import ActionFlag, AlphaBetaSearch, TranspositionTable
+from chess._utils import state_from_fen
+from chess.perft import POSITIONS
+
+
+def minimax(env, search, state, depth, piece_value, maximizing_player):
+    if depth == 0:
+        return search.state_value(state[0], piece_value)
+    actions = env.actions(state)
+    if len(actions) == 0:
+        return -np.inf if maximizing_player else np.inf
+    values = [
+        minimax(env, search, next_state[None], depth - 1, piece_value, not maximizing_player)
+        for next_state in env.step(state, actions)
+    ]
+    return max(values) if maximizing_player else min(values)
+
+
+def best_actions(actions, values):
+    return sorted(actions[values == values.max()].tolist())
+
+
+@pytest.mark.parametrize(
+    "fen,depth", [(POSITIONS[1][1], 2), (POSITIONS[2][1], 3), (POSITIONS[3][1], 2)]
+)
+def test_search_matches_minimax(env, fen, depth):
+    state = state_from_fen(fen)
+    piece_value = AlphaBetaAgent()._piece_value(bool(state["white_player_turn"]))
+    search = AlphaBetaSearch(env, quiescence=False, psqt=False)
+    actions, values = search.search(state, depth, piece_value)
+    minimax_values = np.array([
+        minimax(env, search, next_state[None], depth - 1, piece_value, False)
+        for next_state in env.step(state, actions)
+    ])
+    assert values.max() == minimax_values.max()
+    assert best_actions(actions, values) == best_actions(actions, minimax_values)
+    assert (values <= minimax_values.max()).all()
+
+
+@pytest.mark.parametrize("name,fen,counts", [POSITIONS[0], POSITIONS[2]])
+def test_transposition_table_same_values(env, name, fen, counts):
+    state = state_from_fen(fen)
+    agent = AlphaBetaAgent()
+    piece_value = agent._piece_value(bool(state["white_player_turn"]))
+    actions, values = AlphaBetaSearch(env).search(state, 4, piece_value)
+    search = AlphaBetaSearch(env, tt_size_mb=1)
+    tt_actions, tt_values = search.search(state, 4, piece_value)
+    assert values.max() == tt_values.max()
+    assert best_actions(actions, values) == best_actions(tt_actions, tt_values)
+    assert search.tt.hits > 0
+
+
+@pytest.mark.parametrize(
+    "fen",
+    [fen for _, fen, _ in POSITIONS]
+    + ["rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"],
+)
+@pytest.mark.parametrize(
+    "options", [{}, {"pvs": True}, {"aspiration": True}, {"pvs": True, "aspiration": True}]
+)
+def test_transposition_table_same_values_windows(env, fen, options):
+    # the bounds of the table are relative to the window they are searched with
+    state = state_from_fen(fen)
+    piece_value = AlphaBetaAgent()._piece_value(bool(state["white_player_turn"]))
+    actions, values = AlphaBetaSearch(env, quiescence=False).search(state, 3, piece_value)
+    search = AlphaBetaSearch(env, tt_size_mb=1, quiescence=False, **options)
+    tt_actions, tt_values = search.search(state, 3, piece_value)
+    assert values.max() == tt_values.max()
+    assert best_actions(actions, values) == best_actions(tt_actions, tt_values)
+
+
+@pytest.mark.filterwarnings("error")
+def test_search_state_record_or_array(env):
+    state = state_from_fen(POSITIONS[1][1])
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    search = AlphaBetaSearch(env)
+    actions, values = search.search(state, 2, piece_value)
+    record_actions, record_values = search.search(state[0], 2, piece_value)
+    assert (actions == record_actions).all() and (values == record_values).all()
+    with pytest.raises(ValueError):
+        search.search(np.concatenate([state, state]), 2, piece_value)
+
+
+def test_move_ordering_node_count(env):
+    state = state_from_fen(POSITIONS[1][1])
+    search = AlphaBetaSearch(env, tt_size_mb=1, quiescence=False)
+    search.search(state, 3, AlphaBetaAgent()._piece_value(True))
+    # a quarter of the nodes searched without move ordering
+    assert search.nodes < 3000
+
+
+def test_history_castling(env):
+    # Castling has no destination square, its history score is on the destination of the king.
+    state = state_from_fen("r3k2r/pppqbppp/2npbn2/4p3/4P3/2NPBN2/PPPQBPPP/R3K2R w KQkq - 0 1")
+    search = AlphaBetaSearch(env)
+    search.search(state, 3, AlphaBetaAgent()._piece_value(True))
+    history = search.history()
+    castling = history[ActionFlag.castle_queenside_black:ActionFlag.castle_kingside_white + 1]
+    assert castling.any()
+    assert not np.delete(castling, [2, 6, 58, 62], axis=1).any()
+    assert not history[ActionFlag.promote_black_rook:].any()
+
+
+def test_transposition_table_size():
+    tt = TranspositionTable(1)
+    assert len(tt) & (len(tt) - 1) == 0
+    assert 0.5 < tt.size_mb <= 1
+    with pytest.raises(ValueError):
+        TranspositionTable(0.000001)
+
+
+def test_transposition_table_stats():
+    state = state_from_fen(POSITIONS[0][1])
+    agent = AlphaBetaAgent(depth=4, tt_size_mb=1)
+    agent.policy(state)
+    stats = agent.tt_stats()
+    assert stats["probes"] > 0
+    assert 0 < stats["hit_rate"] < 1
+    assert AlphaBetaAgent(depth=3, tt_size_mb=0).tt_stats() == {}
+
+
+def test_transposition_table_cleared_when_piece_value_changes():
+    white = state_from_fen(POSITIONS[0][1])
+    black = state_from_fen(POSITIONS[0][1].replace(" w ", " b "))
+    agent = AlphaBetaAgent(depth=3, tt_size_mb=1)
+    agent.policy(white)
+    stats = agent.tt_stats()
+    agent.policy(white)
+    # the root actions are searched with a full window, hence exact scores are found for all
+    hits = agent.tt_stats()["hits"] - stats["hits"]
+    assert hits == agent.tt_stats()["probes"] - stats["probes"] > 0
+    probes = agent.tt_stats()["probes"]
+    agent.policy(black)
+    assert agent.tt_stats()["probes"] < probes
+
+
+def test_iterative_deepening_completed_depth(env):
+    state = state_from_fen(POSITIONS[0][1])
+    search = AlphaBetaSearch(env, tt_size_mb=1)
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    actions, values = search.search(state, 3, piece_value)
+    assert search.completed_depth == 3
+    assert search.nodes > 0
+    assert (np.diff(values) <= 0).all()
+    assert sorted(actions.tolist()) == sorted(env.actions(state).tolist())
+
+
+def test_movetime_stops_search(env):
+    state = state_from_fen(POSITIONS[1][1])
+    search = AlphaBetaSearch(env, tt_size_mb=1)
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    start = time.monotonic()
+    actions, values = search.search(state, 64, piece_value, movetime=0.2)
+    assert time.monotonic() - start < 2
+    assert 1 <= search.completed_depth < 64
+    assert len(actions) == len(values) == len(env.actions(state))
+    assert np.isfinite(values).all()
+
+
+def test_movetime_agent(env):
+    state = state_from_fen(POSITIONS[1][1])
+    action = AlphaBetaAgent(depth=64, movetime=0.1).policy(state)
+    assert action in env.actions(state)
+
+
+@pytest.mark.parametrize("depth", [2, 3, 4])
+def test_search_finds_mate_in_one(env, depth):
+    state = state_from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    search = AlphaBetaSearch(env, tt_size_mb=1)
+    actions, values = search.search(state, depth, AlphaBetaAgent()._piece_value(True))
+    a1, a8 = 56, 0
+    assert values[0] == np.inf
+    assert actions[0]["src"] == 1 << a1 and actions[0]["dst"] == 1 << a8
+    assert (values[1:] < np.inf).all()
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+@pytest.mark.parametrize("threads", [2, 4])
+def test_parallel_search_same_best_actions(env, name, fen, counts, threads):
+    state = state_from_fen(fen)
+    piece_value = AlphaBetaAgent()._piece_value(bool(state["white_player_turn"]))
+    actions, values = AlphaBetaSearch(env, tt_size_mb=1).search(state, 3, piece_value)
+    with AlphaBetaSearch(env, tt_size_mb=1, threads=threads) as search:
+        parallel_actions, parallel_values = search.search(state, 3, piece_value)
+    assert search.completed_depth == 3
+    assert values.max() == parallel_values.max()
+    assert best_actions(actions, values) == best_actions(parallel_actions, parallel_values)
+    assert sorted(actions.tolist()) == sorted(parallel_actions.tolist())
+
+
+def test_parallel_search_movetime(env):
+    state = state_from_fen(POSITIONS[1][1])
+    with AlphaBetaSearch(env, tt_size_mb=1, threads=2) as search:
+        start = time.monotonic()
+        actions, values = search.search(
+            state, 64, AlphaBetaAgent()._piece_value(True), movetime=0.2
+        )
+    assert time.monotonic() - start < 2
+    assert 1 <= search.completed_depth < 64
+    assert np.isfinite(values).all()
+
+
+def search_threads(search):
+    return [
+        thread for thread in threading.enumerate()
+        if thread.name.startswith(f"AlphaBetaSearch-{id(search):x}")
+    ]
+
+
+def test_parallel_search_close(env):
+    state = state_from_fen(POSITIONS[1][1])
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    with AlphaBetaSearch(env, tt_size_mb=1, threads=3) as search:
+        search.search(state, 2, piece_value)
+        threads = search_threads(search)
+        assert len(threads) > 0
+    assert not any(thread.is_alive() for thread in threads)
+    # the threads are started again by the next search
+    search.search(state, 2, piece_value)
+    threads = search_threads(search)
+    search.close()
+    assert len(threads) > 0 and not any(thread.is_alive() for thread in threads)
+    agent = AlphaBetaAgent(threads=3)
+    agent.policy(state)
+    threads = search_threads(agent._alpha_beta_search)
+    agent.close()
+    assert len(threads) > 0 and not any(thread.is_alive() for thread in threads)
+
+
+@pytest.mark.filterwarnings("error")
+@pytest.mark.parametrize("threads", [1, 2])
+def test_agent_policy(env, threads):
+    state = state_from_fen(POSITIONS[1][1])
+    agent = AlphaBetaAgent(depth=2, threads=threads)
+    action = agent.policy(state)
+    agent.close()
+    assert any((action == legal_action).all() for legal_action in env.actions(state))
+
+
+def test_parallel_search_threads():
+    with pytest.raises(ValueError):
+        AlphaBetaAgent(threads=0)
+    assert AlphaBetaAgent(threads=2).threads == 2
+
+
+@pytest.mark.parametrize("depth", [1, 2])
+def test_quiescence_search_sees_recapture(env, depth):
+    # Qxd5 wins a pawn at the horizon but the queen is recaptured by exd5
+    state = state_from_fen("4k3/8/4p3/3p4/8/8/8/3QK3 w - - 0 1")
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    d1, d5 = 59, 27
+    search = AlphaBetaSearch(env, quiescence=False, psqt=False)
+    actions, values = search.search(state, depth, piece_value)
+    if depth == 1:
+        assert actions[0]["src"] == 1 << d1 and actions[0]["dst"] == 1 << d5
+    actions, values = AlphaBetaSearch(env, psqt=False).search(state, depth, piece_value)
+    capture = (actions["src"] == 1 << d1) & (actions["dst"] == 1 << d5)
+    # the queen for two pawns, the capture loses the queen for a pawn
+    assert values.max() == 7
+    assert values[capture][0] == -1
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+def test_quiescence_search_same_values_windows(env, name, fen, counts):
+    # a state with delta pruned captures fails low at alpha, not below, hence the values stored in
+    # the transposition table are bounds whatever the window
+    state = state_from_fen(fen)
+    piece_value = AlphaBetaAgent()._piece_value(bool(state["white_player_turn"]))
+    _, values = AlphaBetaSearch(env).search(state, 3, piece_value)
+    for options in [{}, {"pvs": True}, {"pvs": True, "aspiration": True}]:
+        _, tt_values = AlphaBetaSearch(env, tt_size_mb=1, **options).search(state, 3, piece_value)
+        assert values.max() == tt_values.max()
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+@pytest.mark.parametrize("option", ["pvs", "aspiration"])
+@pytest.mark.parametrize("tt_size_mb", [0, 1])
+@pytest.mark.parametrize("quiescence", [False, True])
+def test_search_windows_same_best_actions(env, name, fen, counts, option, tt_size_mb, quiescence):
+    state = state_from_fen(fen)
+    piece_value = AlphaBetaAgent()._piece_value(bool(state["white_player_turn"]))
+    search = AlphaBetaSearch(env, tt_size_mb=tt_size_mb, quiescence=quiescence)
+    actions, values = search.search(state, 4, piece_value)
+    search = AlphaBetaSearch(env, tt_size_mb=tt_size_mb, quiescence=quiescence, **{option: True})
+    window_actions, window_values = search.search(state, 4, piece_value)
+    assert values.max() == window_values.max()
+    assert best_actions(actions, values) == best_actions(window_actions, window_values)
+
+
+@pytest.mark.parametrize("option", ["null_move", "lmr", "pvs", "aspiration"])
+def test_selective_search_finds_mate_in_one(env, option):
+    state = state_from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    search = AlphaBetaSearch(env, tt_size_mb=1, **{option: True})
+    actions, values = search.search(state, 4, AlphaBetaAgent()._piece_value(True))
+    a1, a8 = 56, 0
+    assert values[0] == np.inf
+    assert actions[0]["src"] == 1 << a1 and actions[0]["dst"] == 1 << a8
+
+
+def test_selective_search_node_count(env):
+    state = state_from_fen(POSITIONS[0][1])
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    search = AlphaBetaSearch(env, tt_size_mb=1)
+    search.search(state, 5, piece_value)
+    selective_search = AlphaBetaSearch(
+        env, tt_size_mb=1, null_move=True, lmr=True, pvs=True, aspiration=True
+    )
+    selective_search.search(state, 5, piece_value)
+    assert selective_search.completed_depth == 5
+    assert selective_search.nodes < search.nodes / 2
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from chess import bench
+from chess._agent import AlphaBetaAgent
+from chess._environment import AlphaBetaSearch
+from chess._utils import state_from_fen
+from chess.perft import POSITIONS
+
+
+def test_default_threads():
+    threads = bench.default_threads()
+    assert threads[0] == 1
+    assert all(b == 2 * a for a, b in zip(threads, threads[1:]))
+
+
+@pytest.mark.filterwarnings("error")
+def test_bench(env, capsys):
+    speedups = bench.bench(threads=[1, 2], depth=2, env=env)
+    assert list(speedups) == [1, 2]
+    assert speedups[1] == 1
+    out = capsys.readouterr().out
+    assert "speedup" in out
+    assert "leaf evaluations/second" in out
+
+
+@pytest.mark.parametrize("white_root", [False, True])
+def test_leaf_evaluation(env, white_root):
+    states = np.concatenate([state_from_fen(fen) for _, fen, _ in POSITIONS])
+    piece_value = AlphaBetaAgent()._piece_value(white_root)
+    search = AlphaBetaSearch(env, psqt=False)
+    values = search.evaluate(states, piece_value, white_root)
+    # the material value for the player to move
+    sign = np.where(states["white_player_turn"] == white_root, 1, -1)
+    expected = [search.state_value(state, piece_value) for state in states]
+    assert np.allclose(values, sign * expected)
+    assert bench.evaluation_rate(n_states=1000, repeat=1, env=env) > 0
+
+
+@pytest.mark.filterwarnings("error")
+def test_selectivity(env, capsys):
+    results = bench.selectivity(depth=2, env=env)
+    assert list(results) == ["none", *bench.SEARCH_OPTIONS, "all"]
+    assert all(nodes > 0 for nodes, _ in results.values())
+    assert "lmr" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from chess._constants import ACTION_DTYPE, STATE_DTYPE
+from chess._utils import state_init, state_from_fen
+from chess.perft import POSITIONS
+
+n_simulations = 5
+n_plies = 100
+
+
+def random_states(env, seed):
+    np.random.seed(seed)
+    state = state_init()
+    states = [state]
+    for _ in range(n_plies):
+        actions = env.actions(state)
+        if len(actions) == 0:
+            break
+        state = env.step(state, np.random.choice(actions))
+        states.append(state)
+    return np.concatenate(states)
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_actions_batch(env, seed):
+    states = random_states(env, seed)
+    actions, offsets = env.actions_batch(states)
+    assert len(offsets) == len(states) + 1
+    assert offsets[-1] == len(actions)
+    for idx, state in enumerate(states):
+        expected = env.actions(state)
+        assert (actions[offsets[idx]:offsets[idx + 1]] == expected).all()
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+@pytest.mark.parametrize("terminal", [False, True])
+def test_step_batch(env, seed, terminal):
+    states = random_states(env, seed)
+    actions, offsets = env.actions_batch(states)
+    has_action = offsets[1:] > offsets[:-1]
+    states = states[has_action]
+    actions = actions[offsets[:-1][has_action]]
+    next_states = env.step_batch(states, actions, terminal=terminal)
+    assert next_states.dtype == np.dtype(STATE_DTYPE)
+    for state, action, next_state in zip(states, actions, next_states):
+        assert next_state == env.step(state, action, terminal=terminal)[0]
+
+
+def test_batch_positions(env):
+    states = np.concatenate([state_from_fen(fen) for _, fen, _ in POSITIONS])
+    actions, offsets = env.actions_batch(states)
+    assert (np.diff(offsets) == [counts[0] for _, _, counts in POSITIONS]).all()
+
+
+def test_batch_empty(env):
+    actions, offsets = env.actions_batch(np.empty(0, dtype=STATE_DTYPE))
+    assert len(actions) == 0
+    assert (offsets == [0]).all()
+    assert len(env.step_batch(np.empty(0, dtype=STATE_DTYPE), np.empty(0, dtype=ACTION_DTYPE))) == 0
+
+
+def test_step_batch_one_action_per_state(env):
+    states = np.concatenate([state_init(), state_init()])
+    with pytest.raises(ValueError):
+        env.step_batch(states, env.actions(states[0])[:1])
@@ -105,3 +105,65 @@ def test_is_black_checkmate(env, board, expected_is_black_checkmate):
     assert (
         actual_is_black_checkmate == expected_is_black_checkmate
     ), f"\n{state_str(state)}\n{actual_is_black_checkmate=}\n{expected_is_black_checkmate=}"
+
+
+stalemate_testdata = [
+    (
+        "       ♚"  # Stalemate: King in the corner
+        "     ♔  "
+        "      ♕ "
+        "        "
+        "        "
+        "        "
+        "        "
+        "        ",
+        True,
+    ),
+    (
+        "       ♚"
+        "     ♔  "
+        "        "
+        "      ♕ "
+        "        "
+        "        "
+        "        "
+        "        ",
+        False,
+    ),
+]
+
+
+@pytest.mark.parametrize("board,expected_is_stalemate", stalemate_testdata)
+def test_is_stalemate(env, board, expected_is_stalemate):
+    state = state_init(color=BLACK, board=board)
+    assert env.is_stalemate(state) == expected_is_stalemate
+    assert env.is_draw(state) == expected_is_stalemate
+    assert env.has_legal_action(state) != expected_is_stalemate
+
+
+def test_step_terminal(env):
+    # Fool's mate, the last move is the black queen to h4.
+    state = state_init(
+        color=BLACK,
+        board=(
+            "♜♞♝♛♚♝♞♜"
+            "♟♟♟♟ ♟♟♟"
+            "        "
+            "    ♟   "
+            "      ♙ "
+            "     ♙  "
+            "♙♙♙♙♙  ♙"
+            "♖♘♗♕♔♗♘♖"
+        ),
+    )
+    actions = env.actions(state)
+    action = actions[(actions["src"] == 1 << 3) & (actions["dst"] == 1 << 39)]
+
+    lazy_state = env.step(state, action)
+    assert lazy_state["is_white_check"]
+    assert not lazy_state["is_white_checkmate"]
+
+    terminal_state = env.step(state, action, terminal=True)
+    assert terminal_state["is_white_checkmate"]
+    assert not terminal_state["is_draw"]
+    assert env.terminal(lazy_state).tobytes() == terminal_state.tobytes()
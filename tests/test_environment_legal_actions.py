@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from chess._constants import PIECE_NAMES
+from chess._environment import ActionFlag
+from chess._utils import state_from_fen
+from chess.perft import POSITIONS
+
+FENS = [fen for _, fen, _ in POSITIONS] + [
+    # en passant capture exposing the king along the rank
+    "8/8/8/KPp4r/8/8/8/7k w - c6 0 1",
+    # en passant capture of the checking pawn
+    "8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1",
+    # pinned knight, pinned bishop moving along the pin and double check
+    "4k3/4r3/8/8/8/8/4N3/4K3 w - - 0 1",
+    "4k3/8/8/b7/8/8/3B4/4K3 w - - 0 1",
+    "4k3/8/8/8/8/5n2/8/r3K3 w - - 0 1",
+    # check by a pawn and check blocked by a promotion
+    "8/8/8/8/8/3p4/4K3/7k w - - 0 1",
+    "1r5k/P7/8/8/8/8/8/K7 w - - 0 1",
+    # castling through an attacked square
+    "4k3/8/8/8/8/8/8/R3K2R w KQ - 0 1",
+    "4k3/8/8/8/8/8/5r2/R3K2R w KQ - 0 1",
+    # positions without exactly one king
+    "8/8/8/8/8/8/8/R3R3 w - - 0 1",
+    "8/8/8/8/8/8/8/K6K w - - 0 1",
+]
+
+
+def filtered_pseudo_actions(env, state):
+    # The pseudo actions not leaving the king of the player in check.
+    pseudo_actions = env.pseudo_actions(state)
+    if len(pseudo_actions) == 0:
+        return pseudo_actions
+    next_states = env.step(state, pseudo_actions)
+    check = next_states["is_white_check"] if state["white_player_turn"] else (
+        next_states["is_black_check"]
+    )
+    return pseudo_actions[~check]
+
+
+@pytest.mark.parametrize("fen", FENS)
+def test_legal_actions(env, fen):
+    state = state_from_fen(fen)
+    actions = env.actions(state)
+    assert (actions == filtered_pseudo_actions(env, state)).all()
+
+
+@pytest.mark.parametrize("seed", list(range(10)))
+def test_legal_actions_random_games(env, seed):
+    rng = np.random.default_rng(seed)
+    for fen in FENS[:4]:
+        state = state_from_fen(fen)
+        for _ in range(100):
+            actions = env.actions(state)
+            expected = filtered_pseudo_actions(env, state)
+            assert len(actions) == len(expected)
+            assert (actions == expected).all()
+            if len(actions) == 0:
+                break
+            state = env.step(state, actions[rng.integers(len(actions))])
+
+
+@pytest.mark.parametrize("fen", FENS)
+def test_pseudo_captures(env, fen):
+    state = state_from_fen(fen)
+    pseudo_actions = env.pseudo_actions(state)
+    other_names = PIECE_NAMES[:6] if state["white_player_turn"] else PIECE_NAMES[6:]
+    other_color = 0
+    for name in other_names:
+        other_color |= int(state[name][0])
+    expected = [
+        action.tolist() for action in pseudo_actions
+        if int(action["dst"]) & other_color
+        or action["action_flag"] >= ActionFlag.promote_black_rook
+        or action["action_flag"] in (
+            ActionFlag.move_black_pawn_en_passant, ActionFlag.move_white_pawn_en_passant
+        )
+    ]
+    assert [action.tolist() for action in env.pseudo_captures(state)] == expected
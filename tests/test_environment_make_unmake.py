@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from chess._environment import Position, zobrist_key
+from chess._utils import state_from_fen, state_init
+
+n_simulations = 10
+n_plies = 100
+
+BOARD_FIELDS = [
+    "white_player_turn",
+    "black_rook",
+    "black_knight",
+    "black_bishop",
+    "black_queen",
+    "black_king",
+    "black_pawn",
+    "white_rook",
+    "white_knight",
+    "white_bishop",
+    "white_queen",
+    "white_king",
+    "white_pawn",
+    "has_black_king_moved",
+    "has_white_king_moved",
+    "has_black_queenside_rook_moved",
+    "has_black_kingside_rook_moved",
+    "has_white_queenside_rook_moved",
+    "has_white_kingside_rook_moved",
+    "ply",
+    "en_passant_square_black",
+    "en_passant_square_white",
+    "is_white_check",
+    "is_black_check",
+    "zobrist_key",
+]
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_make_move_matches_step(env, seed):
+    np.random.seed(seed)
+    state = state_init()
+    position = Position(env, state)
+    for _ in range(n_plies):
+        actions = position.actions()
+        if len(actions) == 0:
+            break
+        action = np.random.choice(actions)
+        state = env.step(state, action)
+        position.make_move(action)
+        for field in BOARD_FIELDS:
+            assert position.state[field] == state[field], field
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_unmake_move_restores_state(env, seed):
+    np.random.seed(seed)
+    position = Position(env, state_init())
+    states = [position.state]
+    for _ in range(n_plies):
+        actions = position.actions()
+        if len(actions) == 0:
+            break
+        for action in actions:
+            position.make_move(action)
+            position.unmake_move()
+            assert position.state.tobytes() == states[-1].tobytes()
+        position.make_move(np.random.choice(actions))
+        states.append(position.state)
+    assert len(position) == len(states) - 1
+    while len(position):
+        states.pop()
+        position.unmake_move()
+        assert position.state.tobytes() == states[-1].tobytes()
+    with pytest.raises(IndexError):
+        position.unmake_move()
+
+
+def test_make_null_move(env):
+    state = state_from_fen("rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 3")
+    position = Position(env, state)
+    position.make_null_move()
+    null_state = position.state
+    assert null_state["white_player_turn"] != state["white_player_turn"]
+    assert null_state["en_passant_square_black"] == null_state["en_passant_square_white"] == 0
+    assert null_state["zobrist_key"] == zobrist_key(null_state)
+    assert len(position) == 1
+    position.unmake_move()
+    assert position.state.tobytes() == state.tobytes()
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from chess._agent import RandomAgent, simulate
+from chess._constants import ACTION_DTYPE, MOVE_DTYPE
+from chess._utils import actions_to_moves, moves_to_actions, state_from_fen
+from chess.perft import POSITIONS
+
+n_games = 4
+
+
+@pytest.fixture(scope="module")
+def games():
+    return [
+        simulate(RandomAgent(seed=seed), RandomAgent(seed=seed), max_rounds=300)
+        for seed in range(n_games)
+    ]
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+def test_actions_packed(env, name, fen, counts):
+    state = state_from_fen(fen)
+    actions = env.actions(state)
+    moves = env.actions(state, packed=True)
+    assert moves.dtype == np.dtype(MOVE_DTYPE)
+    assert (moves == actions_to_moves(actions)).all()
+    assert len(set(moves.tolist())) == len(moves)
+    assert (moves_to_actions(moves, state["white_player_turn"]) == actions).all()
+    pseudo_moves = env.pseudo_actions(state, packed=True)
+    assert (pseudo_moves == actions_to_moves(env.pseudo_actions(state))).all()
+
+
+def test_moves_roundtrip_all_flags(env, games):
+    for state_log, action_log in games:
+        moves = actions_to_moves(action_log)
+        white_player_turn = state_log["white_player_turn"][:-1]
+        assert (moves_to_actions(moves, white_player_turn) == action_log).all()
+    flags = np.concatenate([action_log["action_flag"] for _, action_log in games])
+    assert len(np.unique(flags)) > 20
+
+
+def test_step_packed(env, games):
+    state_log, action_log = games[0]
+    moves = actions_to_moves(action_log)
+    for idx, move in enumerate(moves):
+        assert env.step(state_log[idx:idx + 1], move) == env.step(
+            state_log[idx:idx + 1], action_log[idx:idx + 1]
+        )
+
+
+def test_batch_packed(env, games):
+    state_log, action_log = games[1]
+    actions, offsets = env.actions_batch(state_log)
+    moves, move_offsets = env.actions_batch(state_log, packed=True)
+    assert (move_offsets == offsets).all()
+    assert (moves == actions_to_moves(actions)).all()
+    next_states = env.step_batch(state_log[:-1], actions_to_moves(action_log))
+    assert (next_states == env.step_batch(state_log[:-1], action_log)).all()
+
+
+def test_empty_action_is_no_move():
+    # The bit scan of the empty source and destination is square 0, the move 0 marks no move.
+    assert actions_to_moves(np.zeros(3, dtype=ACTION_DTYPE)).tolist() == [0, 0, 0]
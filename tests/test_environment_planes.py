@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from chess._constants import N_PLANES, PIECE_NAMES
+from chess._utils import encode_planes, state_from_fen, state_init, states_from_fens
+from chess.perft import POSITIONS
+
+n_plies = 100
+
+
+def random_states(env, seed):
+    rng = np.random.default_rng(seed)
+    states = [state_init()]
+    for _ in range(n_plies):
+        actions = env.actions(states[-1])
+        if len(actions) == 0:
+            break
+        states.append(env.step(states[-1], actions[rng.integers(len(actions))]))
+    return np.concatenate(states)
+
+
+def expected_planes(state):
+    planes = np.zeros((N_PLANES, 64))
+    for plane, name in enumerate(PIECE_NAMES):
+        planes[plane] = [int(state[name]) >> square & 1 for square in range(64)]
+    planes[12] = state["white_player_turn"]
+    castling = [
+        ("white", "kingside"), ("white", "queenside"), ("black", "kingside"), ("black", "queenside")
+    ]
+    for plane, (color, side) in enumerate(castling):
+        planes[13 + plane] = not (
+            state[f"has_{color}_king_moved"] or state[f"has_{color}_{side}_rook_moved"]
+        )
+    en_passant = int(state["en_passant_square_black"] | state["en_passant_square_white"])
+    if en_passant:
+        planes[17, en_passant.bit_length() - 1] = 1
+    return planes.reshape(N_PLANES, 8, 8)
+
+
+def mirror_fen(fen):
+    board, color, castling, en_passant, *clocks = fen.split()
+    board = "/".join(board.split("/")[::-1]).swapcase()
+    color = "w" if color == "b" else "b"
+    castling = "".join(sorted(castling.swapcase())) if castling != "-" else "-"
+    if en_passant != "-":
+        en_passant = en_passant[0] + str(9 - int(en_passant[1]))
+    return " ".join([board, color, castling, en_passant, *clocks])
+
+
+def test_initial_state():
+    planes = encode_planes(state_init())
+    assert planes.shape == (1, N_PLANES, 8, 8)
+    assert planes.dtype == np.float32
+    assert planes[0, :12].sum() == 32
+    assert planes[0, 11, 6].tolist() == [1] * 8
+    assert planes[0, 4, 0].tolist() == [0, 0, 0, 0, 1, 0, 0, 0]
+    assert (planes[0, 12:17] == 1).all()
+    assert (planes[0, 17] == 0).all()
+
+
+@pytest.mark.parametrize("seed", list(range(5)))
+@pytest.mark.parametrize("dtype", [np.float32, np.uint8])
+def test_encode_planes(env, seed, dtype):
+    states = random_states(env, seed)
+    out = np.full((len(states), N_PLANES, 8, 8), 7, dtype=dtype)
+    assert encode_planes(states, out=out) is out
+    for planes, state in zip(out, states):
+        assert (planes == expected_planes(state)).all()
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+def test_flip(name, fen, counts):
+    states = states_from_fens([fen, mirror_fen(fen)])
+    planes = encode_planes(states)
+    flipped = encode_planes(states, flip=True)
+    white = bool(states["white_player_turn"][0])
+    assert (flipped[0 if white else 1] == planes[0 if white else 1]).all()
+    mirrored = flipped[1 if white else 0]
+    assert (mirrored[:12] == planes[0 if white else 1, :12]).all()
+    assert (mirrored[13:] == planes[0 if white else 1, 13:]).all()
+    assert (mirrored[12] == 0).all()
+
+
+def test_flip_en_passant():
+    state = state_from_fen("4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1")
+    planes = encode_planes(state, flip=True)
+    assert np.argwhere(planes[0, 17]).tolist() == [[2, 4]]
+    assert np.argwhere(planes[0, 11]).tolist() == [[3, 3]]
+    assert np.argwhere(planes[0, 5]).tolist() == [[3, 4]]
+
+
+def test_out_errors():
+    states = np.concatenate([state_init(), state_init()])
+    with pytest.raises(ValueError):
+        encode_planes(states, out=np.zeros((2, N_PLANES, 8, 8), dtype=np.float64))
+    with pytest.raises(ValueError):
+        encode_planes(states, out=np.zeros((1, N_PLANES, 8, 8), dtype=np.float32))
+    with pytest.raises(ValueError):
+        encode_planes(states, out=np.zeros((2, N_PLANES, 8, 16), dtype=np.float32)[..., ::2])
+    assert encode_planes(states[:0]).shape == (0, N_PLANES, 8, 8)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from chess._agent import AlphaBetaAgent
+from chess._environment import AlphaBetaSearch, Position, psqt_terms
+from chess._utils import state_from_fen, state_init
+from chess.perft import POSITIONS
+
+n_simulations = 10
+n_plies = 200
+
+
+def assert_psqt_terms(state):
+    assert (
+        int(state["psqt_mg"][0]), int(state["psqt_eg"][0]), int(state["phase"][0])
+    ) == psqt_terms(state)
+
+
+def test_initial_state_is_balanced():
+    state = state_init()
+    assert psqt_terms(state) == (0, 0, 24)
+    assert_psqt_terms(state)
+    assert_psqt_terms(state_from_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"))
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_incremental_psqt_terms_match_recomputed(env, seed):
+    np.random.seed(seed)
+    state = state_init()
+    for _ in range(n_plies):
+        actions = env.actions(state)
+        if len(actions) == 0:
+            break
+        state = env.step(state, np.random.choice(actions))
+        assert_psqt_terms(state)
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+def test_psqt_terms_all_actions(env, name, fen, counts):
+    state = state_from_fen(fen)
+    assert_psqt_terms(state)
+    for next_state in env.step(state, env.actions(state)):
+        assert_psqt_terms(next_state[None])
+
+
+def test_psqt_terms_promotion(env):
+    state = state_from_fen("7k/1P6/8/8/8/8/8/K7 w - - 0 1")
+    for next_state in env.step(state, env.actions(state)):
+        assert_psqt_terms(next_state[None])
+
+
+def test_psqt_terms_mirrored():
+    mg, eg, phase = psqt_terms(state_from_fen("4k3/8/8/8/3N4/8/P7/4K3 w - - 0 1"))
+    assert (mg, eg) != (0, 0)
+    assert psqt_terms(state_from_fen("4k3/p7/8/3n4/8/8/8/4K3 b - - 0 1")) == (-mg, -eg, phase)
+
+
+def test_make_unmake_psqt_terms(env):
+    position = Position(env, state_from_fen(POSITIONS[1][1]))
+    state = position.state
+    for action in position.actions():
+        position.make_move(action)
+        assert_psqt_terms(position.state)
+        position.unmake_move()
+        assert position.state.tobytes() == state.tobytes()
+
+
+def test_psqt_search_develops_pieces(env):
+    # the knights are developed towards the center rather than to the rim
+    state = state_init()
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    actions, values = AlphaBetaSearch(env).search(state, 1, piece_value)
+    rim = 0x8181818181818181
+    assert not int(actions[0]["dst"]) & rim
+    assert values[0] > 0
@@ -33,13 +33,42 @@ def test_bishop_attackset(env, seed):
     )
 
 
+def random_blockers():
+    # About a quarter of the squares occupied.
+    return np.random.randint(0, 2**63, dtype=np.uint64) & np.random.randint(
+        0, 2**63, dtype=np.uint64
+    )
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_rook_attackset_all_squares(env, seed):
+    np.random.seed(seed)
+    for square in range(64):
+        rook = np.uint64(1 << square)
+        i, j = bb_to_ij(rook)
+        blocker_mask = random_blockers()
+        assert env.rook_attackset(rook, blocker_mask) == env.rook_attackset_slow(
+            i, j, blocker_mask
+        )
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_bishop_attackset_all_squares(env, seed):
+    np.random.seed(seed)
+    for square in range(64):
+        bishop = np.uint64(1 << square)
+        i, j = bb_to_ij(bishop)
+        blocker_mask = random_blockers()
+        assert env.bishop_attackset(bishop, blocker_mask) == env.bishop_attackset_slow(
+            i, j, blocker_mask
+        )
+
+
 def test_rook_table(env):
-    assert len(env._rook_table_lookup) == 64
-    for key in env._rook_table_lookup:
-        assert len(set(env._rook_table_lookup[key].values())) > 1
+    assert env._rook_attacks.shape == (102400,)
+    assert len(np.unique(env._rook_attacks)) > 64
 
 
 def test_bishop_table(env):
-    assert len(env._bishop_table_lookup) == 64
-    for key in env._bishop_table_lookup:
-        assert len(set(env._bishop_table_lookup[key].values())) > 1
+    assert env._bishop_attacks.shape == (5248,)
+    assert len(np.unique(env._bishop_attacks)) > 64
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from chess._environment import zobrist_key
+from chess._utils import state_init, state_from_fen
+from chess.perft import POSITIONS
+
+n_simulations = 10
+n_plies = 200
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_incremental_zobrist_key_matches_recomputed(env, seed):
+    np.random.seed(seed)
+    state = state_init()
+    for _ in range(n_plies):
+        actions = env.actions(state)
+        if len(actions) == 0:
+            break
+        state = env.step(state, np.random.choice(actions))
+        assert state["zobrist_key"] == zobrist_key(state)
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+def test_zobrist_key_all_actions(env, name, fen, counts):
+    state = state_from_fen(fen)
+    next_states = env.step(state, env.actions(state))
+    for next_state in next_states:
+        assert next_state["zobrist_key"] == zobrist_key(next_state)
+    assert len(np.unique(next_states["zobrist_key"])) == len(next_states)
+
+
+def test_zobrist_key_transposition(env):
+    # Nf3 Nf6 Nc3 Nc6 and Nc3 Nc6 Nf3 Nf6 reach the same position.
+    def play(state, moves):
+        for src, dst in moves:
+            actions = env.actions(state)
+            mask = (actions["src"] == 1 << src) & (actions["dst"] == 1 << dst)
+            action = actions[mask][0]
+            state = env.step(state, action)
+        return state
+
+    g1, f3, b1, c3 = 62, 45, 57, 42
+    g8, f6, b8, c6 = 6, 21, 1, 18
+    state = state_init()
+    first = play(state, [(g1, f3), (g8, f6), (b1, c3), (b8, c6)])
+    second = play(state, [(b1, c3), (b8, c6), (g1, f3), (g8, f6)])
+    assert first["zobrist_key"] == second["zobrist_key"]
+    assert first["zobrist_key"] != state["zobrist_key"]
+
+
+def test_zobrist_key_side_to_move():
+    white = state_from_fen("4k3/8/8/8/8/8/8/4K3 w - - 0 1")
+    black = state_from_fen("4k3/8/8/8/8/8/8/4K3 b - - 0 1")
+    assert white["zobrist_key"] != black["zobrist_key"]
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from chess import evaluation
+from chess._agent import AlphaBetaAgent
+from chess._constants import BLACK_QUEEN, PIECE_NAMES, WHITE_PAWN
+from chess._environment import AlphaBetaSearch, psqt_tables
+from chess._utils import state_from_fen, state_init
+from chess.perft import POSITIONS
+
+
+def random_states(env, n_games=5, n_plies=100):
+    rng = np.random.default_rng(0)
+    states = []
+    for _ in range(n_games):
+        state = state_init()
+        for _ in range(n_plies):
+            actions = env.actions(state)
+            if len(actions) == 0:
+                break
+            state = env.step(state, actions[rng.integers(len(actions))])
+            states.append(state)
+    return np.concatenate(states)
+
+
+def test_piece_counts(env):
+    states = random_states(env)
+    counts = evaluation.piece_counts(states)
+    expected = [
+        [bin(int(state[name])).count("1") for name in PIECE_NAMES] for state in states
+    ]
+    assert counts.shape == (len(states), 12)
+    assert counts.tolist() == expected
+
+
+def test_psqt_terms_extremes():
+    state = state_init()
+    for name in PIECE_NAMES:
+        state[name] = 0
+    state["white_pawn"] = 2**64 - 1
+    mg, eg, phase = evaluation.psqt_terms(state)
+    assert mg.tolist() == [evaluation.PSQT_MG[WHITE_PAWN].sum()]
+    assert eg.tolist() == [evaluation.PSQT_EG[WHITE_PAWN].sum()]
+    assert phase.tolist() == [0]
+    state["white_pawn"] = 0
+    state["black_queen"] = 2**64 - 1
+    mg, eg, phase = evaluation.psqt_terms(state)
+    assert mg.tolist() == [evaluation.PSQT_MG[BLACK_QUEEN].sum()]
+    assert eg.tolist() == [evaluation.PSQT_EG[BLACK_QUEEN].sum()]
+    assert phase.tolist() == [64 * evaluation.PHASE[BLACK_QUEEN]]
+
+
+def test_tables_shared_with_search():
+    mg, eg, phase, phase_max = psqt_tables()
+    assert (evaluation.PSQT_MG == mg).all() and (evaluation.PSQT_EG == eg).all()
+    assert (evaluation.PHASE == phase).all()
+    assert evaluation.PHASE_MAX == phase_max == state_init()["phase"][0]
+
+
+def test_psqt_terms_match_state(env):
+    states = random_states(env)
+    mg, eg, phase = evaluation.psqt_terms(states)
+    assert (mg == states["psqt_mg"]).all()
+    assert (eg == states["psqt_eg"]).all()
+    assert (phase == states["phase"]).all()
+
+
+def test_psqt_terms_chunks(env, monkeypatch):
+    states = random_states(env, n_games=1)
+    expected = evaluation.psqt_terms(states)
+    monkeypatch.setattr(evaluation, "CHUNK_SIZE", 7)
+    for terms, expected_terms in zip(evaluation.psqt_terms(states), expected):
+        assert (terms == expected_terms).all()
+
+
+@pytest.mark.parametrize("psqt", [False, True])
+def test_evaluate_matches_leaf_evaluation(env, psqt):
+    states = random_states(env)
+    piece_value = AlphaBetaAgent()._piece_value(True)
+    values = AlphaBetaSearch(env, psqt=psqt).evaluate(states, piece_value)
+    sign = np.where(states["white_player_turn"], 1, -1)
+    assert np.allclose(evaluation.evaluate(states, psqt=psqt), sign * values)
+    assert (evaluation.evaluate(states, psqt=False) == evaluation.material(states)).all()
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+@pytest.mark.parametrize("psqt", [False, True])
+def test_evaluate_matches_search(env, name, fen, counts, psqt):
+    state = state_from_fen(fen)
+    white = bool(state["white_player_turn"][0])
+    search = AlphaBetaSearch(env, quiescence=False, psqt=psqt)
+    actions, values = search.search(state, 1, AlphaBetaAgent()._piece_value(white))
+    expected = evaluation.evaluate(env.step(state, actions), psqt=psqt)
+    assert np.allclose(values, expected if white else -expected)
+
+
+def test_evaluate_batch(env):
+    states = np.resize(random_states(env, n_games=1), 3 * evaluation.CHUNK_SIZE + 5)
+    values = evaluation.evaluate(states)
+    assert values.shape == (len(states),)
+    assert np.isfinite(values).all()
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from chess._constants import BOARD, FEN, PIECE_NAMES, STATE_DTYPE
+from chess._utils import (
+    state_from_fen,
+    state_init,
+    state_to_fen,
+    states_from_fens,
+    states_to_fens,
+)
+from chess.perft import POSITIONS
+
+n_simulations = 5
+n_plies = 200
+
+
+def random_states(env, seed):
+    np.random.seed(seed)
+    state = state_init()
+    states = [state]
+    for _ in range(n_plies):
+        actions = env.actions(state)
+        if len(actions) == 0:
+            break
+        state = env.step(state, np.random.choice(actions))
+        states.append(state)
+    return np.concatenate(states)
+
+
+def board_fields(states):
+    # the fields of a state determined by the FEN, castling rights do not determine which of the
+    # king and rook moved flags are set
+    names = [name for name, _ in STATE_DTYPE if name in PIECE_NAMES]
+    return states[
+        names + ["white_player_turn", "ply", "zobrist_key", "is_white_check", "is_black_check"]
+    ]
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_fen_roundtrip(env, seed):
+    states = random_states(env, seed)
+    fens = states_to_fens(states)
+    assert fens == [state_to_fen(state) for state in states]
+    parsed = states_from_fens(fens)
+    assert (board_fields(parsed) == board_fields(states)).all()
+    assert (parsed == np.concatenate([state_from_fen(fen) for fen in fens])).all()
+    assert states_to_fens(parsed) == fens
+
+
+@pytest.mark.parametrize("seed", list(range(n_simulations)))
+def test_states_from_fens_bytes_array(env, seed):
+    fens = states_to_fens(random_states(env, seed))
+    assert (states_from_fens(np.array(fens, dtype="S100")) == states_from_fens(fens)).all()
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+def test_fen_positions(name, fen, counts):
+    assert state_to_fen(state_from_fen(fen)) == fen
+
+
+def test_fen_initial_position():
+    assert state_from_fen(FEN).tobytes() == state_init(board=BOARD).tobytes()
+    assert state_to_fen(state_init()) == FEN
+
+
+def test_fen_fields():
+    state = state_from_fen("4k2r/8/8/3pP3/8/8/8/R3K3 w Qk d6 3 42")[0]
+    assert state["white_player_turn"]
+    assert state["ply"] == 82
+    assert not state["has_white_king_moved"] and not state["has_white_queenside_rook_moved"]
+    assert state["has_white_kingside_rook_moved"]
+    assert not state["has_black_king_moved"] and not state["has_black_kingside_rook_moved"]
+    assert state["has_black_queenside_rook_moved"]
+    assert state["en_passant_square_white"] == 1 << 19
+    assert state_from_fen("8/8/8/8/8/8/8/4K2k b - - 0 1")["ply"] == 1
+
+
+@pytest.mark.parametrize(
+    "fen,white_check,black_check",
+    [
+        ("4k3/8/8/8/8/8/8/4R1K1 b - - 0 1", False, True),
+        ("4k3/8/8/8/8/5n2/8/6K1 w - - 0 1", True, False),
+        ("4k3/8/8/8/1b6/8/8/4K3 w - - 0 1", True, False),
+        ("4k3/3P4/8/8/8/8/8/4K3 b - - 0 1", False, True),
+        ("4k3/8/8/8/8/8/8/4K3 w - - 0 1", False, False),
+    ],
+)
+def test_fen_check(env, fen, white_check, black_check):
+    state = state_from_fen(fen)
+    assert state["is_white_check"] == white_check == env.is_white_check(state)
+    assert state["is_black_check"] == black_check == env.is_black_check(state)
+    assert (states_from_fens([fen]) == state).all()
+    assert (states_from_fens(np.array([fen], dtype="S100")) == state).all()
+
+
+@pytest.mark.parametrize(
+    "fen",
+    [
+        "",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBN w KQkq - 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNRR w KQkq - 0 1",
+        "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQxq - 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq i3 0 1",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w",
+    ],
+)
+def test_invalid_fen(fen):
+    with pytest.raises(ValueError):
+        state_from_fen(fen)
+    with pytest.raises(ValueError):
+        states_from_fens([FEN, fen])
+    with pytest.raises(ValueError):
+        states_from_fens(np.array([FEN, fen], dtype="S100"))
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from chess import gamelog
+from chess._agent import RandomAgent, simulate
+from chess._constants import STATE_DTYPE
+from chess._utils import state_from_fen
+from chess.perft import POSITIONS
+
+n_games = 4
+
+
+@pytest.fixture(scope="module")
+def games():
+    return [
+        simulate(RandomAgent(seed=seed), RandomAgent(seed=seed), max_rounds=300)
+        for seed in range(n_games)
+    ]
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+def test_encode_decode_actions(env, name, fen, counts):
+    state = state_from_fen(fen)
+    actions = env.actions(state)
+    moves = gamelog.encode_actions(actions)
+    assert moves.dtype == np.uint16
+    decoded = gamelog.decode_actions(moves, bool(state["white_player_turn"]))
+    assert (decoded == actions).all()
+
+
+def test_encode_decode_all_flags(env, games):
+    for state_log, action_log in games:
+        white_player_turn = state_log["white_player_turn"][:-1]
+        moves = gamelog.encode_actions(action_log)
+        assert (gamelog.decode_actions(moves, white_player_turn) == action_log).all()
+
+
+@pytest.mark.parametrize("snapshot_interval", [0, 16])
+def test_write_read(tmp_path, env, games, snapshot_interval):
+    path = tmp_path / "games.log"
+    with gamelog.GameLogWriter(path, snapshot_interval=snapshot_interval) as writer:
+        for state_log, action_log in games[:2]:
+            writer.write(state_log, action_log)
+    # games are appended to an existing log
+    with gamelog.GameLogWriter(path, snapshot_interval=snapshot_interval) as writer:
+        for state_log, action_log in games[2:]:
+            writer.write_actions(state_log[0], action_log)
+
+    reader = gamelog.GameLogReader(path)
+    assert len(reader) == n_games
+    for game, (state_log, action_log) in enumerate(games):
+        assert reader.n_plies(game) == len(action_log)
+        assert reader.result(game) == gamelog.result(state_log[-1])
+        assert reader.start_state(game)[0] == state_log[0]
+        assert (reader.actions(game) == action_log).all()
+        assert (reader.replay(game) == state_log).all()
+        for ply in [0, 1, 15, 16, 17, 33, len(action_log)]:
+            if ply <= len(action_log):
+                assert reader.state(game, ply)[0] == state_log[ply]
+    assert [len(actions) for _, actions in reader] == [len(log[1]) for log in games]
+
+
+@pytest.mark.parametrize("snapshot_interval", [0, 1, 7])
+def test_state_black_start(tmp_path, env, snapshot_interval):
+    # The snapshots start at odd plies and black is in turn at the start state.
+    rng = np.random.default_rng(0)
+    states = [state_from_fen("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1")]
+    actions = []
+    for _ in range(40):
+        legal = env.actions(states[-1])
+        if len(legal) == 0:
+            break
+        actions.append(legal[rng.integers(len(legal))])
+        states.append(env.step(states[-1], actions[-1]))
+    path = tmp_path / "games.log"
+    with gamelog.GameLogWriter(path, snapshot_interval=snapshot_interval) as writer:
+        writer.write_actions(states[0], np.array(actions))
+    reader = gamelog.GameLogReader(path)
+    for ply, state in enumerate(states):
+        assert reader.state(0, ply)[0] == state[0]
+
+
+def test_compact(tmp_path, games):
+    path = tmp_path / "games.log"
+    with gamelog.GameLogWriter(path, snapshot_interval=0) as writer:
+        for state_log, action_log in games:
+            writer.write(state_log, action_log)
+    n_plies = sum(len(action_log) for _, action_log in games)
+    assert path.stat().st_size < 2 * n_plies + n_games * 200
+    assert path.stat().st_size < sum(state_log.nbytes for state_log, _ in games) / 50
+
+
+def test_state_ply_out_of_range(tmp_path, games):
+    path = tmp_path / "games.log"
+    state_log, action_log = games[0]
+    with gamelog.GameLogWriter(path) as writer:
+        writer.write(state_log, action_log)
+    with pytest.raises(IndexError):
+        gamelog.GameLogReader(path).state(0, len(action_log) + 1)
+
+
+def test_not_a_game_log(tmp_path):
+    path = tmp_path / "games.log"
+    np.zeros(4, dtype=STATE_DTYPE).tofile(path)
+    with pytest.raises(ValueError):
+        gamelog.GameLogReader(path)
+    with pytest.raises(ValueError):
+        gamelog.GameLogWriter(path)
+
+
+def test_truncated_game_log(tmp_path, games):
+    path = tmp_path / "games.log"
+    state_log, action_log = games[0]
+    with gamelog.GameLogWriter(path) as writer:
+        writer.write(state_log, action_log)
+    with open(path, "rb+") as f:
+        f.truncate(path.stat().st_size - 1)
+    with pytest.raises(ValueError):
+        gamelog.GameLogReader(path)
@@ -0,0 +1,37 @@
+import pytest
+
+from chess._constants import BOARD, FEN
+from chess._utils import state_from_fen, state_init, state_to_fen
+from chess.perft import POSITIONS, divide, perft
+
+# Keep the test suite fast, the deeper counts are checked with `chess perft --bench`.
+MAX_NODES = 100000
+
+testdata = [
+    (name, fen, depth, expected_count)
+    for name, fen, expected_counts in POSITIONS
+    for depth, expected_count in enumerate(expected_counts, start=1)
+    if expected_count <= MAX_NODES
+]
+
+
+@pytest.mark.parametrize("name,fen,depth,expected_count", testdata)
+def test_perft(env, name, fen, depth, expected_count):
+    actual_count = perft(state_from_fen(fen), depth, env)
+    assert actual_count == expected_count, f"{name}\n{actual_count=}\n{expected_count=}"
+
+
+def test_divide(env):
+    counts = divide(state_from_fen(FEN), 2, env)
+    assert len(counts) == 20
+    assert counts["e2e4"] == 20
+    assert sum(counts.values()) == 400
+
+
+def test_state_from_fen_initial_position():
+    assert state_from_fen(FEN).tobytes() == state_init(board=BOARD).tobytes()
+
+
+@pytest.mark.parametrize("name,fen,expected_counts", POSITIONS)
+def test_state_to_fen(name, fen, expected_counts):
+    assert state_to_fen(state_from_fen(fen)) == fen
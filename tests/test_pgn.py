@@ -0,0 +1,168 @@
+import io
+
+import numpy as np
+import pytest
+
+from chess import gamelog, pgn
+from chess._agent import RandomAgent, simulate
+from chess._utils import state_from_fen
+from chess.perft import POSITIONS
+
+n_games = 4
+
+RUY_LOPEZ = """[Event "Example"]
+[Site "?"]
+[White "A"]
+[Black "B"]
+
+1. e4 {best by test} e5 2. Nf3 (2. f4 exf4 3. Nf3) Nc6 $1 3. Bb5 a6 4. Ba4 Nf6
+5. O-O Be7 6. Re1 b5 7. Bb3 d6 8. c3 O-O 9. h3 Nb8 10. d4 Nbd7 ; Breyer
+1/2-1/2
+
+[Event "Scholar's mate"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6?? 4. Qxf7# 1-0
+"""
+
+
+@pytest.fixture(scope="module")
+def games():
+    return [
+        simulate(RandomAgent(seed=seed), RandomAgent(seed=seed), max_rounds=300)
+        for seed in range(n_games)
+    ]
+
+
+@pytest.fixture(scope="module")
+def pgn_text(games):
+    file = io.StringIO()
+    writer = pgn.PGNWriter(file)
+    for idx, (state_log, action_log) in enumerate(games):
+        writer.write(state_log, action_log, headers={"Round": str(idx + 1)})
+    return file.getvalue()
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS)
+def test_san_roundtrip(env, name, fen, counts):
+    state = state_from_fen(fen)
+    actions = env.actions(state)
+    sans = [pgn.action_san(state, action) for action in actions]
+    assert len(set(sans)) == len(sans)
+    for action, san in zip(actions, sans):
+        assert pgn.san_action(state, san) == action
+
+
+def test_san_notation(env):
+    state = state_from_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    sans = {pgn.action_san(state, action) for action in env.actions(state)}
+    assert {"O-O", "O-O-O", "Nxd7", "Qxf6", "dxe6", "Bxa6", "Rb1", "Kf1"} <= sans
+    state = state_from_fen("3k4/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+    sans = {pgn.action_san(state, action) for action in env.actions(state)}
+    assert {"Rd1+", "Ra8+", "Rh8+", "O-O"} <= sans
+    state = state_from_fen("3k4/8/8/8/8/1N6/8/1N2KN2 w - - 0 1")
+    sans = {pgn.action_san(state, action) for action in env.actions(state)}
+    assert {"Nb1d2", "N3d2", "Nfd2", "Na3", "Nc5"} <= sans
+    state = state_from_fen("7k/1P6/8/8/8/8/8/K7 w - - 0 1")
+    sans = {pgn.action_san(state, action) for action in env.actions(state)}
+    assert {"b8=Q+", "b8=R+", "b8=N", "b8=B", "b8=P"} <= sans
+
+
+def test_san_lenient(env):
+    state = state_from_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    assert pgn.san_action(state, "0-0") == pgn.san_action(state, "O-O")
+    assert pgn.san_action(state, "Ne5d7") == pgn.san_action(state, "Nxd7+")
+    assert pgn.san_action(state, "Qf3xf6!?") == pgn.san_action(state, "Qxf6")
+
+
+@pytest.mark.parametrize("san", ["Ke3", "Nd4", "e5", "Zz9", "Rbd1"])
+def test_san_invalid(env, san):
+    state = state_from_fen("3k4/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+    with pytest.raises(ValueError):
+        pgn.san_action(state, san)
+
+
+def test_read(env):
+    games = list(pgn.read_games(io.StringIO(RUY_LOPEZ)))
+    assert len(games) == 2
+    ruy_lopez, scholars_mate = games
+    assert ruy_lopez.headers["White"] == "A"
+    assert ruy_lopez.headers["Result"] == "1/2-1/2"
+    assert len(ruy_lopez.action_log) == 20
+    assert len(ruy_lopez.state_log) == 21
+    assert (ruy_lopez.state_log[1:]["ply"] == np.arange(1, 21)).all()
+    assert scholars_mate.headers["Result"] == "1-0"
+    assert scholars_mate.state_log[-1]["is_black_checkmate"]
+
+
+def test_write(env):
+    game = next(pgn.read_games(io.StringIO(RUY_LOPEZ)))
+    text = pgn.game_pgn(game.state_log, game.action_log, game.headers)
+    assert text.startswith('[Event "Example"]\n[Site "?"]\n[Date "????.??.??"]\n')
+    assert '[Result "1/2-1/2"]' in text
+    assert "5. O-O Be7 6. Re1 b5" in text
+    assert text.rstrip().endswith("10. d4 Nbd7 1/2-1/2")
+    assert all(len(line) <= pgn.LINE_WIDTH for line in text.splitlines())
+
+
+def test_write_result(env):
+    game = list(pgn.read_games(io.StringIO(RUY_LOPEZ)))[1]
+    text = pgn.game_pgn(game.state_log, game.action_log)
+    assert '[Result "1-0"]' in text
+    assert "4. Qxf7# 1-0" in text
+
+
+def test_write_read(env, games, pgn_text):
+    read = list(pgn.read_games(io.StringIO(pgn_text)))
+    assert len(read) == n_games
+    for idx, ((state_log, action_log), game) in enumerate(zip(games, read)):
+        assert game.headers["Round"] == str(idx + 1)
+        assert game.headers["Result"] == pgn.result(state_log[-1])
+        assert (game.action_log == action_log).all()
+        assert (game.state_log["zobrist_key"] == state_log["zobrist_key"]).all()
+
+
+def test_write_read_fen(env):
+    fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b KQkq - 0 7"
+    game = pgn.game_from_sans(["Bxe2", "Qxe2", "O-O"], start_state=state_from_fen(fen))
+    text = pgn.game_pgn(game.state_log, game.action_log)
+    assert f'[FEN "{fen}"]' in text
+    assert "7... Bxe2 8. Qxe2 O-O" in text
+    read = next(pgn.read_games(io.StringIO(text)))
+    assert (read.action_log == game.action_log).all()
+
+
+def test_read_errors(env):
+    text = RUY_LOPEZ.replace("Nbd7", "Nbd5")
+    with pytest.raises(ValueError, match="Game 1: Ply 20: Illegal move 'Nbd5'"):
+        list(pgn.read_games(io.StringIO(text)))
+    games = list(pgn.read_games(io.StringIO(text), skip_errors=True))
+    assert [game.headers["Event"] for game in games] == ["Scholar's mate"]
+
+
+def test_read_path(tmp_path, env, pgn_text):
+    path = tmp_path / "games.pgn"
+    path.write_text(pgn_text)
+    assert len(list(pgn.read_games(path))) == n_games
+
+
+def test_read_games_parallel(tmp_path, env, pgn_text):
+    path = tmp_path / "games.pgn"
+    path.write_text(pgn_text + RUY_LOPEZ.replace("Nbd7", "Nbd5"))
+    expected = list(pgn.read_games(path, skip_errors=True))
+    games = list(pgn.read_games_parallel(path, workers=2, skip_errors=True, max_pending=2))
+    assert len(games) == len(expected) == n_games + 1
+    for game, expected_game in zip(games, expected):
+        assert game.headers == expected_game.headers
+        assert (game.action_log == expected_game.action_log).all()
+    with pytest.raises(ValueError, match="Game 5"):
+        list(pgn.read_games_parallel(path, workers=2))
+
+
+def test_pgn_to_gamelog(tmp_path, env, games, pgn_text):
+    path = tmp_path / "games.pgn"
+    path.write_text(pgn_text)
+    assert pgn.pgn_to_gamelog(path, tmp_path / "games.log") == n_games
+    reader = gamelog.GameLogReader(tmp_path / "games.log")
+    assert len(reader) == n_games
+    for idx, (_, action_log) in enumerate(games):
+        assert (reader.actions(idx) == action_log).all()
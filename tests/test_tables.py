@@ -0,0 +1,35 @@
+import numpy as np
+from chess import _tables
+from chess._environment import Environment
+
+
+def test_attack_tables_checksum(env):
+    attack_tables = Environment(cache=False).attack_tables()
+    assert _tables.checksum(attack_tables) == _tables.ATTACK_TABLES_SHA256
+    assert np.array_equal(env.attack_tables(), attack_tables)
+
+
+def test_attack_tables_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHESS_CACHE_DIR", str(tmp_path))
+    assert _tables.load_attack_tables() is None
+
+    env = Environment()
+    assert _tables.attack_tables_path().exists()
+    attack_tables = _tables.load_attack_tables()
+    assert isinstance(attack_tables, np.memmap)
+    assert np.array_equal(attack_tables, env.attack_tables())
+
+    cached_env = Environment()
+    assert np.array_equal(cached_env.attack_tables(), env.attack_tables())
+    assert cached_env.rook_attackset(1 << 27, 0) == env.rook_attackset(1 << 27, 0)
+
+
+def test_attack_tables_cache_corrupted(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHESS_CACHE_DIR", str(tmp_path))
+    env = Environment()
+    attack_tables = env.attack_tables()
+    attack_tables[42] ^= np.uint64(1)
+    np.save(_tables.attack_tables_path(), attack_tables)
+    assert _tables.load_attack_tables() is None
+    assert np.array_equal(Environment().attack_tables(), env.attack_tables())
+    assert _tables.load_attack_tables() is not None
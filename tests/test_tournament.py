@@ -0,0 +1,53 @@
+import pytest
+
+from chess import tournament
+
+
+def test_round_robin():
+    schedule = tournament.round_robin(["A", "B", "C"], games=4)
+    assert len(schedule) == 12
+    assert [game.idx for game in schedule] == list(range(12))
+    assert len({game.seed for game in schedule}) == 12
+    pairing = schedule[:4]
+    assert [(game.white, game.black) for game in pairing] == [
+        ("A", "B"), ("B", "A"), ("A", "B"), ("B", "A"),
+    ]
+
+
+def test_gauntlet():
+    schedule = tournament.gauntlet("A", ["B", "C"], games=3)
+    assert len(schedule) == 6
+    assert all("A" in (game.white, game.black) for game in schedule)
+
+
+@pytest.mark.parametrize(
+    "points,games,elo",
+    [(5, 10, 0), (7.5, 10, 190.85), (2.5, 10, -190.85), (10, 10, 511.5), (0, 10, -511.5)],
+)
+def test_elo_difference(points, games, elo):
+    assert tournament.elo_difference(points, games) == pytest.approx(elo, abs=0.1)
+
+
+def test_standings():
+    game = tournament.Game(0, "A", "B", 0)
+    results = [
+        tournament.GameResult(game, tournament.WHITE_WIN, 10, 0.1),
+        tournament.GameResult(game._replace(white="B", black="A"), tournament.WHITE_WIN, 10, 0.1),
+        tournament.GameResult(game, tournament.DRAW, 10, 0.1),
+    ]
+    table = tournament.standings(results)
+    assert table["A"] == {
+        "wins": 1, "draws": 1, "losses": 1, "games": 3, "points": 1.5, "elo": 0.0,
+    }
+    assert table["B"]["points"] == 1.5
+
+
+def test_tournament(capsys):
+    schedule = tournament.round_robin(["RandomAgent()", "AlphaBetaAgent(depth=1)"], games=2)
+    streamed = []
+    results = tournament.tournament(schedule, workers=2, max_rounds=20, callback=streamed.append)
+    assert len(results) == 2
+    assert streamed == results
+    assert {result.game.idx for result in results} == {0, 1}
+    assert all(result.plies <= 21 for result in results)
+    assert "Games/second" in capsys.readouterr().out
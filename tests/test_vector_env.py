@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from chess._constants import STATE_DTYPE
+from chess._utils import state_init
+from chess.vector_env import VectorEnv
+
+num_envs = 16
+n_steps = 400
+
+
+def test_vector_env_reset(env):
+    vector_env = VectorEnv(num_envs, env=env)
+    observations = vector_env.reset()
+    assert observations.dtype == np.dtype(STATE_DTYPE)
+    assert len(observations) == len(vector_env) == num_envs
+    assert (observations == state_init()[0]).all()
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_vector_env_random_rollout(env, seed):
+    rng = np.random.default_rng(seed)
+    vector_env = VectorEnv(num_envs, env=env)
+    n_done = 0
+    for _ in range(n_steps):
+        states = vector_env.states.copy()
+        actions = vector_env.sample_actions(rng)
+        observations, rewards, dones, infos = vector_env.step(actions)
+        final_states = infos["final_states"]
+        for state, action, final_state in zip(states, actions, final_states):
+            assert final_state == env.step(state, action, terminal=True)[0]
+        assert (observations[dones] == state_init()[0]).all()
+        assert (observations[~dones] == final_states[~dones]).all()
+        checkmate = final_states["is_white_checkmate"] | final_states["is_black_checkmate"]
+        assert (rewards == checkmate).all()
+        assert (dones >= checkmate).all()
+        n_done += dones.sum()
+        _, offsets = vector_env.actions()
+        assert (np.diff(offsets) > 0).all()
+    assert n_done > 0
+
+
+def test_vector_env_checkmate_reward(env):
+    # Fool's mate, the black queen checkmates white.
+    vector_env = VectorEnv(2, env=env)
+    moves = [(53, 45), (12, 20), (54, 38), (3, 39)]
+    for src, dst in moves:
+        actions, offsets = vector_env.actions()
+        game_actions = actions[offsets[0]:offsets[1]]
+        mask = (game_actions["src"] == 1 << src) & (game_actions["dst"] == 1 << dst)
+        action = game_actions[mask][0]
+        observations, rewards, dones, infos = vector_env.step(np.array([action, action]))
+    assert (rewards == 1).all()
+    assert dones.all()
+    assert infos["final_states"]["is_white_checkmate"].all()
+    assert (observations == state_init()[0]).all()
+
+
+def test_vector_env_num_envs():
+    with pytest.raises(ValueError):
+        VectorEnv(0)